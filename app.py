@@ -1,8 +1,10 @@
+from concurrent.futures import Future, as_completed
+
 import streamlit as st
 import pandas as pd
 
 from src.css import load_css
-from src.bq_io import get_bq_client
+from src.bq_io import get_backend, submit_query
 from src.queries import get_total_matches_query, get_total_events_query, get_recent_matches_query
 
 st.set_page_config(
@@ -34,35 +36,55 @@ PROJECT_ID = "prodigy-scouting-platform" # Hardcoded fallback or get from secret
 PROJECT_ID = "betterbet-467621" # FIXED based on secrets 
 DATASET_ID = "betterdata"
 
-client = get_bq_client(project=PROJECT_ID)
+backend = get_backend(project=PROJECT_ID)
 
-# Use columns for layout
-col1, col2, col3 = st.columns(3)
 
-with col1:
-    try:
-        df_matches = client.query(get_total_matches_query(PROJECT_ID, DATASET_ID)).to_dataframe()
-        total_matches = df_matches["total"].iloc[0]
-        st.metric("Total de Partidas", total_matches)
-    except Exception:
-        st.metric("Total de Partidas", "--")
 
-with col2:
+def submit_metric(build_query) -> Future:
+    # Erro ao montar o SQL vira erro do Future: fica isolado no card, como os de execução
     try:
-        df_events = client.query(get_total_events_query(PROJECT_ID, DATASET_ID)).to_dataframe()
-        total_events = df_events["total"].iloc[0]
-        # Format millions/thousands
-        if total_events > 1_000_000:
-            fmt_events = f"{total_events/1_000_000:.2f}M"
-        else:
-            fmt_events = f"{total_events/1_000:.1f}K"
-        st.metric("Eventos Registrados", fmt_events)
-    except Exception:
-        st.metric("Eventos Registrados", "--")
+        return submit_query(build_query(PROJECT_ID, DATASET_ID), project=PROJECT_ID)
+    except Exception as e:
+        failed: Future = Future()
+        failed.set_exception(e)
+        return failed
+
+
+# As três queries saem juntas: a página espera a mais lenta, não a soma.
+jobs = {
+    submit_metric(get_total_matches_query): "matches",
+    submit_metric(get_total_events_query): "events",
+    submit_metric(get_recent_matches_query): "recent",
+}
+
+# Use columns for layout
+col1, col2, col3 = st.columns(3)
+
+# Cada card tem seu slot, preenchido quando a própria query termina
+slot_matches = col1.empty()
+slot_events = col2.empty()
+slot_matches.metric("Total de Partidas", "…")
+slot_events.metric("Eventos Registrados", "…")
 
 with col3:
     st.metric("Competições", "Brasileirão 2025") # Static for now
 
+
+def render_matches(df_matches: pd.DataFrame) -> None:
+    total_matches = df_matches["total"].iloc[0]
+    slot_matches.metric("Total de Partidas", total_matches)
+
+
+def render_events(df_events: pd.DataFrame) -> None:
+    total_events = df_events["total"].iloc[0]
+    # Format millions/thousands
+    if total_events > 1_000_000:
+        fmt_events = f"{total_events/1_000_000:.2f}M"
+    else:
+        fmt_events = f"{total_events/1_000:.1f}K"
+    slot_events.metric("Eventos Registrados", fmt_events)
+
+
 st.divider()
 
 # --- NAVIGATION SECTION ---
@@ -101,8 +123,11 @@ st.divider()
 
 # --- RECENT ACTIVITY SECTION ---
 st.subheader("Atividade Recente")
-try:
-    df_recent = client.query(get_recent_matches_query(PROJECT_ID, DATASET_ID)).to_dataframe()
+slot_recent = st.empty()
+slot_recent.caption("Carregando partidas recentes…")
+
+
+def render_recent(df_recent: pd.DataFrame) -> None:
     # Format Date
     if not df_recent.empty:
         df_recent["match_date"] = pd.to_datetime(df_recent["match_date"]).dt.strftime('%d/%m/%Y')
@@ -113,20 +138,35 @@ try:
             "home_score": "Gols (M)",
             "away_score": "Gols (V)"
         })
-        st.dataframe(
+        slot_recent.dataframe(
             df_recent[["Data", "Mandante", "Gols (M)", "Gols (V)", "Visitante"]],
             use_container_width=True,
             hide_index=True
         )
     else:
-        st.info("Nenhuma partida recente encontrada.")
-except Exception as e:
-    st.warning("Não foi possível carregar as partidas recentes.")
+        slot_recent.info("Nenhuma partida recente encontrada.")
+
 
 # --- FOOTER / CHECK ---
 st.markdown("---")
 # Simple check icon
-if client:
-    st.markdown(f"<small style='color: #238636;'>✅ Conectado ao BigQuery ({PROJECT_ID})</small>", unsafe_allow_html=True)
+if backend:
+    st.markdown(f"<small style='color: #238636;'>✅ Conectado: {backend.label}</small>", unsafe_allow_html=True)
 else:
      st.markdown(f"<small style='color: #da3633;'>❌ Desconectado</small>", unsafe_allow_html=True)
+
+# --- RESULTADOS (na ordem em que as queries terminam) ---
+renderers = {"matches": render_matches, "events": render_events, "recent": render_recent}
+fallbacks = {
+    "matches": lambda: slot_matches.metric("Total de Partidas", "--"),
+    "events": lambda: slot_events.metric("Eventos Registrados", "--"),
+    "recent": lambda: slot_recent.warning("Não foi possível carregar as partidas recentes."),
+}
+
+for job in as_completed(jobs):
+    name = jobs[job]
+    try:
+        renderers[name](job.result())
+    except Exception:
+        # Falha de um card não afeta os outros
+        fallbacks[name]()
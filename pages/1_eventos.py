@@ -8,12 +8,27 @@ import os
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import numpy as np
 import streamlit as st
 import pandas as pd
 from google.cloud import bigquery
 
 # from src.ui_filters import render_sidebar_globals (Removed)
-from src.bq_io import get_bq_client
+from src.bq_io import run_query as backend_run_query
+from src.queries import (
+    EVENT_COLUMN_TYPES,
+    MATCH_ID_CANDIDATES,
+    SCHEDULE_COLUMN_TYPES,
+    SCHEDULE_DATE_CANDIDATES,
+    QueryParams,
+    _column_expr,
+    get_available_seasons,
+)
+from src.expr import Expr, Match, Minute, Outcome, PlayerId, Team, Type, all_of
+from src.schema_registry import get_registry
+from src.settings import get_bool_setting
+from src.event_frame import EventFrame
+from src.filters import LocalEvents
 from src.css import load_css
 from src.plots import plot_events_plotly
 
@@ -49,19 +64,39 @@ def fq_table(prefix: str, year: int) -> str:
     return f"`{PROJECT}.{DATASET}.{prefix}_{int(year)}`"
 
 
-def _union_schedule_years(years: List[int]) -> str:
+# (coluna canônica, tipo, nomes aceitos na tabela de origem)
+ColumnSpec = Tuple[str, Optional[str], Optional[List[str]]]
+
+TEAM_COLUMNS: List[ColumnSpec] = [
+    ("home_team", SCHEDULE_COLUMN_TYPES["home_team"], None),
+    ("away_team", SCHEDULE_COLUMN_TYPES["away_team"], None),
+]
+
+
+def union_sql(prefix: str, years: Tuple[int, ...], columns: List[ColumnSpec]) -> str:
+    """
+    UNION ALL das tabelas por ano. Cada coluna é resolvida por tabela no schema
+    registry (nome real, cast só se o tipo divergir, NULL tipado se faltar):
+    o horário do jogo, por exemplo, é `date` nas temporadas antigas.
+    """
+    registry = get_registry(PROJECT, DATASET)
     parts = []
     for y in years:
-        parts.append(f"SELECT home_team, away_team FROM {fq_table(SCHEDULE_PREFIX, y)}")
+        table = f"{prefix}_{int(y)}"
+        cols = ", ".join(_column_expr(name, col_type, table, registry, candidates) for name, col_type, candidates in columns)
+        parts.append(f"SELECT {cols} FROM {fq_table(prefix, y)}")
     return "\nUNION ALL\n".join(parts)
 
 
+def _match_id_column(match_id_col: str) -> ColumnSpec:
+    return ("match_id", "INT64", [match_id_col] + MATCH_ID_CANDIDATES)
+
+
 @st.cache_data(ttl=3600)
 def load_teams_for_years(years: Tuple[int, ...]) -> List[str]:
-    years_list = list(years)
     sql = f"""
     WITH s AS (
-      {_union_schedule_years(years_list)}
+      {union_sql(SCHEDULE_PREFIX, years, TEAM_COLUMNS)}
     )
     SELECT DISTINCT team
     FROM (
@@ -76,35 +111,21 @@ def load_teams_for_years(years: Tuple[int, ...]) -> List[str]:
     return df["team"].dropna().astype(str).tolist()
 
 
-def union_sql(prefix: str, years: Tuple[int, ...], select_clause: str) -> str:
-    return "\nUNION ALL\n".join(
-        f"{select_clause} FROM {fq_table(prefix, y)}" for y in years
-    )
-
-
 def run_query(sql: str, params: Optional[list] = None) -> pd.DataFrame:
-    client = get_bq_client(project=PROJECT)
-    cfg = bigquery.QueryJobConfig(query_parameters=params or [])
-    return client.query(sql, job_config=cfg).to_dataframe()
+    return backend_run_query(sql, params, project=PROJECT)
 
 
 @st.cache_data(ttl=3600)
 def detect_match_id_col(prefix: str, year: int) -> str:
-    client = get_bq_client(project=PROJECT)
-    table_id = f"{PROJECT}.{DATASET}.{prefix}_{int(year)}"
-    schema = client.get_table(table_id).schema
-    cols = [f.name for f in schema]
-
-    candidates = [
-        "game_id", "gameId",
-        "match_id", "matchId", "matchID",
-        "fixture_id", "fixtureId",
-        "id", "Id",
-    ]
-
-    for c in candidates:
-        if c in cols:
-            return c
+    # Colunas vêm do schema registry (um único metadado para o dataset inteiro)
+    table = f"{prefix}_{int(year)}"
+    table_id = f"{PROJECT}.{DATASET}.{table}"
+    registry = get_registry(PROJECT, DATASET)
+    cols = list(registry.columns(table))
+
+    found = registry.resolve(table, MATCH_ID_CANDIDATES + ["id", "Id"])
+    if found:
+        return found
 
     for c in cols:
         lc = c.lower()
@@ -210,7 +231,11 @@ def load_matches(
     schedule_union = union_sql(
         SCHEDULE_PREFIX,
         years,
-        f"SELECT {sched_match_id_col} AS match_id, start_time, home_team, away_team",
+        [
+            _match_id_column(sched_match_id_col),
+            ("start_time", SCHEDULE_COLUMN_TYPES["match_date"], SCHEDULE_DATE_CANDIDATES),
+            *TEAM_COLUMNS,
+        ],
     )
 
     where = ["(home_team IN UNNEST(@teams) OR away_team IN UNNEST(@teams))"]
@@ -248,19 +273,26 @@ def load_matches(
 
 
 @st.cache_data(ttl=900)
-def load_event_types(
+def load_event_facets(
     years: Tuple[int, ...],
     teams: Tuple[str, ...],
     match_ids: Tuple[int, ...],
     events_match_id_col: str,
-) -> List[str]:
+) -> pd.DataFrame:
+    """
+    Facetas dos filtros (tipos, outcomes e jogadores, com contagens) numa única
+    varredura via GROUPING SETS. Os widgets dependentes (outcomes/jogadores por
+    tipo selecionado) são derivados localmente, sem nova query.
+    """
     events_union = union_sql(
         EVENTS_PREFIX,
         years,
-        f"SELECT {events_match_id_col} AS match_id, team, type",
+        [_match_id_column(events_match_id_col)]
+        + [(c, EVENT_COLUMN_TYPES[c], None) for c in ("team", "type", "outcome_type", "player_id")]
+        + [("player_name", EVENT_COLUMN_TYPES["player"], ["player"])],
     )
 
-    where = ["type IS NOT NULL", "team IN UNNEST(@teams)"]
+    where = ["team IN UNNEST(@teams)"]
     params = [bigquery.ArrayQueryParameter("teams", "STRING", list(teams))]
 
     if match_ids:
@@ -269,106 +301,81 @@ def load_event_types(
 
     sql = f"""
     WITH e AS ({events_union})
-    SELECT DISTINCT type
+    SELECT
+      type,
+      outcome_type,
+      player_id,
+      ANY_VALUE(player_name) AS player_name,
+      GROUPING(outcome_type) AS by_player,
+      COUNT(*) AS n
     FROM e
     WHERE {" AND ".join(where)}
-    ORDER BY type
+    GROUP BY GROUPING SETS ((type, outcome_type), (type, player_id))
     """
 
     df = run_query(sql, params)
-    return df["type"].dropna().astype(str).tolist()
-
-
-@st.cache_data(ttl=900)
-def load_outcomes(
-    years: Tuple[int, ...],
-    teams: Tuple[str, ...],
-    match_ids: Tuple[int, ...],
-    event_types: Tuple[str, ...],
-    events_match_id_col: str,
-) -> List[str]:
-    events_union = union_sql(
-        EVENTS_PREFIX,
-        years,
-        f"SELECT {events_match_id_col} AS match_id, team, type, outcome_type",
-    )
-
-    where = ["outcome_type IS NOT NULL", "team IN UNNEST(@teams)"]
-    params = [bigquery.ArrayQueryParameter("teams", "STRING", list(teams))]
+    df["by_player"] = df["by_player"].astype(bool)
+    return df
 
-    if match_ids:
-        where.append("match_id IN UNNEST(@match_ids)")
-        params.append(bigquery.ArrayQueryParameter("match_ids", "INT64", [int(x) for x in match_ids]))
 
+def _facet_rows(facets: pd.DataFrame, by_player: bool, event_types: Tuple[str, ...] = ()) -> pd.DataFrame:
+    rows = facets[facets["by_player"] == by_player]
     if event_types:
-        where.append("type IN UNNEST(@types)")
-        params.append(bigquery.ArrayQueryParameter("types", "STRING", list(event_types)))
+        rows = rows[rows["type"].isin(event_types)]
+    return rows
 
-    sql = f"""
-    WITH e AS ({events_union})
-    SELECT DISTINCT outcome_type
-    FROM e
-    WHERE {" AND ".join(where)}
-    ORDER BY outcome_type
-    """
 
-    df = run_query(sql, params)
-    return df["outcome_type"].dropna().astype(str).tolist()
+def facet_event_types(facets: pd.DataFrame) -> List[str]:
+    types = _facet_rows(facets, False)["type"].dropna().astype(str)
+    return sorted(types.unique().tolist())
 
 
-@st.cache_data(ttl=900)
-def load_players(
-    years: Tuple[int, ...],
-    teams: Tuple[str, ...],
-    match_ids: Tuple[int, ...],
-    event_types: Tuple[str, ...],
-    events_match_id_col: str,
-) -> pd.DataFrame:
-    events_union = union_sql(
-        EVENTS_PREFIX,
-        years,
-        f"""
-        SELECT
-          {events_match_id_col} AS match_id,
-          team,
-          type,
-          CAST(player_id AS INT64) AS player_id,
-          CAST(player AS STRING) AS player_name
-        """,
-    )
+def facet_outcomes(facets: pd.DataFrame, event_types: Tuple[str, ...]) -> List[str]:
+    outs = _facet_rows(facets, False, event_types)["outcome_type"].dropna().astype(str)
+    return sorted(outs.unique().tolist())
 
-    where = ["player_id IS NOT NULL", "team IN UNNEST(@teams)"]
-    params = [bigquery.ArrayQueryParameter("teams", "STRING", list(teams))]
 
-    if match_ids:
-        where.append("match_id IN UNNEST(@match_ids)")
-        params.append(bigquery.ArrayQueryParameter("match_ids", "INT64", [int(x) for x in match_ids]))
+def facet_players(facets: pd.DataFrame, event_types: Tuple[str, ...]) -> pd.DataFrame:
+    rows = _facet_rows(facets, True, event_types).dropna(subset=["player_id"])
+    if rows.empty:
+        return pd.DataFrame(columns=["player_id", "player_name", "n"])
 
-    if event_types:
-        where.append("type IN UNNEST(@types)")
-        params.append(bigquery.ArrayQueryParameter("types", "STRING", list(event_types)))
+    df = (
+        rows.assign(player_name=rows["player_name"].astype("string"))
+        .groupby("player_id", as_index=False)
+        .agg(player_name=("player_name", "first"), n=("n", "sum"))
+    )
+    df["player_id"] = df["player_id"].astype("int64")
+    df["player_name"] = df["player_name"].fillna("").str.strip()
+    return df.sort_values(["player_name", "player_id"]).reset_index(drop=True)
 
-    sql = f"""
-    WITH e AS ({events_union})
-    SELECT
-      player_id,
-      ANY_VALUE(player_name) AS player_name
-    FROM e
-    WHERE {" AND ".join(where)}
-    GROUP BY player_id
-    ORDER BY player_name, player_id
-    """
 
-    df = run_query(sql, params)
-    if df.empty:
-        return df
+def _events_union(years: Tuple[int, ...], events_match_id_col: str) -> str:
+    columns = ["expanded_minute", "type", "outcome_type", "team", "player_id", "player", "x", "y", "end_x", "end_y", "qualifiers"]
+    return union_sql(
+        EVENTS_PREFIX,
+        years,
+        [_match_id_column(events_match_id_col)] + [(c, EVENT_COLUMN_TYPES[c], None) for c in columns],
+    )
 
-    df["player_id"] = pd.to_numeric(df["player_id"], errors="coerce").astype("Int64")
-    df = df.dropna(subset=["player_id"]).copy()
-    df["player_id"] = df["player_id"].astype("int64")
-    df["player_name"] = df["player_name"].fillna("").astype(str).str.strip()
 
-    return df
+def events_filter_expr(
+    teams: Tuple[str, ...],
+    match_ids: Tuple[int, ...] = (),
+    minute_range: Optional[Tuple[int, int]] = None,
+    event_types: Tuple[str, ...] = (),
+    outcomes: Tuple[str, ...] = (),
+    player_ids: Tuple[int, ...] = (),
+) -> Expr:
+    """Filtros da página como expressão (vira WHERE no banco ou máscara em memória)."""
+    return all_of(
+        Team.isin(teams),
+        Match.isin(int(x) for x in match_ids) if match_ids else None,
+        Minute.between(int(minute_range[0]), int(minute_range[1])) if minute_range else None,
+        Type.isin(event_types) if event_types else None,
+        Outcome.isin(outcomes) if outcomes else None,
+        PlayerId.isin(int(x) for x in player_ids) if player_ids else None,
+    )
 
 
 @st.cache_data(ttl=300)
@@ -382,92 +389,62 @@ def load_events_filtered(
     player_ids: Tuple[int, ...],
     limit_rows: int,
     events_match_id_col: str,
-) -> pd.DataFrame:
-    events_union = union_sql(
-        EVENTS_PREFIX,
-        years,
-        f"""
-        SELECT
-          {events_match_id_col} AS match_id,
-          expanded_minute,
-          type,
-          outcome_type,
-          team,
-          CAST(player_id AS INT64) AS player_id,
-          CAST(player AS STRING) AS player,
-          x, y, end_x, end_y, qualifiers
-        """,
-    )
+) -> EventFrame:
+    params = QueryParams()
+    where = events_filter_expr(teams, match_ids, minute_range, event_types, outcomes, player_ids).to_sql(params)
+    lim = params.scalar("lim", "INT64", int(limit_rows))
 
-    where = [
-        "team IN UNNEST(@teams)",
-        "expanded_minute BETWEEN @m0 AND @m1",
-    ]
+    sql = f"""
+    WITH e AS ({_events_union(years, events_match_id_col)})
+    SELECT *
+    FROM e
+    WHERE {where}
+    LIMIT {lim}
+    """
 
-    params: list = [
-        bigquery.ArrayQueryParameter("teams", "STRING", list(teams)),
-        bigquery.ScalarQueryParameter("m0", "INT64", int(minute_range[0])),
-        bigquery.ScalarQueryParameter("m1", "INT64", int(minute_range[1])),
-        bigquery.ScalarQueryParameter("lim", "INT64", int(limit_rows)),
-    ]
+    # Layout compacto (category/float32/int16 + tags dos qualifiers em formato
+    # plano, indexadas pela posição da linha): filtros/amostras preservam o índice.
+    return EventFrame.from_pandas(run_query(sql, params.bindings))
 
-    if match_ids:
-        where.append("match_id IN UNNEST(@match_ids)")
-        params.append(bigquery.ArrayQueryParameter("match_ids", "INT64", [int(x) for x in match_ids]))
 
-    if event_types:
-        where.append("type IN UNNEST(@types)")
-        params.append(bigquery.ArrayQueryParameter("types", "STRING", list(event_types)))
+# =========================================
+# MODO LOCAL (1 carga, filtros em memória)
+# =========================================
+# Minuto/tipo/outcome/jogador não vão para o SQL: o superconjunto de
+# (anos, times, partidas) é carregado uma vez e filtrado pelos índices de
+# src.filters.LocalEvents.
+
+EVENTS_SUPERSET_MAX_ROWS = 1_000_000
 
-    if outcomes:
-        where.append("outcome_type IN UNNEST(@outs)")
-        params.append(bigquery.ArrayQueryParameter("outs", "STRING", list(outcomes)))
 
-    if player_ids:
-        where.append("player_id IN UNNEST(@pids)")
-        params.append(bigquery.ArrayQueryParameter("pids", "INT64", [int(x) for x in player_ids]))
+@st.cache_resource(ttl=900, max_entries=8)
+def load_local_events(
+    years: Tuple[int, ...],
+    teams: Tuple[str, ...],
+    match_ids: Tuple[int, ...],
+    events_match_id_col: str,
+) -> Optional[LocalEvents]:
+    """
+    Superconjunto de eventos para o modo local (compartilhado entre sessões,
+    sem cópia por rerun). None se passar de EVENTS_SUPERSET_MAX_ROWS: nesse
+    caso a página volta a filtrar no SQL.
+    """
+    params = QueryParams()
+    where = events_filter_expr(teams, match_ids).to_sql(params)
+    lim = params.scalar("lim", "INT64", EVENTS_SUPERSET_MAX_ROWS + 1)
 
     sql = f"""
-    WITH e AS ({events_union})
+    WITH e AS ({_events_union(years, events_match_id_col)})
     SELECT *
     FROM e
-    WHERE {" AND ".join(where)}
-    LIMIT @lim
+    WHERE {where}
+    LIMIT {lim}
     """
 
-    df = run_query(sql, params)
-
-    # Parse qualifiers if present
-    if not df.empty and "qualifiers" in df.columns:
-        import ast
-
-        def parse_quals(q_str):
-            try:
-                # Se for nulo ou vazio
-                if pd.isna(q_str) or not q_str:
-                    return []
-                # Tenta converter string python/json para lista
-                # O CSV mostra aspas simples: [{'type':...}] -> python syntax
-                raw_list = ast.literal_eval(q_str)
-                if not isinstance(raw_list, list):
-                    return []
-                
-                # Extrai apenas os displayNames
-                # Exemplo structure: {'type': {'displayName': 'Zone'}, 'value': 'Back'}
-                tags = []
-                for item in raw_list:
-                    t = item.get("type", {})
-                    dn = t.get("displayName")
-                    if dn:
-                        tags.append(dn)
-                return tags
-            except Exception:
-                return []
-
-        # Aplica a conversão
-        df["kv_qualifiers"] = df["qualifiers"].apply(parse_quals)
-
-    return df
+    df = run_query(sql, params.bindings)
+    if len(df) > EVENTS_SUPERSET_MAX_ROWS:
+        return None
+    return LocalEvents(df)
 
 
 # =========================================
@@ -487,10 +464,10 @@ st.title("Eventos • Análise Interativa")
 c_y, c_t = st.columns([1, 3])
 
 with c_y:
-    all_years = list(range(2015, 2026))
-    years_sel = st.multiselect("Temporada(s)", all_years, default=[2025])
+    all_years = get_available_seasons(PROJECT, DATASET)
+    years_sel = st.multiselect("Temporada(s)", all_years, default=all_years[-1:])
     if not years_sel:
-        years_sel = [2025] # Fallback visual
+        years_sel = all_years[-1:] # Fallback visual
     
     # Ordena e converte para tupla para cache
     years_t = tuple(sorted(set(int(y) for y in years_sel)))
@@ -528,6 +505,11 @@ with c3:
 
 with c4:
     limit_rows = st.number_input("Limite de eventos", 10_000, 500_000, 200_000, 10_000)
+    local_mode = st.toggle(
+        "Filtrar localmente",
+        value=get_bool_setting("events_local_filter", True),
+        help="Carrega os eventos das partidas uma vez e aplica minuto/tipo/outcome/jogador em memória.",
+    )
 
 df_matches = load_matches(years_t, teams_t, tuple(home_away), SCHED_MATCH_ID_COL)
 
@@ -566,14 +548,29 @@ if match_mode.startswith("Escolher"):
 
 match_ids_effective = tuple(match_ids_selected) if match_ids_selected else tuple(match_universe)
 
-event_types_all = load_event_types(years_t, teams_t, match_ids_effective, EVENTS_MATCH_ID_COL)
+local_events: Optional[LocalEvents] = None
+if local_mode:
+    local_events = load_local_events(years_t, teams_t, match_ids_effective, EVENTS_MATCH_ID_COL)
+    if local_events is None:
+        st.caption(
+            f"Mais de {EVENTS_SUPERSET_MAX_ROWS:,} eventos nas partidas selecionadas: filtrando via query."
+            .replace(",", ".")
+        )
+
+# Uma única query (ou o superconjunto local) alimenta tipos, outcomes e jogadores
+if local_events is not None:
+    facets = local_events.facets()
+else:
+    facets = load_event_facets(years_t, teams_t, match_ids_effective, EVENTS_MATCH_ID_COL)
+
+event_types_all = facet_event_types(facets)
 default_types = ["Pass"] if "Pass" in event_types_all else (event_types_all[:1] if event_types_all else [])
 event_types = st.multiselect("Tipo(s) de evento", event_types_all, default=default_types)
 
-outcomes_all = load_outcomes(years_t, teams_t, match_ids_effective, tuple(event_types), EVENTS_MATCH_ID_COL)
+outcomes_all = facet_outcomes(facets, tuple(event_types))
 outcomes = st.multiselect("Outcome (opcional)", outcomes_all, default=[])
 
-df_players = load_players(years_t, teams_t, match_ids_effective, tuple(event_types), EVENTS_MATCH_ID_COL)
+df_players = facet_players(facets, tuple(event_types))
 player_options = [
     f"{r.player_name} ({r.player_id})" if r.player_name else f"({r.player_id})"
     for r in df_players.itertuples(index=False)
@@ -587,29 +584,46 @@ for lab in selected_players:
     except Exception:
         pass
 
-df_events = load_events_filtered(
-    years=years_t,
-    teams=teams_t,
-    match_ids=match_ids_effective,
-    minute_range=(int(minute_range[0]), int(minute_range[1])),
-    event_types=tuple(event_types),
-    outcomes=tuple(outcomes),
-    player_ids=tuple(player_ids_sel),
-
-    limit_rows=int(limit_rows),
-    events_match_id_col=EVENTS_MATCH_ID_COL,
-)
+if local_events is not None:
+    df_events, events_total = local_events.filter(
+        minute_range=(int(minute_range[0]), int(minute_range[1])),
+        event_types=tuple(event_types),
+        outcomes=tuple(outcomes),
+        player_ids=tuple(player_ids_sel),
+        limit_rows=int(limit_rows),
+    )
+    qual_tags = local_events.tags
+else:
+    frame = load_events_filtered(
+        years=years_t,
+        teams=teams_t,
+        match_ids=match_ids_effective,
+        minute_range=(int(minute_range[0]), int(minute_range[1])),
+        event_types=tuple(event_types),
+        outcomes=tuple(outcomes),
+        player_ids=tuple(player_ids_sel),
+
+        limit_rows=int(limit_rows),
+        events_match_id_col=EVENTS_MATCH_ID_COL,
+    )
+    df_events, qual_tags = frame.df, frame.tags
+    events_total = None  # o SQL para no LIMIT: o total real não é conhecido
+
+if events_total is not None and events_total > len(df_events):
+    st.caption(
+        f"{events_total:,} eventos passam nos filtros; limite de {len(df_events):,}: amostra espalhada por "
+        "todas as partidas e minutos.".replace(",", ".")
+    )
+elif events_total is None and len(df_events) >= int(limit_rows):
+    st.caption(f"Limite de {int(limit_rows):,} eventos atingido: há mais eventos com esses filtros.".replace(",", "."))
 
 # =========================================
 # FILTRO DE QUALIFIERS (PÓS-QUERY)
 # =========================================
-if "kv_qualifiers" in df_events.columns and not df_events.empty:
-    # Coletar todos os qualifiers únicos da amostra atual
-    all_quals = set()
-    for q_list in df_events["kv_qualifiers"]:
-        all_quals.update(q_list)
-    
-    sorted_quals = sorted(all_quals)
+sorted_quals: List[str] = []
+if not df_events.empty:
+    # Qualifiers únicos da amostra atual
+    sorted_quals = qual_tags.present(rows=df_events.index)
     
     # Checkbox para habilitar o filtro (para não poluir se não quiser usar)
     # ou direto um multiselect. O multiselect vazio = sem filtro é melhor.
@@ -626,12 +640,7 @@ if "kv_qualifiers" in df_events.columns and not df_events.empty:
         # Vamos implementar lógica: "Events must have ALL selected tags" (AND) 
         # para permitir queries como "Chute" + "Cabeça" + "BigChance".
         
-        filter_set = set(selected_quals)
-        
-        def check_tags(row_tags):
-            return filter_set.issubset(set(row_tags))
-
-        df_events = df_events[df_events["kv_qualifiers"].apply(check_tags)]
+        df_events = df_events[qual_tags.has_all(selected_quals, rows=df_events.index)]
 
 
 st.divider()
@@ -669,20 +678,11 @@ with g2:
     )
 
 with g3:
-    sample_n = st.number_input("Amostra p/ plot", min_value=200, max_value=20000, value=3000, step=200)
+    sample_n = st.number_input("Amostra p/ plot", min_value=200, max_value=100000, value=3000, step=200)
 
     highlight_qualifier = None
-    if "kv_qualifiers" in df_events.columns and not df_events.empty:
-        # Tenta reusar sorted_quals se definido anteriormente
-        opts = []
-        if 'sorted_quals' in locals():
-            opts = sorted_quals
-        else:
-            all_q = set()
-            for q_list in df_events["kv_qualifiers"]:
-                all_q.update(q_list)
-            opts = sorted(all_q)
-        
+    if sorted_quals and not df_events.empty:
+        opts = sorted_quals
         if opts:
             highlight_qualifier = st.selectbox("Destacar Qualifier (Opcional)", ["Nenhum"] + opts, index=0)
             if highlight_qualifier == "Nenhum":
@@ -780,12 +780,9 @@ plot_df = plot_df.dropna(subset=["x", "y"])
 
 if len(plot_df) > int(sample_n):
     # Smart Sampling: Se houver destaque, priorizar esses eventos
-    if highlight_qualifier and "kv_qualifiers" in plot_df.columns:
-        def is_priority(tags):
-            return highlight_qualifier in tags
-        
+    if highlight_qualifier:
         # Filtra prioritários
-        priority_mask = plot_df["kv_qualifiers"].apply(is_priority)
+        priority_mask = qual_tags.has(highlight_qualifier, rows=plot_df.index)
         priority_df = plot_df[priority_mask]
         background_df = plot_df[~priority_mask]
         
@@ -848,6 +845,7 @@ with c_map:
         color_outcome=bool(color_by_outcome),
         draw_arrows=bool(draw_arrows),
         highlight_qualifier=highlight_qualifier,
+        qualifier_tags=qual_tags,
         theme_colors=theme_colors,
         color_strategy=color_strategy,
         layer_colors=clean_layer_colors
@@ -879,10 +877,8 @@ with c_stats:
     st.divider()
 
     # 2. Por Qualifier (Destaque)
-    if highlight_qualifier and "kv_qualifiers" in plot_df.columns:
-        def has_qa(tags):
-            return highlight_qualifier in tags
-        n_high = plot_df["kv_qualifiers"].apply(has_qa).sum()
+    if highlight_qualifier:
+        n_high = int(qual_tags.has(highlight_qualifier, rows=plot_df.index).sum())
         
         st.metric(f"Com '{highlight_qualifier}'", f"{n_high}")
         
@@ -10,8 +10,9 @@ import plotly.express as px
 from datetime import datetime, timedelta
 
 from src.css import load_css
-from src.bq_io import get_bq_client
-from src.queries import get_match_stats_query, get_player_rankings_query, get_dynamic_ranking_query, get_all_teams_query, get_all_players_query, get_conversion_ranking_query
+from src.bq_io import run_query
+from src.queries import get_match_stats_query, get_player_rankings_query, get_all_teams_query, get_all_players_query, get_available_seasons, get_season_date_bounds_query, QUALIFIER_TAGS
+from src.rankings import load_ranking_data, ranking_perspective
 
 
 
@@ -36,7 +37,12 @@ with col_filter_2:
     aggregation_mode = st.radio("Agrupamento:", ["Por Temporada", "Histórico"], index=0, horizontal=True)
 
 with col_filter_3:
-    st.info("Filtro de Periodo carregado dinamicamente abaixo.")
+    # Season/period are pushed down to the query (only the selected seasons are scanned)
+    sel_seasons = st.multiselect(
+        "Temporadas:", sorted(get_available_seasons(PROJECT_ID, DATASET_ID), reverse=True),
+        default=[], help="Deixe vazio para ver todas."
+    )
+    date_slot = st.container()
 
 with col_filter_4:
     top_n = st.number_input("Top N:", 1, 100, 10)
@@ -52,9 +58,8 @@ col_scope_1, col_scope_2 = st.columns(2)
 # Load Teams
 @st.cache_data(ttl=3600)
 def load_team_list():
-    client = get_bq_client(project=PROJECT_ID)
     q = get_all_teams_query(PROJECT_ID, DATASET_ID)
-    df = client.query(q).to_dataframe()
+    df = run_query(q, project=PROJECT_ID)
     return df["team"].tolist()
 
 ALL_TEAMS = load_team_list()
@@ -62,10 +67,9 @@ ALL_TEAMS = load_team_list()
 # Load Players (Dynamic based on team selection)
 @st.cache_data(ttl=300)
 def load_player_list(selected_teams=None):
-    client = get_bq_client(project=PROJECT_ID)
     teams_param = selected_teams if selected_teams else None
     q = get_all_players_query(PROJECT_ID, DATASET_ID, teams_param)
-    df = client.query(q).to_dataframe()
+    df = run_query(q.sql, q.params, project=PROJECT_ID)
     return df["player"].unique().tolist() 
 
 with col_scope_1:
@@ -110,7 +114,7 @@ EVENT_TYPES = [
 ]
 
 OUTCOMES = ["Sucesso", "Falha"]
-QUALIFIERS = ["KeyPass", "Assisted", "BigChanceCreated", "LeadingToGoal", "LeadingToAttempt", "Head", "Cross", "Corner", "FreeKick", "Penalty", "Throughball", "Longball", "Chipped", "LayOff", "Volley", "OwnGoal", "Red", "Yellow"]
+QUALIFIERS = list(QUALIFIER_TAGS)  # same vocabulary as the event cube bitmask
 
 
 
@@ -176,28 +180,45 @@ else:
 # (Constants moved to top)
 
 # Dynamic Loader
-
-@st.cache_data(ttl=300) 
-def load_dynamic_data(subj, etypes, outs, quals, use_rel, teams, players, a_type, d_types=None, d_outs=None, d_quals=None):
-    client = get_bq_client(project=PROJECT_ID)
-    
-    if a_type == "Volume Total":
-        query = get_dynamic_ranking_query(PROJECT_ID, DATASET_ID, subj, etypes, outs, quals, use_rel, teams, players, perspective="pro")
-    else:
-        # Conversion
-        query = get_conversion_ranking_query(
-            PROJECT_ID, DATASET_ID, subj,
-            etypes, outs, quals,
-            d_types, d_outs, d_quals,
-            teams, players, perspective="pro"
-        )
+# Pro and against come from one shared query (src/rankings.py): switching
+# between the two ranking pages reuses the cached result.
+# Aggregation, metric and Top N run in SQL: only the ranked rows come back.
+def load_dynamic_data(subj, etypes, outs, quals, use_rel, teams, players, a_type, d_types=None, d_outs=None, d_quals=None, seasons=None, date_range=None):
+    df = load_ranking_data(
+        PROJECT_ID, DATASET_ID, subj, etypes, outs, quals, use_rel, teams, players,
+        a_type, d_types, d_outs, d_quals, seasons=seasons, date_range=date_range,
+        by_season=aggregation_mode == "Por Temporada",
+        per_match=normalization_mode == "Por Jogo",
+        top_n=int(top_n),
+    )
+    return ranking_perspective(df, "pro")
 
 
-    df = client.query(query).to_dataframe()
+# Period filter (bounds from the schedule, applied in SQL)
+@st.cache_data(ttl=3600)
+def load_date_bounds(seasons=None):
+    q = get_season_date_bounds_query(PROJECT_ID, DATASET_ID, seasons)
+    df = run_query(q, project=PROJECT_ID)
+    if df.empty or pd.isna(df["min_date"].iloc[0]):
+        return None, None
+    return pd.to_datetime(df["min_date"].iloc[0]).date(), pd.to_datetime(df["max_date"].iloc[0]).date()
+
+with date_slot:
+    min_date, max_date = load_date_bounds(tuple(sel_seasons) if sel_seasons else None)
+    if min_date is None:
+        # Fallback if empty
+        min_date = datetime.now().date() - timedelta(days=365)
+        max_date = datetime.now().date()
 
-    if "match_date" in df.columns:
-        df["match_date"] = pd.to_datetime(df["match_date"]).dt.date
-    return df
+    date_range = st.date_input(
+        "Período (Filtro):",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date,
+        format="DD/MM/YYYY"
+    )
+q_seasons = tuple(sel_seasons) if sel_seasons else None
+q_date_range = tuple(date_range) if isinstance(date_range, tuple) else (date_range, None)
 
 
 try:
@@ -219,7 +240,8 @@ try:
              
         df_raw = load_dynamic_data(
             subject, num_types, num_out, num_qual, False, q_teams, q_players,
-            analysis_type, den_types, den_out, den_qual
+            analysis_type, den_types, den_out, den_qual,
+            seasons=q_seasons, date_range=q_date_range
         )
     else:
         # Standard
@@ -230,7 +252,7 @@ try:
 
         df_raw = load_dynamic_data(
             subject, q_types, q_outcomes, q_qualifiers, use_related, q_teams, q_players,
-            analysis_type
+            analysis_type, seasons=q_seasons, date_range=q_date_range
         )
 
 
@@ -240,132 +262,32 @@ except Exception as e:
     st.stop()
 
 
-# --- 4. DATE FILTER WITH DYNAMIC DEFAULTS ---
-with col_filter_3:
-    # Determine min/max from data for default
-    if not df_raw.empty and "match_date" in df_raw.columns:
-        min_date = df_raw["match_date"].min()
-        max_date = df_raw["match_date"].max()
-    else:
-        # Fallback if empty
-        min_date = datetime.now().date() - timedelta(days=365)
-        max_date = datetime.now().date()
-        
-    # Ensure current date_range (if set previously in session state) is valid
-    # But this is a fresh render.
-    
-    date_range = st.date_input(
-        "Período (Filtro):",
-        value=(min_date, max_date),
-        format="DD/MM/YYYY"
-    )
-
-# 4.0 Normalize IDs (Critical for Dynamic vs Standard Queries)
-# Apply even if empty to ensure columns exist for downstream
-if "game_id" in df_raw.columns and "match_id" not in df_raw.columns:
-    df_raw["match_id"] = df_raw["game_id"]
-elif "match_id" in df_raw.columns and "game_id" not in df_raw.columns:
-    df_raw["game_id"] = df_raw["match_id"]
-
-# 4.1 Apply Date Filter
-if isinstance(date_range, tuple) and len(date_range) == 2:
-    start_date, end_date = date_range
-    mask = (df_raw["match_date"] >= start_date) & (df_raw["match_date"] <= end_date)
-    df_filtered = df_raw[mask].copy()
-elif isinstance(date_range, tuple) and len(date_range) == 1:
-    # User selected only start date
-    start_date = date_range[0]
-    mask = (df_raw["match_date"] >= start_date)
-    df_filtered = df_raw[mask].copy()
-else:
-    df_filtered = df_raw.copy()
+# 4.1 Aggregation (per season / historical), metric (total, per match,
+# conversion %) and Top N already applied in SQL; rows come ranked.
+df_sorted = df_raw.copy()
 
-if df_filtered.empty:
+if df_sorted.empty:
     st.warning("Nenhum dado encontrado para o período selecionado.")
     # st.stop() # Removed stop to allow changing filters even if empty
 
 
-
-# 4.2 Aggregation Logic
+# 4.2 Display Name
 if subject == "Equipes":
-    # TEAM LOGIC
-    if aggregation_mode == "Por Temporada":
-        groupby_cols = ["team", "season"]
-        # Determine display name base (will append season)
-        df_filtered["base_name"] = df_filtered["team"] 
-        
-    else: # Historico
-        groupby_cols = ["team"]
-        df_filtered["base_name"] = df_filtered["team"]
-        
-    # Aggregation
-    agg_dict = {
-        "goals_for": "sum", "goals_against": "sum", 
-        "metric_count": "sum", # Standard mode
-        "numerator": "sum", # Conversion mode
-        "denominator": "sum" # Conversion mode
-    }
-    
-    # Filter known columns only (safe check)
-    valid_cols = [c for c in agg_dict.keys() if c in df_filtered.columns]
-    agg_dict_final = {k: agg_dict[k] for k in valid_cols}
-    
-    df_agg = df_filtered.groupby(groupby_cols).agg(agg_dict_final).reset_index()
-        
-    matches = df_filtered.groupby(groupby_cols)["match_id"].nunique().reset_index(name="matches")
-    df_agg = pd.merge(df_agg, matches, on=groupby_cols)
-
-    # Display Name Reconstruction (Robust)
-    if "season" in df_agg.columns:
-        df_agg["display_name"] = df_agg["team"] + " (" + df_agg["season"].astype(str) + ")"
+    if "season" in df_sorted.columns:
+        df_sorted["display_name"] = df_sorted["team"].astype(str) + " (" + df_sorted["season"].astype(str) + ")"
     else:
-         df_agg["display_name"] = df_agg["team"]
-
+        df_sorted["display_name"] = df_sorted["team"].astype(str)
 
 elif subject == "Jogadores":
-    # PLAYER LOGIC
-    
-    if aggregation_mode == "Por Temporada":
-        groupby_cols = ["player", "team", "season"]
-    else: 
-        groupby_cols = ["player"]
-
-    agg_dict = {
-        "goals": "sum", "shots": "sum", 
-        "metric_count": "sum",
-        "numerator": "sum",
-        "denominator": "sum"
-    }
-    
-    # Filter known columns only (safe check)
-    valid_cols = [c for c in agg_dict.keys() if c in df_filtered.columns]
-    agg_dict_final = {k: agg_dict[k] for k in valid_cols}
-
-    df_agg = df_filtered.groupby(groupby_cols).agg(agg_dict_final).reset_index()
-    
-    # Count matches: distinct game_id per group
-    matches = df_filtered.groupby(groupby_cols)["game_id"].nunique().reset_index(name="matches")
-    df_agg = pd.merge(df_agg, matches, on=groupby_cols)
-
-    # Display Name Reconstruction (Robust)
-    if "season" in df_agg.columns:
-        df_agg["display_name"] = df_agg["player"] + " (" + df_agg["team"] + " " + df_agg["season"].astype(str) + ")"
+    if "season" in df_sorted.columns:
+        df_sorted["display_name"] = df_sorted["player"].astype(str) + " (" + df_sorted["team"].astype(str) + " " + df_sorted["season"].astype(str) + ")"
     else:
-        df_agg["display_name"] = df_agg["player"]
-        
-    # Alias for consistency with team cols
-    if "goals" in df_agg.columns: df_agg["goals_for"] = df_agg["goals"] 
-    if "shots" in df_agg.columns: df_agg["total_shots"] = df_agg["shots"]
+        df_sorted["display_name"] = df_sorted["player"].astype(str)
 
 
-# 4.3 Metrics Calculation (Per Match)
-# 4.3 Metrics Mapping
-# 4.3 Metrics Mapping
-# 4.3 Metrics Calculation (Standard) vs Conversion Ratio
+# 4.3 Metric Labels (Standard vs Conversion Ratio)
 if analysis_type == "Eficiência/Conversão":
     base_col = "ratio_pct"
-    df_agg["ratio_val"] = (df_agg["numerator"] / df_agg["denominator"]).fillna(0)
-    df_agg["ratio_pct"] = df_agg["ratio_val"] * 100
     
     # Label
     # Simplify label construction
@@ -378,7 +300,6 @@ if analysis_type == "Eficiência/Conversão":
     metric_label = f"{base_label} (%)"
     text_format = ".1f"
     metric_col = "display_metric"
-    df_agg[metric_col] = df_agg["ratio_pct"]
 
 else:
     # Standard Logic
@@ -398,11 +319,9 @@ else:
         base_label = base_label[:47] + "..."
     
     if normalization_mode == "Por Jogo":
-        df_agg["display_metric"] = (df_agg[base_col] / df_agg["matches"]).fillna(0)
         metric_label = f"{base_label} / Jogo"
         text_format = ".2f"
     else:
-        df_agg["display_metric"] = df_agg[base_col]
         metric_label = f"Total {base_label}"
         text_format = ".0f"
     
@@ -411,9 +330,6 @@ else:
 
 # --- 5. VISUALIZATION ---
 
-# Sort and Limit Globally
-df_sorted = df_agg.sort_values(metric_col, ascending=False).head(top_n)
-
 # Tabs
 tab1, tab2 = st.tabs(["📊 Rankings (Gols)", "📋 Dados Detalhados"])
 
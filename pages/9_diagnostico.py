@@ -6,7 +6,7 @@ import os
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.bq_io import get_bq_client
+from src.bq_io import run_query
 from src.queries import get_teams_match_count_query
 from src.css import load_css
 
@@ -27,9 +27,8 @@ DATASET_ID = "betterdata"
 
 @st.cache_data(ttl=60)
 def load_audit_data():
-    client = get_bq_client(project=PROJECT_ID)
     query = get_teams_match_count_query(PROJECT_ID, DATASET_ID)
-    df = client.query(query).to_dataframe()
+    df = run_query(query, project=PROJECT_ID)
     return df
 
 try:
@@ -96,7 +95,7 @@ with tab_macro:
         st.info("Selecione temporadas acima para visualizar o acumulado.")
     else:
         # Aggregation
-        df_macro = df_show.groupby("team")["total_games"].sum().reset_index()
+        df_macro = df_show.groupby("team", observed=True)["total_games"].sum().reset_index()
         df_macro = df_macro.sort_values("total_games", ascending=False)
         
         # Calculate Expected Games
@@ -105,7 +104,7 @@ with tab_macro:
         # We can just show the number of seasons present for that team.
         
         # Count unique seasons per team in the selection
-        seasons_per_team = df_show.groupby("team")["season"].nunique().reset_index(name="num_seasons")
+        seasons_per_team = df_show.groupby("team", observed=True)["season"].nunique().reset_index(name="num_seasons")
         df_macro = pd.merge(df_macro, seasons_per_team, on="team")
         
         # Display
@@ -118,20 +117,13 @@ with tab_macro:
                 "num_seasons": "Temporadas Disputadas (na seleção)"
             },
             hide_index=True
-            },
-            hide_index=True
         )
 
-    except Exception as e:
-        st.error(f"Erro na inspeção: {e}")
-
 st.divider()
 st.subheader("🔍 Validação de Métricas: Assistências vs KeyPasses")
 
 if st.button("Executar Diagnóstico Cruzado"):
     try:
-        client = get_bq_client(project=PROJECT_ID)
-        
         # Query 1: Count KeyPasses (Standard)
         q_kp = f"""
         SELECT COUNT(*) as cnt 
@@ -139,7 +131,7 @@ if st.button("Executar Diagnóstico Cruzado"):
         WHERE type = 'Pass' 
         AND REGEXP_CONTAINS(qualifiers, r"['\\\"]displayName['\\\"]\\s*:\\s*['\\\"]KeyPass['\\\"]")
         """
-        df_kp = client.query(q_kp).to_dataframe()
+        df_kp = run_query(q_kp, project=PROJECT_ID)
         val_kp = df_kp['cnt'].iloc[0]
         
         # Query 2: Count True Assists (Goal Relationship)
@@ -149,7 +141,7 @@ if st.button("Executar Diagnóstico Cruzado"):
         WHERE type = 'Goal' 
         AND related_player_id IS NOT NULL
         """
-        df_assist = client.query(q_assist).to_dataframe()
+        df_assist = run_query(q_assist, project=PROJECT_ID)
         val_assist = df_assist['cnt'].iloc[0]
         
         col1, col2, col3 = st.columns(3)
@@ -0,0 +1,640 @@
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# -----------------------------
+# Arrow -> pandas (dtypes compactos)
+# -----------------------------
+# Os resultados chegam como Arrow (BigQuery Storage Read API / DuckDB) e são
+# convertidos uma única vez para dtypes enxutos:
+#   - textos repetitivos (team, player, type, outcome_type...) -> category
+#   - coordenadas -> float32
+#   - inteiros sem nulos que cabem em 32 bits -> int32
+#   - DATE/TIMESTAMP -> datetime64 nativo; NUMERIC/HUGEINT -> int64/float64
+# Resultados pequenos (listas para dropdowns) ficam como texto comum.
+
+CATEGORY_MIN_ROWS = 1000
+CATEGORY_MAX_RATIO = 0.5
+FLOAT32_COLUMNS = {"x", "y", "end_x", "end_y", "x_start", "y_start", "x_end", "y_end"}
+
+_INT32 = np.iinfo(np.int32)
+
+
+def _to_categorical(col: pa.ChunkedArray) -> pd.Categorical:
+    """Categorias em ordem alfabética (sort_values continua lexicográfico)."""
+    categories = pc.unique(col).drop_null()
+    categories = categories.take(pc.sort_indices(categories))
+    codes = pc.fill_null(pc.index_in(col, value_set=categories), -1)
+    return pd.Categorical.from_codes(codes.to_numpy(), categories=categories.to_pylist())
+
+
+def _compact_column(name: str, col: pa.ChunkedArray, num_rows: int) -> pd.Series:
+    t = col.type
+    if pa.types.is_dictionary(t):
+        col = pc.cast(col, t.value_type)
+        t = col.type
+
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        if num_rows >= CATEGORY_MIN_ROWS and pc.count_distinct(col).as_py() <= num_rows * CATEGORY_MAX_RATIO:
+            return pd.Series(_to_categorical(col))
+    elif pa.types.is_floating(t) and name in FLOAT32_COLUMNS:
+        col = pc.cast(col, pa.float32())
+    elif pa.types.is_integer(t) and col.null_count == 0 and num_rows:
+        bounds = pc.min_max(col)
+        if _INT32.min <= bounds["min"].as_py() and bounds["max"].as_py() <= _INT32.max:
+            col = pc.cast(col, pa.int32())
+    elif pa.types.is_decimal(t):
+        try:
+            col = pc.cast(col, pa.int64()) if t.scale == 0 else pc.cast(col, pa.float64(), safe=False)
+        except pa.ArrowInvalid:
+            col = pc.cast(col, pa.float64(), safe=False)
+
+    return col.to_pandas(date_as_object=False)
+
+
+def to_compact_frame(table: pa.Table) -> pd.DataFrame:
+    """Converte um resultado Arrow em DataFrame com dtypes compactos."""
+    if table.num_columns == 0:
+        return pd.DataFrame(index=pd.RangeIndex(table.num_rows))
+    series = [_compact_column(name, col, table.num_rows) for name, col in zip(table.column_names, table.columns)]
+    df = pd.concat(series, axis=1)
+    df.columns = table.column_names  # preserva nomes repetidos
+    return df
+
+
+# -----------------------------
+# Interface
+# -----------------------------
+class QueryBackend:
+    """
+    Interface mínima de execução usada pelas páginas.
+    O SQL é sempre o dialeto do BigQuery gerado por `src/queries.py` e pelos
+    loaders das páginas; cada backend é responsável por executá-lo.
+    `params` usa os próprios tipos do BigQuery (ScalarQueryParameter /
+    ArrayQueryParameter) como formato comum.
+    """
+
+    name = "base"
+    label = "Backend"
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def table_columns(self, table_id: str) -> List[str]:
+        """Lista as colunas de `projeto.dataset.tabela`."""
+        raise NotImplementedError
+
+    def dataset_columns(self, project_id: str, dataset_id: str) -> pd.DataFrame:
+        """
+        Todas as colunas do dataset numa única chamada:
+        DataFrame(table_name, column_name, data_type) com tipos no padrão BigQuery.
+        """
+        raise NotImplementedError
+
+    def materialize(
+        self,
+        table_id: str,
+        select_sql: str,
+        partition_by: Optional[str] = None,
+        cluster_by: Optional[Sequence[str]] = None,
+    ) -> None:
+        """
+        (Re)cria `projeto.dataset.tabela` com o resultado de `select_sql`.
+        partition_by: coluna inteira (ex: season) usada como partição.
+        cluster_by: colunas de clustering / ordenação física.
+        """
+        raise NotImplementedError
+
+    def append(self, table_id: str, select_sql: str, partition_by: Optional[str] = None) -> None:
+        """
+        Acrescenta o resultado de `select_sql` a uma tabela já materializada
+        (mesmas colunas, mesma ordem). Usado nas atualizações incrementais.
+        """
+        raise NotImplementedError
+
+
+# Faixa de partições inteiras (RANGE_BUCKET) para tabelas particionadas por temporada
+PARTITION_RANGE = (2000, 2100)
+
+
+# -----------------------------
+# BigQuery
+# -----------------------------
+class BigQueryBackend(QueryBackend):
+    name = "bigquery"
+
+    def __init__(self, client):
+        self.client = client
+
+    @property
+    def label(self) -> str:
+        return f"BigQuery ({self.client.project})"
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+        from google.cloud import bigquery
+
+        cfg = bigquery.QueryJobConfig(query_parameters=list(params or []))
+        job = self.client.query(sql, job_config=cfg)
+        # Storage Read API (google-cloud-bigquery-storage) quando disponível
+        return to_compact_frame(job.to_arrow(create_bqstorage_client=True))
+
+    def table_columns(self, table_id: str) -> List[str]:
+        return [f.name for f in self.client.get_table(table_id).schema]
+
+    def dataset_columns(self, project_id: str, dataset_id: str) -> pd.DataFrame:
+        sql = f"""
+        SELECT table_name, column_name, data_type
+        FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.COLUMNS`
+        ORDER BY table_name, ordinal_position
+        """
+        return self.query(sql)
+
+    def materialize(
+        self,
+        table_id: str,
+        select_sql: str,
+        partition_by: Optional[str] = None,
+        cluster_by: Optional[Sequence[str]] = None,
+    ) -> None:
+        ddl = f"CREATE OR REPLACE TABLE `{table_id}`"
+        if partition_by:
+            lo, hi = PARTITION_RANGE
+            ddl += f"\nPARTITION BY RANGE_BUCKET({partition_by}, GENERATE_ARRAY({lo}, {hi}, 1))"
+        if cluster_by:
+            # BigQuery aceita no máximo 4 colunas de clustering
+            ddl += f"\nCLUSTER BY {', '.join(list(cluster_by)[:4])}"
+        ddl += f"\nAS\n{select_sql}"
+        self.client.query(ddl).result()
+
+    def append(self, table_id: str, select_sql: str, partition_by: Optional[str] = None) -> None:
+        self.client.query(f"INSERT INTO `{table_id}`\n{select_sql}").result()
+
+
+# -----------------------------
+# Local (Parquet + DuckDB)
+# -----------------------------
+# Cada tabela do BigQuery `projeto.dataset.<tabela>` é procurada em
+# `<data_dir>/<tabela>.parquet` ou em `<data_dir>/<tabela>/` (diretório com
+# arquivos .parquet, opcionalmente particionado no estilo hive: season=2025/).
+
+_TABLE_REF = re.compile(r"`([\w\-]+)\.([\w\-]+)\.(\w+)`")
+# Corpo de r'...': uma aspa escapada com barra (r"[\"']") não fecha o literal
+_RAW_STRING = re.compile(r"(?<![\w'\"])[rR]('''|'|\")((?:\\.|(?!\1).)*)\1", re.DOTALL)
+_PARAM = re.compile(r"@(\w+)")
+_IN_UNNEST = re.compile(r"\bIN\s+UNNEST\s*\(\s*(\$\w+)\s*\)", re.IGNORECASE)
+_FLOAT64 = re.compile(r"\bFLOAT64\b", re.IGNORECASE)
+_SAFE_CAST = re.compile(r"\bSAFE_CAST\s*\(", re.IGNORECASE)
+
+_DUCKDB_MACROS = [
+    "CREATE OR REPLACE MACRO regexp_contains(s, p) AS regexp_matches(s, p)",
+    "CREATE OR REPLACE MACRO safe_divide(a, b) AS CASE WHEN b = 0 THEN NULL ELSE a / b END",
+]
+
+
+# Tipos DuckDB -> nomes do BigQuery (para o schema registry)
+_DUCKDB_TYPE_NAMES = {
+    "VARCHAR": "STRING",
+    "BIGINT": "INT64",
+    "INTEGER": "INT64",
+    "SMALLINT": "INT64",
+    "TINYINT": "INT64",
+    "HUGEINT": "INT64",
+    "DOUBLE": "FLOAT64",
+    "FLOAT": "FLOAT64",
+    "BOOLEAN": "BOOL",
+    "DATE": "DATE",
+    "TIMESTAMP": "DATETIME",
+    "TIMESTAMP WITH TIME ZONE": "TIMESTAMP",
+}
+
+
+def _raw_to_literal(m: re.Match) -> str:
+    body = m.group(2)
+    return "'" + body.replace("'", "''") + "'"
+
+
+def translate_sql(sql: str) -> str:
+    r"""
+    Converte o subconjunto do dialeto BigQuery usado no projeto para DuckDB.
+    Tabelas com crase viram nomes simples (as views são criadas pelo backend).
+
+    >>> print(translate_sql(r'''REGEXP_CONTAINS(q, r"['\"]KeyPass['\"]")'''))
+    REGEXP_CONTAINS(q, '[''\"]KeyPass[''\"]')
+    """
+    out = _RAW_STRING.sub(_raw_to_literal, sql)
+    out = _TABLE_REF.sub(lambda m: f'"{m.group(3)}"', out)
+    out = _PARAM.sub(r"$\1", out)
+    out = _IN_UNNEST.sub(r"IN (SELECT UNNEST(\1))", out)
+    out = _FLOAT64.sub("DOUBLE", out)
+    out = _SAFE_CAST.sub("TRY_CAST(", out)
+    return out
+
+
+def _param_values(params: Optional[Sequence]) -> Dict[str, object]:
+    values: Dict[str, object] = {}
+    for p in params or []:
+        if hasattr(p, "values"):      # ArrayQueryParameter
+            values[p.name] = list(p.values)
+        else:                         # ScalarQueryParameter
+            values[p.name] = p.value
+    return values
+
+
+class DuckDBBackend(QueryBackend):
+    name = "local"
+
+    def __init__(self, data_dir: str):
+        try:
+            import duckdb
+        except ImportError as e:  # pragma: no cover - depende do ambiente
+            raise ImportError(
+                "O backend local precisa do pacote `duckdb` (pip install duckdb)."
+            ) from e
+
+        self.data_dir = os.path.abspath(data_dir)
+        self._con = duckdb.connect(database=":memory:")
+        self._lock = threading.Lock()
+        self._views: set[str] = set()
+        for stmt in _DUCKDB_MACROS:
+            self._con.execute(stmt)
+
+    @property
+    def label(self) -> str:
+        return f"Local ({self.data_dir})"
+
+    def _source_for(self, table: str) -> Optional[str]:
+        single = os.path.join(self.data_dir, f"{table}.parquet")
+        if os.path.isfile(single):
+            return f"read_parquet('{single}')"
+        folder = os.path.join(self.data_dir, table)
+        if os.path.isdir(folder):
+            pattern = os.path.join(folder, "**", "*.parquet")
+            return f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+        return None
+
+    def _ensure_view(self, table: str) -> None:
+        if table in self._views:
+            return
+        with self._lock:
+            if table in self._views:
+                return
+            source = self._source_for(table)
+            if source is None:
+                raise FileNotFoundError(
+                    f"Tabela `{table}` não encontrada em {self.data_dir} "
+                    f"(esperado {table}.parquet ou {table}/)."
+                )
+            self._con.execute(f'CREATE OR REPLACE VIEW "{table}" AS SELECT * FROM {source}')
+            self._views.add(table)
+
+    def refresh(self) -> None:
+        """Esquece as views criadas (use após gravar novos arquivos)."""
+        with self._lock:
+            self._views.clear()
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+        for m in _TABLE_REF.finditer(sql):
+            self._ensure_view(m.group(3))
+        cur = self._con.cursor()
+        try:
+            result = cur.execute(translate_sql(sql), _param_values(params) or None)
+            fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+            return to_compact_frame(fetch())
+        finally:
+            cur.close()
+
+    def materialize(
+        self,
+        table_id: str,
+        select_sql: str,
+        partition_by: Optional[str] = None,
+        cluster_by: Optional[Sequence[str]] = None,
+    ) -> None:
+        """
+        Grava o resultado em `<data_dir>/<tabela>/` (Parquet, particionado no
+        estilo hive quando `partition_by` é informado). A escrita é feita num
+        diretório temporário e trocada no final, então leitores nunca veem
+        uma tabela pela metade.
+        """
+        for m in _TABLE_REF.finditer(select_sql):
+            self._ensure_view(m.group(3))
+
+        table = table_id.strip("`").split(".")[-1]
+        target = os.path.join(self.data_dir, table)
+        staging = f"{target}.tmp-{uuid.uuid4().hex[:8]}"
+
+        order = f" ORDER BY {', '.join(cluster_by)}" if cluster_by else ""
+        body = f"SELECT * FROM ({translate_sql(select_sql)}) AS src{order}"
+        if partition_by:
+            dest = staging
+            options = f"FORMAT PARQUET, PARTITION_BY ({partition_by})"
+        else:
+            os.makedirs(staging)
+            dest = os.path.join(staging, "part-0.parquet")
+            options = "FORMAT PARQUET"
+
+        cur = self._con.cursor()
+        try:
+            cur.execute(f"COPY ({body}) TO '{dest}' ({options})")
+        finally:
+            cur.close()
+
+        with self._lock:
+            backup = None
+            if os.path.isdir(target):
+                backup = f"{target}.old-{uuid.uuid4().hex[:8]}"
+                os.replace(target, backup)
+            os.replace(staging, target)
+            self._views.discard(table)
+        if backup:
+            shutil.rmtree(backup, ignore_errors=True)
+
+    def append(self, table_id: str, select_sql: str, partition_by: Optional[str] = None) -> None:
+        """
+        Grava o resultado como novos arquivos Parquet dentro de `<data_dir>/<tabela>/`
+        (um arquivo por partição). Cada arquivo é movido pronto para o lugar.
+        """
+        for m in _TABLE_REF.finditer(select_sql):
+            self._ensure_view(m.group(3))
+
+        table = table_id.strip("`").split(".")[-1]
+        target = os.path.join(self.data_dir, table)
+        if not os.path.isdir(target):
+            raise FileNotFoundError(f"Tabela `{table}` não materializada em {self.data_dir}.")
+        staging = f"{target}.tmp-{uuid.uuid4().hex[:8]}"
+        suffix = uuid.uuid4().hex[:8]
+
+        body = f"SELECT * FROM ({translate_sql(select_sql)}) AS src"
+        if partition_by:
+            dest, options = staging, f"FORMAT PARQUET, PARTITION_BY ({partition_by})"
+        else:
+            os.makedirs(staging)
+            dest, options = os.path.join(staging, "part-0.parquet"), "FORMAT PARQUET"
+
+        cur = self._con.cursor()
+        try:
+            cur.execute(f"COPY ({body}) TO '{dest}' ({options})")
+        finally:
+            cur.close()
+
+        with self._lock:
+            for root, _, files in os.walk(staging):
+                rel = os.path.relpath(root, staging)
+                os.makedirs(os.path.join(target, rel), exist_ok=True)
+                for name in files:
+                    base, ext = os.path.splitext(name)
+                    os.replace(os.path.join(root, name), os.path.join(target, rel, f"{base}-{suffix}{ext}"))
+            self._views.discard(table)
+        shutil.rmtree(staging, ignore_errors=True)
+
+    def _describe(self, table: str) -> List[tuple]:
+        self._ensure_view(table)
+        cur = self._con.cursor()
+        try:
+            return cur.execute(f'DESCRIBE "{table}"').fetchall()
+        finally:
+            cur.close()
+
+    def table_columns(self, table_id: str) -> List[str]:
+        table = table_id.strip("`").split(".")[-1]
+        return [r[0] for r in self._describe(table)]
+
+    def local_tables(self) -> List[str]:
+        """Tabelas disponíveis em data_dir (arquivos .parquet ou diretórios)."""
+        tables = []
+        for entry in sorted(os.listdir(self.data_dir)):
+            if entry.startswith((".", "_")) or ".tmp-" in entry or ".old-" in entry:
+                continue
+            path = os.path.join(self.data_dir, entry)
+            if entry.endswith(".parquet") and os.path.isfile(path):
+                tables.append(entry[: -len(".parquet")])
+            elif os.path.isdir(path):
+                tables.append(entry)
+        return tables
+
+    def dataset_columns(self, project_id: str, dataset_id: str) -> pd.DataFrame:
+        rows = []
+        for table in self.local_tables():
+            for name, dtype, *_ in self._describe(table):
+                rows.append((table, name, _DUCKDB_TYPE_NAMES.get(str(dtype).upper(), str(dtype).upper())))
+        return pd.DataFrame(rows, columns=["table_name", "column_name", "data_type"])
+
+
+# -----------------------------
+# Híbrido (snapshot local + BigQuery)
+# -----------------------------
+# Temporadas encerradas não mudam: ficam num snapshot Parquet local (mesmo
+# layout do backend local). Só o que o snapshot não tem é lido do BigQuery e
+# guardado no DuckDB, com apenas as colunas que as queries citam. A cópia da
+# temporada atual é relida a cada `refresh_seconds`; a de temporadas
+# encerradas ausentes do snapshot é lida uma vez só. A leitura remota roda
+# fora do lock e a tabela nova entra no lugar da antiga no final. O SQL roda
+# inteiro no DuckDB sobre a união das partes.
+
+_SEASON_TABLE = re.compile(r"^(\w+)_(\d{4})$")
+_SEASON_DIR = re.compile(r"^season=(\d{4})$")
+_WORD = re.compile(r"\w+")
+
+
+def _selects_all(sql: str, table: str) -> bool:
+    """O SQL faz SELECT * (ou alias.*) direto sobre a tabela? Então todas as colunas saem dela."""
+    pattern = rf"\bSELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?\*(?:(?!\bSELECT\b).)*?`[\w\-]+\.[\w\-]+\.{table}`"
+    return re.search(pattern, sql, re.IGNORECASE | re.DOTALL) is not None
+
+
+class HybridBackend(DuckDBBackend):
+    name = "hybrid"
+
+    def __init__(
+        self,
+        snapshot_dir: str,
+        remote: QueryBackend,
+        current_season: int,
+        refresh_seconds: float = 900,
+    ):
+        super().__init__(snapshot_dir)
+        self.remote = remote
+        self.current_season = int(current_season)
+        self.refresh_seconds = refresh_seconds
+        self._refs: Dict[str, tuple] = {}        # tabela -> (projeto, dataset)
+        self._columns: Dict[str, List[str]] = {}  # tabela -> colunas no BigQuery
+        self._plans: Dict[str, tuple] = {}       # tabela -> (fonte local, partes remotas)
+        self._copies: Dict[tuple, tuple] = {}    # (tabela, parte) -> (colunas, quando foi lida)
+        self._fetching: Dict[tuple, threading.Lock] = {}
+
+    @property
+    def label(self) -> str:
+        return f"Híbrido ({self.data_dir} + {self.remote.label}, temporada {self.current_season})"
+
+    def _closed_partitions(self, folder: str) -> Dict[int, List[str]]:
+        """{temporada: arquivos} das partições season=AAAA já encerradas no snapshot."""
+        partitions: Dict[int, List[str]] = {}
+        for entry in sorted(os.listdir(folder)):
+            m = _SEASON_DIR.match(entry)
+            if not m or int(m.group(1)) >= self.current_season:
+                continue
+            files = [
+                os.path.join(root, f)
+                for root, _, names in os.walk(os.path.join(folder, entry))
+                for f in sorted(names) if f.endswith(".parquet")
+            ]
+            if files:
+                partitions[int(m.group(1))] = files
+        return partitions
+
+    def _remote_columns(self, table: str) -> List[str]:
+        if table not in self._columns:
+            project, dataset = self._refs[table]
+            self._columns[table] = self.remote.table_columns(f"{project}.{dataset}.{table}")
+        return self._columns[table]
+
+    def _plan(self, table: str) -> tuple:
+        """
+        (fonte local, [(parte, filtro, parâmetros)]) de uma tabela. A parte
+        "closed" cobre temporadas encerradas que faltam no snapshot (nunca
+        vence); a parte "current" é relida a cada `refresh_seconds`.
+        """
+        if table in self._plans:
+            return self._plans[table]
+
+        m = _SEASON_TABLE.match(table)
+        if m and int(m.group(2)) < self.current_season:
+            # Tabela de uma temporada encerrada: o snapshot, ou uma cópia que não vence
+            local = super()._source_for(table)
+            plan = (local, []) if local is not None else (None, [("closed", "", None)])
+        elif m or "season" not in self._remote_columns(table):
+            plan = (None, [("current", "", None)])
+        else:
+            # Tabela particionada: temporadas encerradas do snapshot + o resto do BigQuery
+            from google.cloud import bigquery
+
+            folder = os.path.join(self.data_dir, table)
+            partitions = self._closed_partitions(folder) if os.path.isdir(folder) else {}
+            local = None
+            if partitions:
+                listed = ", ".join(f"'{f}'" for files in partitions.values() for f in files)
+                local = f"read_parquet([{listed}], hive_partitioning = true, union_by_name = true)"
+
+            season = [bigquery.ScalarQueryParameter("current_season", "INT64", self.current_season)]
+            closed_where, closed_params = "season < @current_season", list(season)
+            if partitions:
+                closed_where += " AND season NOT IN UNNEST(@snapshot_seasons)"
+                closed_params.append(bigquery.ArrayQueryParameter("snapshot_seasons", "INT64", sorted(partitions)))
+            plan = (local, [
+                ("closed", closed_where, closed_params),
+                ("current", "season >= @current_season", season),
+            ])
+        self._plans[table] = plan
+        return plan
+
+    def _is_fresh(self, key: tuple, columns: Sequence[str]) -> bool:
+        held = self._copies.get(key)
+        if held is None or not set(columns) <= held[0]:
+            return False
+        return key[1] == "closed" or time.time() - held[1] <= self.refresh_seconds
+
+    def _ensure_copy(self, table: str, part: str, where: str, params, columns: Sequence[str]) -> None:
+        """Lê do BigQuery a parte remota (fora do lock) e troca a cópia no DuckDB."""
+        key = (table, part)
+        if self._is_fresh(key, columns):
+            return
+        with self._lock:
+            fetching = self._fetching.setdefault(key, threading.Lock())
+        # Cópia só vencida e outra thread já relendo: segue com a atual
+        held = self._copies.get(key)
+        stale_only = held is not None and set(columns) <= held[0]
+        if not fetching.acquire(blocking=not stale_only):
+            return
+        try:
+            if self._is_fresh(key, columns):
+                return
+            # Colunas só crescem: a cópia nova também serve às queries anteriores
+            held = self._copies.get(key)
+            wanted = set(columns) | (held[0] if held is not None else set())
+            ordered = [c for c in self._remote_columns(table) if c in wanted]
+
+            project, dataset = self._refs[table]
+            sql = f"SELECT {', '.join(ordered)} FROM `{project}.{dataset}.{table}`"
+            if where:
+                sql += f" WHERE {where}"
+            df = self.remote.query(sql, params)
+
+            name = f"__remote_{table}_{part}"
+            cur = self._con.cursor()
+            try:
+                cur.register("__remote_df", df)
+                cur.execute(f'CREATE OR REPLACE TABLE "{name}__new" AS SELECT * FROM __remote_df')
+                cur.unregister("__remote_df")
+            finally:
+                cur.close()
+            with self._lock:
+                self._con.execute(f'DROP TABLE IF EXISTS "{name}"')
+                self._con.execute(f'ALTER TABLE "{name}__new" RENAME TO "{name}"')
+                self._copies[key] = (frozenset(ordered), time.time())
+                self._views.discard(table)
+        finally:
+            fetching.release()
+
+    def _source_for(self, table: str) -> Optional[str]:
+        local, parts = self._plan(table)
+        sources = [local] if local is not None else []
+        sources += [f'"__remote_{table}_{part}"' for part, _, _ in parts if (table, part) in self._copies]
+        if not sources:
+            return None
+        if len(sources) == 1:
+            return sources[0]
+        return "(" + " UNION ALL BY NAME ".join(f"SELECT * FROM {s}" for s in sources) + ")"
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+        words = {w.lower() for w in _WORD.findall(sql)}
+        for m in _TABLE_REF.finditer(sql):
+            table = m.group(3)
+            self._refs[table] = (m.group(1), m.group(2))
+            _, parts = self._plan(table)
+            if not parts:
+                continue
+            # Só as colunas citadas no SQL (todas com SELECT * sobre a tabela); season sempre
+            available = self._remote_columns(table)
+            columns = available if _selects_all(sql, table) else [c for c in available if c.lower() in words or c == "season"]
+            for part, where, part_params in parts:
+                self._ensure_copy(table, part, where, part_params, columns or available[:1])
+        return super().query(sql, params)
+
+    def refresh(self) -> None:
+        """Esquece views e cópias e força uma nova leitura das partes remotas."""
+        with self._lock:
+            self._views.clear()
+            self._plans.clear()
+            self._columns.clear()
+            self._copies.clear()
+
+    # Metadados e escrita são do BigQuery (a fonte de verdade)
+    def table_columns(self, table_id: str) -> List[str]:
+        return self.remote.table_columns(table_id)
+
+    def dataset_columns(self, project_id: str, dataset_id: str) -> pd.DataFrame:
+        return self.remote.dataset_columns(project_id, dataset_id)
+
+    def materialize(
+        self,
+        table_id: str,
+        select_sql: str,
+        partition_by: Optional[str] = None,
+        cluster_by: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.remote.materialize(table_id, select_sql, partition_by, cluster_by)
+
+    def append(self, table_id: str, select_sql: str, partition_by: Optional[str] = None) -> None:
+        self.remote.append(table_id, select_sql, partition_by)
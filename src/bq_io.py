@@ -1,12 +1,23 @@
 from __future__ import annotations
 
-from typing import Optional
+import threading
+from datetime import date
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
 import pandas as pd
 import streamlit as st
 from google.cloud import bigquery
 
+from src.backends import BigQueryBackend, DuckDBBackend, HybridBackend, QueryBackend, to_compact_frame
+from src.result_cache import ResultCache, make_key, result_cache_from_settings
+from src.settings import get_setting
+
 
 DEFAULT_PROJECT_ID = "betterbet-467621"
+DEFAULT_DATASET_ID = "betterdata"
+DEFAULT_LOCAL_DIR = "data/local"
+DEFAULT_QUERY_WORKERS = 8
+DEFAULT_HYBRID_REFRESH_MINUTES = 15
 
 @st.cache_resource(ttl=3600)
 def get_bq_client(project: Optional[str] = None, _cache_version: int = 2) -> bigquery.Client:
@@ -60,14 +71,151 @@ def get_bq_client(project: Optional[str] = None, _cache_version: int = 2) -> big
         st.stop() # Para a execução aqui para o usuário ler a mensagem
 
 
+@st.cache_resource(ttl=3600)
+def get_backend(project: Optional[str] = None) -> QueryBackend:
+    """
+    Retorna o backend de execução configurado.
+    - backend = "bigquery" (default): executa no BigQuery.
+    - backend = "local": executa o mesmo SQL via DuckDB sobre arquivos Parquet
+      em `local_dir` (default: data/local), sem round trip ao BigQuery.
+    - backend = "hybrid": temporadas encerradas do snapshot em `local_dir`,
+      temporada atual (`current_season`, default: ano corrente) do BigQuery,
+      relida a cada `hybrid_refresh_minutes`.
+    Configuração via env (PRODIGY_BACKEND / PRODIGY_LOCAL_DIR) ou seção [app] do secrets.
+    """
+    engine = str(get_setting("backend", "bigquery")).lower()
+    if engine in ("local", "duckdb"):
+        return DuckDBBackend(get_setting("local_dir", DEFAULT_LOCAL_DIR))
+    remote = BigQueryBackend(get_bq_client(project=project))
+    if engine == "hybrid":
+        return HybridBackend(
+            get_setting("local_dir", DEFAULT_LOCAL_DIR),
+            remote,
+            current_season=int(get_setting("current_season", date.today().year)),
+            refresh_seconds=float(get_setting("hybrid_refresh_minutes", DEFAULT_HYBRID_REFRESH_MINUTES)) * 60,
+        )
+    return remote
+
+
+@st.cache_resource
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Cache de resultados em disco (Parquet + índice SQLite), compartilhado entre
+    processos e preservado entre restarts. Configuração: result_cache,
+    result_cache_dir, result_cache_max_mb, result_cache_ttl_hours.
+    """
+    return result_cache_from_settings()
+
+
+def _run_on(
+    backend: QueryBackend,
+    cache: Optional[ResultCache],
+    key: str,
+    sql: str,
+    params: Optional[Sequence] = None,
+) -> pd.DataFrame:
+    if cache is None:
+        return backend.query(sql, params)
+
+    df = cache.get(key)
+    if df is None:
+        df = backend.query(sql, params)
+        cache.put(key, df)
+    return df
+
+
+# -----------------------------
+# Single-flight
+# -----------------------------
+# Queries idênticas (mesma chave do cache) em andamento no processo são
+# coalescidas: a primeira chamada executa, as demais esperam o Future dela.
+# Vale entre sessões do Streamlit (o módulo é compartilhado pelo processo).
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_WAITERS: Dict[str, int] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _run_shared(
+    backend: QueryBackend,
+    cache: Optional[ResultCache],
+    sql: str,
+    params: Optional[Sequence] = None,
+) -> pd.DataFrame:
+    key = make_key(f"{backend.name}:{backend.label}", sql, params)
+    with _INFLIGHT_LOCK:
+        leader = _INFLIGHT.get(key)
+        if leader is None:
+            own: Future = Future()
+            _INFLIGHT[key] = own
+            _INFLIGHT_WAITERS[key] = 0
+        else:
+            _INFLIGHT_WAITERS[key] += 1
+
+    if leader is not None:
+        # Cópia: quem chama pode alterar o DataFrame in-place
+        return leader.result().copy()
+
+    try:
+        df = _run_on(backend, cache, key, sql, params)
+    except BaseException as e:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+            _INFLIGHT_WAITERS.pop(key, None)
+        own.set_exception(e)
+        raise
+
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.pop(key, None)
+        shared = _INFLIGHT_WAITERS.pop(key, 0) > 0
+    own.set_result(df)
+    # Com espera(s), o original fica intacto no Future e cada um recebe a sua cópia
+    return df.copy() if shared else df
+
+
+def run_query(
+    sql: str,
+    params: Optional[Sequence] = None,
+    project: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Executa SQL (dialeto BigQuery, com parâmetros opcionais) no backend configurado.
+    Resultados passam pelo cache em disco (chave: backend + SQL normalizado + parâmetros);
+    chamadas idênticas simultâneas compartilham a mesma execução.
+    """
+    return _run_shared(get_backend(project), get_result_cache(), sql, params)
+
+
+@st.cache_resource
+def get_query_executor() -> ThreadPoolExecutor:
+    """Pool de threads para queries independentes disparadas em paralelo (query_workers)."""
+    workers = int(get_setting("query_workers", DEFAULT_QUERY_WORKERS))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+
+
+def submit_query(
+    sql: str,
+    params: Optional[Sequence] = None,
+    project: Optional[str] = None,
+) -> Future:
+    """
+    Como `run_query`, mas sem bloquear: retorna um Future com o DataFrame.
+    Backend e cache são resolvidos aqui, na thread do script (os caches do
+    Streamlit dependem do contexto dela); só a execução vai para o pool.
+    """
+    backend = get_backend(project)
+    cache = get_result_cache()
+    return get_query_executor().submit(_run_shared, backend, cache, sql, params)
+
+
 def load_table(
-    client: bigquery.Client,
+    client: bigquery.Client | QueryBackend,
     table_fqdn: str,
     where: Optional[str] = None,
     limit: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Carrega uma tabela do BigQuery em um DataFrame.
+    client: bigquery.Client ou qualquer QueryBackend (ex: get_backend()).
     table_fqdn: `projeto.dataset.tabela`
     where: condição SQL sem o 'WHERE' (ex: "season = 2025 AND team = 'Cruzeiro'")
     """
@@ -77,11 +225,13 @@ def load_table(
     if limit is not None:
         query += f" LIMIT {int(limit)}"
 
-    return client.query(query).to_dataframe()
+    if isinstance(client, QueryBackend):
+        return client.query(query)
+    return to_compact_frame(client.query(query).to_arrow(create_bqstorage_client=True))
 
 
 def load_events(
-    client: bigquery.Client,
+    client: bigquery.Client | QueryBackend,
     project: str,
     dataset: str,
     table_prefix: str,
@@ -98,7 +248,7 @@ def load_events(
 
 
 def load_schedule(
-    client: bigquery.Client,
+    client: bigquery.Client | QueryBackend,
     project: str,
     dataset: str,
     table_prefix: str,
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.backends import CATEGORY_MAX_RATIO, FLOAT32_COLUMNS
+from src.qualifiers import QualifierTags, parse_qualifier_tags
+from src.queries import QUALIFIER_MASK_COLUMN, QUALIFIER_TAGS
+
+
+# Textos sempre dicionarizados (poucos valores distintos, repetidos em todo evento)
+CATEGORY_COLUMNS = {"team", "player", "type", "event_type", "outcome_type", "outcome", "opponent", "home_team", "away_team"}
+# Tempo cabe em int16 (minutos < 32767)
+INT16_COLUMNS = {"minute", "second", "expanded_minute", "period", "match_period"}
+
+_INT16 = np.iinfo(np.int16)
+_INT32 = np.iinfo(np.int32)
+
+
+# -----------------------------
+# Conversão por coluna
+# -----------------------------
+def _compact(name: str, s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if name in INT16_COLUMNS and pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        return _downcast_int(s, _INT16, "int16")
+    if pd.api.types.is_integer_dtype(s.dtype):
+        return _downcast_int(s, _INT32, "int32")  # ids
+    if name in FLOAT32_COLUMNS and pd.api.types.is_float_dtype(s.dtype):
+        return s.astype("float32")
+    if pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype):
+        if name in CATEGORY_COLUMNS or (len(s) and s.nunique(dropna=True) <= len(s) * CATEGORY_MAX_RATIO):
+            return s.astype("category")
+    return s
+
+
+def _downcast_int(s: pd.Series, bounds: np.iinfo, dtype: str) -> pd.Series:
+    """Inteiro menor se todos os valores couberem (nullable quando há nulos)."""
+    valid = s.dropna()
+    if valid.empty or (
+        (valid == valid.round()).all() and bounds.min <= valid.min() and valid.max() <= bounds.max
+    ):
+        return s.astype(dtype.capitalize() if s.isna().any() else dtype)
+    return s
+
+
+def _qualifier_mask(values: pd.Series, vocabulary: Iterable[str] = QUALIFIER_TAGS) -> np.ndarray:
+    """
+    Bit i ligado <=> o texto de `qualifiers` contém QUALIFIER_TAGS[i]. É a busca
+    por substring de `_qualifier_mask_expr` no banco ("SecondYellow" liga Yellow,
+    "Headed" liga Head), não a igualdade de tags de QualifierTags.
+    """
+    text = pa.array(values.astype("string").fillna(""), type=pa.string())
+    mask = np.zeros(len(values), dtype=np.int32)
+    for bit, tag in enumerate(vocabulary):
+        mask[pc.match_substring(text, tag).to_numpy(zero_copy_only=False)] |= np.int32(1 << bit)
+    return mask
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# -----------------------------
+# Container
+# -----------------------------
+class EventFrame:
+    """
+    Eventos num layout compacto para guardar em cache:
+      - textos repetitivos -> category (dicionário + códigos inteiros)
+      - coordenadas -> float32; minuto/segundo/período -> int16; ids -> int32
+      - `qualifiers` (texto bruto, quase único por linha) -> `qual_mask` (int32,
+        bits de QUALIFIER_TAGS, mesma regra do banco) + QualifierTags com
+        todas as tags por linha
+    `df` tem índice 0..n-1, que é também a linha em `tags`.
+    """
+
+    def __init__(self, df: pd.DataFrame, tags: QualifierTags, source_bytes: Optional[int] = None):
+        self.df = df
+        self.tags = tags
+        self.source_bytes = source_bytes
+
+    @classmethod
+    def from_pandas(cls, df: pd.DataFrame, keep_qualifiers: bool = False) -> "EventFrame":
+        """
+        Converte um DataFrame de eventos (da query ou de `normalize_events`).
+        keep_qualifiers: mantém também a coluna de texto `qualifiers`.
+        """
+        source_bytes = _frame_bytes(df)
+        df = df.reset_index(drop=True)
+        if "qualifiers" in df.columns:
+            tags = parse_qualifier_tags(df["qualifiers"])
+        else:
+            tags = parse_qualifier_tags(pd.Series([""] * len(df), dtype="string"))
+
+        columns = {}
+        for name in df.columns:
+            if name == "qualifiers" and not keep_qualifiers:
+                continue
+            columns[name] = _compact(name, df[name])
+        out = pd.DataFrame(columns, index=df.index)
+        if QUALIFIER_MASK_COLUMN not in out.columns and "qualifiers" in df.columns:
+            out[QUALIFIER_MASK_COLUMN] = _qualifier_mask(df["qualifiers"])
+        return cls(out, tags, source_bytes)
+
+    def to_pandas(self, decode: bool = False) -> pd.DataFrame:
+        """
+        O DataFrame compacto (sem cópia). decode=True devolve os tipos "largos"
+        (texto como object, float64, Int64) para código que ainda espera esse formato.
+        """
+        if not decode:
+            return self.df
+        out = {}
+        for name, s in self.df.items():
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                out[name] = s.astype(object)
+            elif pd.api.types.is_float_dtype(s.dtype):
+                out[name] = s.astype("float64")
+            elif pd.api.types.is_integer_dtype(s.dtype) and name != QUALIFIER_MASK_COLUMN:
+                out[name] = s.astype("Int64")
+            else:
+                out[name] = s
+        return pd.DataFrame(out, index=self.df.index)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    # ---- memória ----
+    def memory_usage(self) -> pd.Series:
+        """Bytes por coluna (deep) + as estruturas das tags."""
+        usage = self.df.memory_usage(index=True, deep=True)
+        usage["qualifier_tags"] = self.tags.codes.nbytes + self.tags.offsets.nbytes + self.tags.rows.nbytes
+        return usage
+
+    def memory_report(self) -> Dict[str, float]:
+        """Tamanho atual x tamanho do DataFrame de origem."""
+        total = int(self.memory_usage().sum())
+        report: Dict[str, float] = {"rows": len(self), "mb": round(total / 1e6, 2)}
+        if self.source_bytes:
+            report["source_mb"] = round(self.source_bytes / 1e6, 2)
+            report["ratio"] = round(self.source_bytes / total, 1) if total else 0.0
+        return report
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.backends import to_compact_frame
+from src.queries import EVENTS_TABLE_PREFIX, MATCH_ID_CANDIDATES
+from src.settings import get_setting
+
+
+MATCH_ID_COLUMN = "game_id"
+MINUTE_CANDIDATES = ["expanded_minute", "minute"]
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _values(value: object) -> List:
+    """Argumento de filtro (escalar ou lista) como lista; None = sem filtro."""
+    if value is None:
+        return []
+    if isinstance(value, str) or not hasattr(value, "__iter__"):
+        return [value]
+    return list(value)
+
+
+def _first_field(schema: pa.Schema, candidates: Iterable[str]) -> Optional[str]:
+    names = set(schema.names)
+    for c in candidates:
+        if c in names:
+            return c
+    return None
+
+
+def _isin(schema: pa.Schema, col: str, values: Sequence) -> ds.Expression:
+    """`col IN values`, com os valores convertidos para o tipo da coluna no arquivo."""
+    typ = schema.field(col).type
+    if pa.types.is_dictionary(typ):
+        typ = typ.value_type
+    arr = pa.array(list(values))
+    if arr.type != typ:
+        arr = arr.cast(typ)
+    return pc.field(col).isin(arr)
+
+
+def _concat(tables: List[pa.Table]) -> pa.Table:
+    """Concatena temporadas com schemas diferentes (colunas faltantes viram nulas)."""
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mesmo nome, tipos incompatíveis entre temporadas (ex: period int/string): vira texto
+        types: Dict[str, set] = {}
+        for t in tables:
+            for f in t.schema:
+                types.setdefault(f.name, set()).add(f.type)
+        conflicts = {name for name, ts in types.items() if len(ts) > 1}
+        fixed = []
+        for t in tables:
+            for name in conflicts & set(t.column_names):
+                i = t.schema.get_field_index(name)
+                t = t.set_column(i, name, pc.cast(t.column(i), pa.string()))
+            fixed.append(t)
+        return pa.concat_tables(fixed, promote_options="permissive")
+
+
+# -----------------------------
+# EventStore
+# -----------------------------
+class EventStore:
+    """
+    Leitura de eventos direto de Parquet local, sem BigQuery nem SQL.
+    Aceita os dois layouts do backend local:
+      - `<data_dir>/<tabela>/season=<ano>/*.parquet` (tabela consolidada, hive)
+      - `<data_dir>/<tabela>_<ano>.parquet` ou `<tabela>_<ano>/` (uma tabela por temporada)
+    Filtros por temporada descartam arquivos inteiros; os demais viram
+    expressões do pyarrow.dataset, que pulam row groups pelas estatísticas
+    (min/max) do Parquet antes de ler os dados. A coluna de ID da partida
+    sai sempre como `game_id`, e `season` é adicionada a partir do layout.
+    """
+
+    def __init__(self, data_dir: str, table: str = EVENTS_TABLE_PREFIX):
+        self.data_dir = os.path.abspath(data_dir)
+        self.table = table
+        self._paths = self._discover()
+        self._datasets: Dict[int, ds.Dataset] = {}
+
+    @classmethod
+    def from_settings(cls) -> "EventStore":
+        """EventStore sobre `local_dir` (mesma configuração do backend local)."""
+        from src.bq_io import DEFAULT_LOCAL_DIR
+
+        return cls(get_setting("local_dir", DEFAULT_LOCAL_DIR))
+
+    # ---- layout ----
+    def _discover(self) -> Dict[int, List[str]]:
+        """{temporada: arquivos Parquet}."""
+        paths: Dict[int, List[str]] = {}
+        folder = os.path.join(self.data_dir, self.table)
+        if os.path.isdir(folder):
+            for entry in os.listdir(folder):
+                m = re.match(r"^season=(\d{4})$", entry)
+                if not m:
+                    continue
+                season_dir = os.path.join(folder, entry)
+                files = sorted(
+                    os.path.join(root, f)
+                    for root, _, names in os.walk(season_dir)
+                    for f in names if f.endswith(".parquet")
+                )
+                if files:
+                    paths[int(m.group(1))] = files
+            if paths:
+                return dict(sorted(paths.items()))
+
+        pattern = re.compile(rf"^{re.escape(self.table)}_(\d{{4}})(\.parquet)?$")
+        if os.path.isdir(self.data_dir):
+            for entry in os.listdir(self.data_dir):
+                m = pattern.match(entry)
+                if not m:
+                    continue
+                path = os.path.join(self.data_dir, entry)
+                if m.group(2):
+                    paths[int(m.group(1))] = [path]
+                elif os.path.isdir(path):
+                    # Diretório da temporada (ex: lotes do src.sync)
+                    files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet"))
+                    if files:
+                        paths[int(m.group(1))] = files
+        if not paths:
+            raise FileNotFoundError(
+                f"Eventos `{self.table}` não encontrados em {self.data_dir} "
+                f"(esperado {self.table}/season=<ano>/ ou {self.table}_<ano>[.parquet])."
+            )
+        return dict(sorted(paths.items()))
+
+    def _dataset(self, season: int) -> ds.Dataset:
+        if season not in self._datasets:
+            self._datasets[season] = ds.dataset(self._paths[season], format="parquet")
+        return self._datasets[season]
+
+    def seasons(self) -> List[int]:
+        return list(self._paths)
+
+    # ---- filtros ----
+    def _expression(
+        self,
+        schema: pa.Schema,
+        teams: object = None,
+        matches: object = None,
+        types: object = None,
+        outcomes: object = None,
+        players: object = None,
+        minute_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    ) -> Optional[ds.Expression]:
+        """
+        Expressão do pyarrow para uma temporada; None se algum filtro usa uma
+        coluna que não existe nela (como no SQL: coluna nula não casa nada).
+        """
+        clauses: List[ds.Expression] = []
+        match_col = _first_field(schema, MATCH_ID_CANDIDATES)
+        minute_col = _first_field(schema, MINUTE_CANDIDATES)
+
+        for col, values in (
+            ("team", _values(teams)),
+            (match_col, _values(matches)),
+            ("type", _values(types)),
+            ("outcome_type", _values(outcomes)),
+        ):
+            if not values:
+                continue
+            if col is None or col not in schema.names:
+                return None
+            clauses.append(_isin(schema, col, values))
+
+        # Jogadores: nomes casam `player`, inteiros casam `player_id`
+        wanted = _values(players)
+        if wanted:
+            names = [p for p in wanted if isinstance(p, str)]
+            ids = [int(p) for p in wanted if not isinstance(p, str)]
+            options = []
+            if names and "player" in schema.names:
+                options.append(_isin(schema, "player", names))
+            if ids and "player_id" in schema.names:
+                options.append(_isin(schema, "player_id", ids))
+            if not options:
+                return None
+            expr = options[0]
+            for o in options[1:]:
+                expr = expr | o
+            clauses.append(expr)
+
+        if minute_range is not None:
+            if minute_col is None:
+                return None
+            lo, hi = (list(minute_range) + [None, None])[:2]
+            if lo is not None:
+                clauses.append(pc.field(minute_col) >= lo)
+            if hi is not None:
+                clauses.append(pc.field(minute_col) <= hi)
+
+        expr = pc.scalar(True)
+        for c in clauses:
+            expr = expr & c
+        return expr
+
+    # ---- leitura ----
+    def to_arrow(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        seasons: object = None,
+        teams: object = None,
+        matches: object = None,
+        types: object = None,
+        outcomes: object = None,
+        players: object = None,
+        minute_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    ) -> pa.Table:
+        """
+        Eventos filtrados como pyarrow.Table (colunas + `season`).
+        `columns` limita o que é lido do disco; `game_id` e `season` usam os
+        nomes normalizados mesmo que o arquivo traga outro nome para o ID.
+        """
+        wanted_seasons = {int(y) for y in _values(seasons)}
+        tables = []
+        for season in self.seasons():
+            if wanted_seasons and season not in wanted_seasons:
+                continue  # poda por partição: nenhum arquivo da temporada é aberto
+            dataset = self._dataset(season)
+            schema = dataset.schema
+            expr = self._expression(schema, teams, matches, types, outcomes, players, minute_range)
+            if expr is None:
+                continue
+
+            match_col = _first_field(schema, MATCH_ID_CANDIDATES)
+            read_cols = None
+            if columns is not None:
+                read_cols = []
+                for c in columns:
+                    src = match_col if c == MATCH_ID_COLUMN else c
+                    if src and src in schema.names and src not in read_cols:
+                        read_cols.append(src)
+
+            t = dataset.to_table(columns=read_cols, filter=expr)
+            if match_col and match_col != MATCH_ID_COLUMN and match_col in t.column_names:
+                t = t.rename_columns([MATCH_ID_COLUMN if c == match_col else c for c in t.column_names])
+            if "season" not in t.column_names and (columns is None or "season" in columns):
+                t = t.append_column("season", pa.array([season] * t.num_rows, pa.int64()))
+            tables.append(t)
+
+        if not tables:
+            return pa.table({c: pa.array([], pa.null()) for c in (columns or [])})
+        return _concat(tables)
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None, compact: bool = True, **filters) -> pd.DataFrame:
+        """Como `to_arrow`; `compact` usa os tipos enxutos de to_compact_frame (categorias, int32, float32)."""
+        table = self.to_arrow(columns, **filters)
+        return to_compact_frame(table) if compact else table.to_pandas()
+
+    def count(self, **filters) -> int:
+        """Número de eventos que passam nos filtros (lê só a coluna de ID)."""
+        return self.to_arrow([MATCH_ID_COLUMN], **filters).num_rows
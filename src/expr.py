@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:  # queries.py importa este módulo
+    from src.queries import QueryParams
+
+
+# -----------------------------
+# Expressões de filtro
+# -----------------------------
+# Um filtro é escrito uma vez e avaliado onde for mais barato:
+#   expr = Team.isin(teams) & Minute.between(0, 45)
+#   expr.to_sql(params)   -> "(team IN UNNEST(@teams) AND expanded_minute BETWEEN @minute_from AND @minute_to)"
+#   expr.mask(df)         -> máscara booleana numpy numa única passada
+# Nulos seguem a lógica do SQL (três valores): uma linha só passa se o
+# predicado for TRUE, inclusive sob NOT.
+
+_Truth = Tuple[np.ndarray, np.ndarray]  # (valor, conhecido)
+
+
+class Expr:
+    def __and__(self, other: "Expr") -> "Expr":
+        return And(self, other)
+
+    def __or__(self, other: "Expr") -> "Expr":
+        return Or(self, other)
+
+    def __invert__(self) -> "Expr":
+        return Not(self)
+
+    @property
+    def columns(self) -> set:
+        """Colunas lidas pela expressão."""
+        raise NotImplementedError
+
+    def _eval(self, df: pd.DataFrame) -> _Truth:
+        raise NotImplementedError
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        raise NotImplementedError
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Máscara booleana (linhas em que o predicado é TRUE)."""
+        value, known = self._eval(df)
+        return value & known
+
+    def to_sql(self, params: QueryParams, prefix: str = "") -> str:
+        """Predicado SQL (dialeto BigQuery); valores vão para `params` como @{prefix}nome."""
+        return self._sql(params, prefix)
+
+
+def _param_name(params: QueryParams, base: str) -> str:
+    """`base`, ou base_2, base_3... se o nome já estiver em uso."""
+    taken = {b.name for b in params.bindings}
+    name, n = base, 1
+    while name in taken:
+        n += 1
+        name = f"{base}_{n}"
+    return name
+
+
+class _Always(Expr):
+    columns = set()
+
+    def _eval(self, df: pd.DataFrame) -> _Truth:
+        ones = np.ones(len(df), dtype=bool)
+        return ones, ones
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        return "TRUE"
+
+
+TRUE = _Always()
+
+
+class _Binary(Expr):
+    op = ""
+
+    def __init__(self, left: Expr, right: Expr):
+        self.left = left
+        self.right = right
+
+    @property
+    def columns(self) -> set:
+        return self.left.columns | self.right.columns
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        return f"({self.left._sql(params, prefix)} {self.op} {self.right._sql(params, prefix)})"
+
+
+class And(_Binary):
+    op = "AND"
+
+    def _eval(self, df: pd.DataFrame) -> _Truth:
+        (av, ak), (bv, bk) = self.left._eval(df), self.right._eval(df)
+        # FALSE conhecido de qualquer lado decide
+        return av & bv, (ak & bk) | (ak & ~av) | (bk & ~bv)
+
+
+class Or(_Binary):
+    op = "OR"
+
+    def _eval(self, df: pd.DataFrame) -> _Truth:
+        (av, ak), (bv, bk) = self.left._eval(df), self.right._eval(df)
+        # TRUE conhecido de qualquer lado decide
+        return (av & ak) | (bv & bk), (ak & bk) | (ak & av) | (bk & bv)
+
+
+class Not(Expr):
+    def __init__(self, inner: Expr):
+        self.inner = inner
+
+    @property
+    def columns(self) -> set:
+        return self.inner.columns
+
+    def _eval(self, df: pd.DataFrame) -> _Truth:
+        value, known = self.inner._eval(df)
+        return ~value & known, known
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        return f"NOT ({self.inner._sql(params, prefix)})"
+
+
+# -----------------------------
+# Predicados sobre uma coluna
+# -----------------------------
+class _Predicate(Expr):
+    def __init__(self, field: "Field"):
+        self.field = field
+
+    @property
+    def columns(self) -> set:
+        return {self.field.name}
+
+    def _test(self, s: pd.Series) -> np.ndarray:
+        raise NotImplementedError
+
+    def _eval(self, df: pd.DataFrame) -> _Truth:
+        s = df[self.field.name]
+        known = s.notna().to_numpy()
+        return self._test(s) & known, known
+
+    def _bind(self, params: QueryParams, prefix: str, suffix: str = "") -> str:
+        return _param_name(params, f"{prefix}{self.field.param}{suffix}")
+
+
+class IsIn(_Predicate):
+    def __init__(self, field: "Field", values: Iterable):
+        super().__init__(field)
+        self.values = list(values)
+
+    def _test(self, s: pd.Series) -> np.ndarray:
+        return s.isin(self.values).to_numpy(dtype=bool)
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        name = self._bind(params, prefix)
+        return f"{self.field.name} IN UNNEST({params.array(name, self.field.sql_type, self.values)})"
+
+
+class Between(_Predicate):
+    def __init__(self, field: "Field", low: object, high: object):
+        super().__init__(field)
+        self.low = low
+        self.high = high
+
+    def _test(self, s: pd.Series) -> np.ndarray:
+        values = pd.to_numeric(s, errors="coerce") if self.field.sql_type in ("INT64", "FLOAT64") else s
+        return ((values >= self.low) & (values <= self.high)).fillna(False).to_numpy(dtype=bool)
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        lo = params.scalar(self._bind(params, prefix, "_from"), self.field.sql_type, self.low)
+        hi = params.scalar(self._bind(params, prefix, "_to"), self.field.sql_type, self.high)
+        return f"{self.field.name} BETWEEN {lo} AND {hi}"
+
+
+class AnyBit(_Predicate):
+    """Coluna de máscara de bits com pelo menos um bit de `bits` ligado."""
+
+    def __init__(self, field: "Field", bits: int):
+        super().__init__(field)
+        self.bits = int(bits)
+
+    def _test(self, s: pd.Series) -> np.ndarray:
+        values = pd.to_numeric(s, errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        return (values & self.bits) != 0
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        return f"({self.field.name} & {params.scalar(self._bind(params, prefix), 'INT64', self.bits)}) != 0"
+
+
+class ContainsAny(_Predicate):
+    """Texto contém alguma das substrings (REGEXP_CONTAINS com alternativas escapadas)."""
+
+    def __init__(self, field: "Field", needles: Iterable[str]):
+        super().__init__(field)
+        self.pattern = "|".join(re.escape(n) for n in sorted(set(needles)))
+
+    def _test(self, s: pd.Series) -> np.ndarray:
+        return s.astype("string").str.contains(self.pattern, regex=True).fillna(False).to_numpy(dtype=bool)
+
+    def _sql(self, params: QueryParams, prefix: str) -> str:
+        return f"REGEXP_CONTAINS({self.field.name}, {params.scalar(self._bind(params, prefix), 'STRING', self.pattern)})"
+
+
+class Field:
+    """Coluna filtrável: nome, tipo SQL dos parâmetros e nome base do parâmetro."""
+
+    def __init__(self, name: str, sql_type: str = "STRING", param: Optional[str] = None):
+        self.name = name
+        self.sql_type = sql_type
+        self.param = param or name
+
+    def isin(self, values: Iterable) -> Expr:
+        return IsIn(self, values)
+
+    def eq(self, value: object) -> Expr:
+        return IsIn(self, [value])
+
+    def between(self, low: object, high: object) -> Expr:
+        return Between(self, low, high)
+
+    def any_bit(self, bits: int) -> Expr:
+        return AnyBit(self, bits)
+
+    def contains_any(self, needles: Iterable[str]) -> Expr:
+        return ContainsAny(self, needles)
+
+    def renamed(self, name: str) -> "Field":
+        """Mesmo filtro sobre outra coluna (ex: team -> effective_team), mesmo parâmetro."""
+        return Field(name, self.sql_type, self.param)
+
+
+# Colunas de eventos usadas pelos filtros das páginas e das queries
+Team = Field("team", "STRING", "teams")
+EffectiveTeam = Field("effective_team", "STRING", "teams")
+Type = Field("type", "STRING", "types")
+Outcome = Field("outcome_type", "STRING", "outcomes")
+Player = Field("player", "STRING", "players")
+PlayerId = Field("player_id", "INT64", "player_ids")
+Match = Field("match_id", "INT64", "match_ids")
+Season = Field("season", "INT64", "seasons")
+Minute = Field("expanded_minute", "INT64", "minute")
+Qualifiers = Field("qualifiers", "STRING", "qual_pattern")
+QualMask = Field("qual_mask", "INT64", "qual_mask")
+
+
+# -----------------------------
+# Composição
+# -----------------------------
+def all_of(*exprs: Optional[Expr]) -> Expr:
+    """AND das expressões (None é ignorado; sem nenhuma, TRUE)."""
+    parts = [e for e in exprs if e is not None]
+    if not parts:
+        return TRUE
+    out = parts[0]
+    for e in parts[1:]:
+        out = out & e
+    return out
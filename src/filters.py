@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from typing import Iterable, Optional
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
 
+from src.event_frame import EventFrame
+from src.expr import Minute, Team, Type, all_of
+
 
 # -----------------------------
 # Helpers
@@ -52,55 +56,262 @@ def filter_matches(
     teams: Optional[Iterable[str]] = None,
     status: Optional[Iterable[str]] = None,
 ) -> pd.DataFrame:
-    out = df_schedule.copy()
+    # Uma máscara só; o frame é indexado uma vez no final
+    mask = np.ones(len(df_schedule), dtype=bool)
 
     if teams:
         teams = set(teams)
-        if "home_team" in out.columns and "away_team" in out.columns:
-            out = out[
-                (out["home_team"].isin(teams)) |
-                (out["away_team"].isin(teams))
-            ]
+        if "home_team" in df_schedule.columns and "away_team" in df_schedule.columns:
+            mask &= (
+                df_schedule["home_team"].isin(teams).to_numpy() |
+                df_schedule["away_team"].isin(teams).to_numpy()
+            )
 
-    if status and "status" in out.columns:
-        out = out[out["status"].isin(status)]
+    if status and "status" in df_schedule.columns:
+        mask &= df_schedule["status"].isin(status).to_numpy()
 
-    return out
+    return df_schedule[mask]
 
 
 # -----------------------------
 # Filters - Events
 # -----------------------------
 def filter_events_by_matches(
-    df_events: pd.DataFrame,
+    df_events: Union[pd.DataFrame, "IndexedEvents"],
     match_ids: Iterable[int],
 ) -> pd.DataFrame:
+    if isinstance(df_events, IndexedEvents):
+        return df_events.filter(match_ids=match_ids)
     if "match_id" not in df_events.columns:
         return df_events
     return df_events[df_events["match_id"].isin(match_ids)].copy()
 
 
 def filter_events(
-    df_events: pd.DataFrame,
+    df_events: Union[pd.DataFrame, "IndexedEvents"],
     teams: Optional[Iterable[str]] = None,
     event_types: Optional[Iterable[str]] = None,
     minutes: Optional[tuple[int, int]] = None,
 ) -> pd.DataFrame:
-    out = df_events.copy()
+    if isinstance(df_events, IndexedEvents):
+        return df_events.filter(teams=teams, event_types=event_types, minutes=minutes)
+
+    # Máscara fundida (src.expr): uma seleção no final em vez de cópia + filtros encadeados
+    conditions = []
 
-    if teams and "team" in out.columns:
-        out = out[out["team"].isin(teams)]
+    if teams and "team" in df_events.columns:
+        conditions.append(Team.isin(teams))
 
     if event_types:
-        col = _first_existing(out, ["type", "event_type"])
+        col = _first_existing(df_events, ["type", "event_type"])
         if col:
-            out = out[out[col].isin(event_types)]
+            conditions.append(Type.renamed(col).isin(event_types))
+
+    if minutes and "expanded_minute" in df_events.columns:
+        conditions.append(Minute.between(*minutes))
+
+    return df_events[all_of(*conditions).mask(df_events)]
+
+
+# -----------------------------
+# Eventos indexados
+# -----------------------------
+def _members(sorted_rows: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Elementos de `rows` (ordenado) presentes em `sorted_rows` (ordenado): busca binária."""
+    if len(sorted_rows) == 0 or len(rows) == 0:
+        return rows[:0]
+    pos = np.searchsorted(sorted_rows, rows)
+    pos[pos == len(sorted_rows)] = 0
+    return rows[sorted_rows[pos] == rows]
+
+
+class InvertedIndex:
+    """valor -> posições (ordenadas) das linhas com esse valor."""
+
+    def __init__(self, values: pd.Series):
+        codes, uniques = pd.factorize(values, sort=False)
+        order = np.argsort(codes, kind="stable").astype(np.int64)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        skip = int((codes < 0).sum())  # nulos (código -1) ficam no começo de `order`
+        self._order = order[skip:]
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._code = {v: i for i, v in enumerate(uniques.tolist())}
+
+    def rows(self, values: Iterable) -> np.ndarray:
+        parts = []
+        for v in dict.fromkeys(values):  # sem repetidos
+            code = self._code.get(v)
+            if code is not None:
+                parts.append(self._order[self._offsets[code]:self._offsets[code + 1]])
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+
+class IndexedEvents:
+    """
+    Eventos (ex: uma temporada em cache) ordenados por match_id, com:
+      - faixa [início, fim) de cada partida -> filtro por partida é fatia
+      - índices invertidos de team, type, outcome e jogador -> posições ordenadas
+    Filtros viram interseções de arrays de posições (do menor para o maior,
+    por busca binária) e o DataFrame só é indexado uma vez, no final.
+    Somente leitura: `df` é compartilhado entre as chamadas.
+    """
+
+    def __init__(self, df: pd.DataFrame, match_col: str = "match_id"):
+        if match_col in df.columns:
+            df = df.sort_values(match_col, kind="stable")
+        self.df = df.reset_index(drop=True)
+
+        self._ranges: Dict[object, tuple] = {}
+        if match_col in self.df.columns and len(self.df):
+            # Ordenado: cada partida é um bloco contíguo de códigos iguais (nulos = -1, no fim)
+            codes, uniques = pd.factorize(self.df[match_col], sort=False)
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            ends = np.r_[starts[1:], len(codes)]
+            self._ranges = {
+                uniques[codes[a]]: (int(a), int(b)) for a, b in zip(starts, ends) if codes[a] >= 0
+            }
+
+        self._indexes: Dict[str, InvertedIndex] = {}
+        self._columns = {
+            "teams": "team",
+            "event_types": _first_existing(self.df, ["type", "event_type"]),
+            "outcomes": _first_existing(self.df, ["outcome_type", "outcome"]),
+            "players": _first_existing(self.df, ["player_id", "player"]),
+        }
+        minute_col = _first_existing(self.df, ["expanded_minute", "minute"])
+        self._minutes = (
+            pd.to_numeric(self.df[minute_col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            if minute_col else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def _index(self, key: str) -> Optional[InvertedIndex]:
+        col = self._columns.get(key)
+        if col is None or col not in self.df.columns:
+            return None
+        if col not in self._indexes:
+            self._indexes[col] = InvertedIndex(self.df[col])  # montado no primeiro uso
+        return self._indexes[col]
+
+    def rows(
+        self,
+        match_ids: Optional[Iterable[int]] = None,
+        teams: Optional[Iterable[str]] = None,
+        event_types: Optional[Iterable[str]] = None,
+        players: Optional[Iterable] = None,
+        minutes: Optional[tuple] = None,
+        outcomes: Optional[Iterable[str]] = None,
+    ) -> Union[slice, np.ndarray]:
+        """Posições que passam nos filtros (slice quando é uma única faixa contígua)."""
+        candidates: List[np.ndarray] = []
+
+        if match_ids is not None:
+            ranges = sorted(self._ranges[m] for m in set(match_ids) if m in self._ranges)
+            if len(ranges) == 1 and not (teams or event_types or players or minutes or outcomes):
+                return slice(*ranges[0])
+            candidates.append(
+                np.concatenate([np.arange(a, b) for a, b in ranges]) if ranges else np.zeros(0, dtype=np.int64)
+            )
+
+        for key, values in (("teams", teams), ("event_types", event_types), ("outcomes", outcomes), ("players", players)):
+            if values:
+                index = self._index(key)
+                if index is not None:
+                    candidates.append(index.rows(values))
+
+        if candidates:
+            candidates.sort(key=len)
+            rows = candidates[0]
+            for other in candidates[1:]:
+                rows = _members(other, rows)
+        else:
+            rows = None
+
+        if minutes and self._minutes is not None:
+            m0, m1 = minutes
+            m = self._minutes if rows is None else self._minutes[rows]
+            keep = (m >= m0) & (m <= m1)
+            rows = np.flatnonzero(keep) if rows is None else rows[keep]
+
+        return slice(0, len(self.df)) if rows is None else rows
+
+    def filter(self, **filters) -> pd.DataFrame:
+        """Como `filter_events`, mas por índices; uma faixa contígua sai como view (sem cópia)."""
+        rows = self.rows(**filters)
+        return self.df.iloc[rows]
+
+
+# -----------------------------
+# Superconjunto local da página de eventos
+# -----------------------------
+class LocalEvents(IndexedEvents):
+    """
+    Eventos de (anos, times, partidas) carregados uma vez pela página de
+    eventos, em layout compacto (EventFrame): minuto/tipo/outcome/jogador são
+    filtrados pelos índices de IndexedEvents. `tags` segue a linha em `df`;
+    `load_pos` guarda a posição de cada linha na carga. Somente leitura.
+    """
+
+    def __init__(self, df: pd.DataFrame, match_col: str = "match_id"):
+        df = df.reset_index(drop=True)
+        if match_col in df.columns:
+            df = df.sort_values(match_col, kind="stable")
+        self.load_pos = df.index.to_numpy(dtype="int64")
+        frame = EventFrame.from_pandas(df)
+        super().__init__(frame.df, match_col)  # já ordenado: a ordem das linhas (e das tags) não muda
+        self.tags = frame.tags
+        self._facets: Optional[pd.DataFrame] = None
+
+    def filter(
+        self,
+        minute_range: Tuple[int, int],
+        event_types: Tuple[str, ...],
+        outcomes: Tuple[str, ...],
+        player_ids: Tuple[int, ...],
+        limit_rows: int,
+    ) -> Tuple[pd.DataFrame, int]:
+        """
+        Mesma semântica do WHERE da query de eventos da página; índice = linha em `df`.
+        Retorna (eventos, total que passou nos filtros). Acima de `limit_rows`,
+        fica uma amostra espaçada por igual na ordem de carga (todas as partidas
+        e minutos representados), não só o começo.
+        """
+        rows = self.rows(
+            event_types=event_types or None,
+            outcomes=outcomes or None,
+            players=[int(p) for p in player_ids] or None,
+            minutes=minute_range,
+        )
+        if isinstance(rows, slice):
+            rows = np.arange(rows.start, rows.stop)
+        total = len(rows)
+        if total > int(limit_rows):
+            rows = rows[np.argsort(self.load_pos[rows], kind="stable")]
+            rows = np.sort(rows[np.linspace(0, total - 1, int(limit_rows)).astype("int64")])
+        return self.df.iloc[rows], total
 
-    if minutes and "expanded_minute" in out.columns:
-        m0, m1 = minutes
-        out = out[
-            (out["expanded_minute"] >= m0) &
-            (out["expanded_minute"] <= m1)
-        ]
+    def facets(self) -> pd.DataFrame:
+        """Mesmo formato de `load_event_facets` da página, calculado uma vez sobre o superconjunto."""
+        if self._facets is None:
+            self._facets = self._build_facets()
+        return self._facets
 
-    return out
+    def _build_facets(self) -> pd.DataFrame:
+        df = self.df.assign(player_name=self.df["player"])
+        by_outcome = (
+            df.groupby(["type", "outcome_type"], dropna=False, observed=True)
+            .size().rename("n").reset_index()
+            .assign(player_id=pd.NA, player_name=pd.NA, by_player=False)
+        )
+        by_player = (
+            df.groupby(["type", "player_id"], dropna=False, observed=True)
+            .agg(player_name=("player_name", "first"), n=("type", "size"))
+            .reset_index()
+            .assign(outcome_type=pd.NA, by_player=True)
+        )
+        cols = ["type", "outcome_type", "player_id", "player_name", "by_player", "n"]
+        return pd.concat([by_outcome[cols], by_player[cols]], ignore_index=True)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import argparse
+from typing import List, Optional
+
+from src.backends import QueryBackend
+from src.result_cache import clear_result_cache
+from src.schema_registry import get_registry
+from src.queries import (
+    CONSOLIDATED_EVENTS_CLUSTER,
+    CONSOLIDATED_EVENTS_TABLE,
+    EVENT_CUBE_CLUSTER,
+    EVENT_CUBE_TABLE,
+    EVENTS_TABLE_PREFIX,
+    MATCH_ID_CANDIDATES,
+    QUALIFIER_MASK_COLUMN,
+    _build_events_tables_union,
+    _qualifier_mask_expr,
+    _use_consolidated_events,
+    get_event_cube_sql,
+)
+
+
+# -----------------------------
+# Tabela consolidada de eventos
+# -----------------------------
+def get_consolidated_events_sql(project_id: str, dataset_id: str) -> str:
+    """
+    SELECT que gera a tabela consolidada (todas as temporadas + coluna season).
+    Os qualificadores são convertidos uma única vez numa máscara de bits
+    (QUALIFIER_MASK_COLUMN); as queries testam bits em vez de rodar regex.
+    """
+    union = _build_events_tables_union(project_id, dataset_id)
+    return f"SELECT *, {_qualifier_mask_expr()} AS {QUALIFIER_MASK_COLUMN} FROM ({union})"
+
+
+def get_consolidated_events_append_sql(project_id: str, dataset_id: str, seasons: List[int]) -> str:
+    """
+    SELECT com os jogos de `seasons` que ainda não estão na tabela consolidada,
+    nas mesmas colunas (ordem e tipos) dela. Colunas que só existem nas
+    tabelas por temporada ficam de fora até um rebuild completo. Anti-join com
+    NOT EXISTS: com NOT IN, um único jogo NULL na tabela barraria todas as linhas.
+    """
+    registry = get_registry(project_id, dataset_id)
+    schema = registry.columns(CONSOLIDATED_EVENTS_TABLE)
+    types = {c: t for c, t in schema.items() if c not in ("season", QUALIFIER_MASK_COLUMN)}
+    match_col = registry.resolve(CONSOLIDATED_EVENTS_TABLE, MATCH_ID_CANDIDATES) or "game_id"
+    table_id = f"{project_id}.{dataset_id}.{CONSOLIDATED_EVENTS_TABLE}"
+
+    union = _build_events_tables_union(project_id, dataset_id, columns=list(types), seasons=seasons, types=types)
+    return f"""
+    SELECT *, {_qualifier_mask_expr()} AS {QUALIFIER_MASK_COLUMN} FROM ({union}) AS src
+    WHERE NOT EXISTS (
+        SELECT 1 FROM `{table_id}` AS t
+        WHERE t.season >= {min(seasons)} AND t.{match_col} = src.{match_col}
+    )
+    """
+
+
+def _last_season(backend: QueryBackend, table_id: str) -> Optional[int]:
+    last = backend.query(f"SELECT MAX(season) as season FROM `{table_id}`")["season"].iloc[0]
+    return int(last) if last is not None and last == last else None  # NaN quando a tabela está vazia
+
+
+def _seasons_from(registry, last: Optional[int]) -> List[int]:
+    """Temporadas a reler numa atualização incremental: a partir da última já presente."""
+    seasons = registry.seasons(EVENTS_TABLE_PREFIX)
+    return seasons if last is None else [y for y in seasons if y >= last]
+
+
+def append_new_events(backend: QueryBackend, project_id: str, dataset_id: str) -> str:
+    """
+    Acrescenta à tabela consolidada os jogos novos das tabelas por temporada
+    (só as temporadas a partir da mais recente já consolidada são lidas).
+    Jogos reprocessados na origem exigem um rebuild completo.
+    """
+    table_id = f"{project_id}.{dataset_id}.{CONSOLIDATED_EVENTS_TABLE}"
+    # Recarrega: uma temporada nova aparece como tabela nova no dataset
+    registry = get_registry(project_id, dataset_id, refresh=True)
+    seasons = _seasons_from(registry, _last_season(backend, table_id))
+    if seasons:
+        backend.append(
+            table_id,
+            get_consolidated_events_append_sql(project_id, dataset_id, seasons),
+            partition_by="season",
+        )
+        clear_result_cache()
+    return table_id
+
+
+def materialize_events(backend: QueryBackend, project_id: str, dataset_id: str, full: bool = False) -> str:
+    """
+    Mantém `eventos_brasileirao_serie_a`: uma única tabela de eventos,
+    particionada por season e clusterizada por game_id/team/player/type.
+    Na primeira execução (ou com full=True) reconstrói tudo; depois só
+    acrescenta os jogos novos (append_new_events).
+    Retorna o id da tabela.
+    """
+    table_id = f"{project_id}.{dataset_id}.{CONSOLIDATED_EVENTS_TABLE}"
+    if not full and get_registry(project_id, dataset_id).has_table(CONSOLIDATED_EVENTS_TABLE):
+        return append_new_events(backend, project_id, dataset_id)
+
+    backend.materialize(
+        table_id,
+        get_consolidated_events_sql(project_id, dataset_id),
+        partition_by="season",
+        cluster_by=CONSOLIDATED_EVENTS_CLUSTER,
+    )
+    # Nova tabela no dataset: recarrega o schema registry
+    get_registry(project_id, dataset_id, refresh=True)
+    clear_result_cache()
+    return table_id
+
+
+# -----------------------------
+# Cubo de contagens de eventos
+# -----------------------------
+def materialize_event_cube(backend: QueryBackend, project_id: str, dataset_id: str, full: bool = False) -> str:
+    """
+    Mantém `cubo_eventos_brasileirao_serie_a` (contagens pré-agregadas usadas
+    pelos rankings). Na primeira execução (ou com full=True) constrói tudo;
+    depois só acrescenta os jogos que ainda não estão no cubo, lendo apenas
+    as temporadas a partir da mais recente já presente.
+    Com a tabela consolidada em uso, ela é atualizada antes (o cubo lê dela).
+    Jogos reprocessados na origem exigem full=True.
+    """
+    table_id = f"{project_id}.{dataset_id}.{EVENT_CUBE_TABLE}"
+    registry = get_registry(project_id, dataset_id)
+    if _use_consolidated_events() and registry.has_table(CONSOLIDATED_EVENTS_TABLE):
+        append_new_events(backend, project_id, dataset_id)
+        registry = get_registry(project_id, dataset_id)
+
+    if full or not registry.has_table(EVENT_CUBE_TABLE):
+        backend.materialize(
+            table_id,
+            get_event_cube_sql(project_id, dataset_id),
+            partition_by="season",
+            cluster_by=EVENT_CUBE_CLUSTER,
+        )
+        get_registry(project_id, dataset_id, refresh=True)
+        clear_result_cache()
+        return table_id
+
+    seasons = _seasons_from(registry, _last_season(backend, table_id))
+    backend.append(
+        table_id,
+        get_event_cube_sql(project_id, dataset_id, seasons=seasons, only_new_games=True),
+        partition_by="season",
+    )
+    clear_result_cache()
+    return table_id
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv: Optional[list] = None) -> None:
+    from src.bq_io import DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID, get_backend
+
+    parser = argparse.ArgumentParser(description="Materializa tabelas derivadas.")
+    parser.add_argument("target", choices=["events", "cube"], help="tabela a (re)construir")
+    parser.add_argument("--project", default=DEFAULT_PROJECT_ID)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_ID)
+    parser.add_argument("--full", action="store_true", help="reconstrói tudo em vez de só acrescentar os jogos novos")
+    args = parser.parse_args(argv)
+
+    backend = get_backend(project=args.project)
+    if args.target == "events":
+        table_id = materialize_events(backend, args.project, args.dataset, full=args.full)
+        print(f"OK: {table_id} ({backend.label})")
+    elif args.target == "cube":
+        table_id = materialize_event_cube(backend, args.project, args.dataset, full=args.full)
+        print(f"OK: {table_id} ({backend.label})")
+
+
+if __name__ == "__main__":
+    main()
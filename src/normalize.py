@@ -1,24 +1,33 @@
 from __future__ import annotations
 
 import re
-from typing import Iterable, Optional
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import pandas as pd
 
 
 # -----------------------------
 # Helpers gerais
 # -----------------------------
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_CAMEL_WORD = re.compile(r"(.)([A-Z][a-z]+)")
+_CAMEL_TAIL = re.compile(r"([a-z0-9])([A-Z])")
+_UNDERSCORES = re.compile(r"_+")
+
+
+@lru_cache(maxsize=4096)
 def _to_snake(name: str) -> str:
     """Converte nomes para snake_case (robusto para camelCase e espaços)."""
     if name is None:
         return name
     s = str(name).strip()
     s = s.replace("%", "pct")
-    s = re.sub(r"[^\w\s]", "_", s)          # pontuação -> _
-    s = re.sub(r"\s+", "_", s)              # espaços -> _
-    s = re.sub(r"(.)([A-Z][a-z]+)", r"\1_\2", s)  # camelCase
-    s = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", s) # camelCase
-    s = re.sub(r"_+", "_", s)               # múltiplos _
+    s = _PUNCT.sub("_", s)                  # pontuação -> _
+    s = _SPACES.sub("_", s)                 # espaços -> _
+    s = _CAMEL_WORD.sub(r"\1_\2", s)        # camelCase
+    s = _CAMEL_TAIL.sub(r"\1_\2", s)        # camelCase
+    s = _UNDERSCORES.sub("_", s)            # múltiplos _
     return s.lower().strip("_")
 
 
@@ -62,7 +71,7 @@ def ensure_match_id(df: pd.DataFrame, candidates: Optional[Iterable[str]] = None
     Procura por nomes comuns e renomeia para `match_id`.
     """
     if candidates is None:
-        candidates = ["match_id", "matchid", "game_id", "id_partida", "match", "gameid"]
+        candidates = MATCH_ID_CANDIDATES
 
     out = df.copy()
     cols = list(out.columns)
@@ -82,6 +91,153 @@ def ensure_match_id(df: pd.DataFrame, candidates: Optional[Iterable[str]] = None
     return out
 
 
+# -----------------------------
+# Plano de normalização compilado
+# -----------------------------
+# Renomeações e conversões dependem só do schema de entrada (nomes + dtypes).
+# O plano é calculado uma vez por schema e aplicado numa única passada sobre
+# uma cópia rasa do DataFrame: colunas que não mudam não são copiadas, e
+# colunas que já estão no tipo certo não são convertidas.
+
+MATCH_ID_CANDIDATES = ["match_id", "matchid", "game_id", "id_partida", "match", "gameid"]
+
+EVENT_INT_COLUMNS = [
+    "event_id", "id", "player_id", "team_id", "opponent_team_id",
+    "minute", "second", "expanded_minute", "period", "match_period",
+]
+EVENT_NUMERIC_COLUMNS = ["x", "y", "end_x", "end_y"]
+EVENT_TEXT_COLUMNS = ["type", "event_type", "outcome_type", "outcome", "qualifiers"]
+
+SCHEDULE_INT_COLUMNS = [
+    "home_team_id", "away_team_id", "season", "round", "matchday",
+    "home_score", "away_score", "ft_home_score", "ft_away_score",
+]
+SCHEDULE_DATE_COLUMNS = ["date", "match_date", "start_date", "kickoff_time", "utc_date"]
+SCHEDULE_DATE_ALIASES = ["match_date", "start_date", "utc_date", "kickoff_time"]
+
+Signature = Tuple[Tuple[str, str], ...]
+
+
+def _as_int(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(s, errors="coerce").astype("Int64")
+
+
+def _as_numeric(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _as_datetime(s: pd.Series) -> pd.Series:
+    return pd.to_datetime(s, errors="coerce", utc=False)
+
+
+def _as_text(s: pd.Series) -> pd.Series:
+    return s.astype(str)
+
+
+class NormalizationPlan:
+    """Nomes finais das colunas + conversões necessárias para um schema."""
+
+    def __init__(self, columns: List[str], casts: List[Tuple[str, Callable[[pd.Series], pd.Series]]]):
+        self.columns = columns
+        self.casts = casts
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        DataFrame independente de `df`: colunas convertidas já saem novas das
+        conversões; as demais são copiadas uma vez, no final.
+        """
+        casts = dict(self.casts)
+        data = {}
+        for name, (_, s) in zip(self.columns, df.items()):
+            cast = casts.get(name)
+            data[name] = cast(s) if cast else s.copy()
+        return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def schema_signature(df: pd.DataFrame) -> Signature:
+    """Tupla (nome, dtype) das colunas: chave do cache de planos."""
+    return tuple((str(c), str(t)) for c, t in zip(df.columns, df.dtypes))
+
+
+def _renamed(names: List[str]) -> List[str]:
+    """`match_id` no lugar do primeiro candidato encontrado (como ensure_match_id); nomes já em snake_case."""
+    names = list(names)
+    for cand in MATCH_ID_CANDIDATES:
+        if cand in names:
+            names[names.index(cand)] = "match_id"
+            break
+    return names
+
+
+def _add_cast(casts: list, dtypes: Dict[str, str], col: str, cast: Callable, done: Callable[[str], bool]) -> None:
+    if col in dtypes and not done(dtypes[col]):
+        casts.append((col, cast))
+
+
+def _is_int64(dtype: str) -> bool:
+    return dtype == "Int64"
+
+
+def _is_number(dtype: str) -> bool:
+    return pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype))
+
+
+def _is_datetime(dtype: str) -> bool:
+    return dtype.startswith("datetime64")
+
+
+def _validated(names: List[str], signature: Signature) -> None:
+    seen: Dict[str, str] = {}
+    for name, (source, _) in zip(names, signature):
+        if name in seen:
+            raise ValueError(
+                f"Colunas `{seen[name]}` e `{source}` viram `{name}` em snake_case: renomeie uma delas antes de normalizar."
+            )
+        seen[name] = source
+
+
+@lru_cache(maxsize=256)
+def _compile(kind: str, signature: Signature) -> NormalizationPlan:
+    # Colisões são checadas no snake_case, antes de um dos candidatos virar `match_id`
+    names = [_to_snake(name) for name, _ in signature]
+    _validated(names, signature)
+    names = _renamed(names)
+
+    # Aliases para a forma canônica (só se ela ainda não existir)
+    if kind == "events":
+        aliases = [("endx", "end_x"), ("endy", "end_y")]
+    else:
+        aliases = [(alt, "date") for alt in SCHEDULE_DATE_ALIASES]
+    for alias, col in aliases:
+        if alias in names and col not in names:
+            names[names.index(alias)] = col
+
+    dtypes = {name: dtype for name, (_, dtype) in zip(names, signature)}
+    casts: list = []
+    _add_cast(casts, dtypes, "match_id", _as_int, _is_int64)
+    if kind == "events":
+        for col in EVENT_INT_COLUMNS:
+            _add_cast(casts, dtypes, col, _as_int, _is_int64)
+        for col in EVENT_NUMERIC_COLUMNS:
+            _add_cast(casts, dtypes, col, _as_numeric, _is_number)
+        for col in EVENT_TEXT_COLUMNS:
+            _add_cast(casts, dtypes, col, _as_text, lambda dtype: False)  # NaN vira "nan", como astype(str)
+    else:
+        for col in SCHEDULE_INT_COLUMNS:
+            _add_cast(casts, dtypes, col, _as_int, _is_int64)
+        for col in SCHEDULE_DATE_COLUMNS:
+            _add_cast(casts, dtypes, col, _as_datetime, _is_datetime)
+
+    return NormalizationPlan(names, casts)
+
+
+def normalization_plan(df: pd.DataFrame, kind: str = "events") -> NormalizationPlan:
+    """Plano (em cache por schema) para `kind` = "events" ou "schedule"."""
+    if kind not in ("events", "schedule"):
+        raise ValueError(f"kind inválido: {kind!r} (use 'events' ou 'schedule').")
+    return _compile(kind, schema_signature(df))
+
+
 # -----------------------------
 # Normalização específica
 # -----------------------------
@@ -91,38 +247,9 @@ def normalize_events(df_events: pd.DataFrame) -> pd.DataFrame:
     - nomes em snake_case
     - garante match_id
     - coercões de tipos comuns (minute/second/x/y/end_x/end_y/player_id/team_id)
+    Uma passada, sem cópias intermediárias (plano compilado por schema).
     """
-    out = standardize_columns(df_events)
-    out = ensure_match_id(out)
-
-    # ids comuns
-    out = coerce_int(out, ["event_id", "id", "player_id", "team_id", "opponent_team_id"])
-
-    # tempo
-    out = coerce_int(out, ["minute", "second", "expanded_minute", "period", "match_period"])
-
-    # coordenadas (podem vir como x,y,endx,endy etc.)
-    # Normaliza nomes mais comuns:
-    rename_map = {}
-    if "endx" in out.columns and "end_x" not in out.columns:
-        rename_map["endx"] = "end_x"
-    if "endy" in out.columns and "end_y" not in out.columns:
-        rename_map["endy"] = "end_y"
-    if "x" in out.columns and "start_x" not in out.columns:
-        # mantém x/y como x/y (muita gente usa assim)
-        pass
-    if rename_map:
-        out = out.rename(columns=rename_map)
-
-    out = coerce_numeric(out, ["x", "y", "end_x", "end_y"])
-
-    # flags/outcome comuns
-    # (mantém como está; só tenta reduzir bagunça de strings)
-    for c in ["type", "event_type", "outcome_type", "outcome", "qualifiers"]:
-        if c in out.columns:
-            out[c] = out[c].astype(str)
-
-    return out
+    return normalization_plan(df_events, "events").apply(df_events)
 
 
 def normalize_schedule(df_schedule: pd.DataFrame) -> pd.DataFrame:
@@ -133,26 +260,7 @@ def normalize_schedule(df_schedule: pd.DataFrame) -> pd.DataFrame:
     - datas em datetime
     - scores e ids em Int64
     """
-    out = standardize_columns(df_schedule)
-    out = ensure_match_id(out)
-
-    # ids comuns (home/away)
-    out = coerce_int(out, ["home_team_id", "away_team_id", "season", "round", "matchday"])
-
-    # placar
-    out = coerce_int(out, ["home_score", "away_score", "ft_home_score", "ft_away_score"])
-
-    # datas comuns
-    out = coerce_datetime(out, ["date", "match_date", "start_date", "kickoff_time", "utc_date"], utc=False)
-
-    # padroniza "date" se existir outro nome
-    if "date" not in out.columns:
-        for alt in ["match_date", "start_date", "utc_date", "kickoff_time"]:
-            if alt in out.columns:
-                out = out.rename(columns={alt: "date"})
-                break
-
-    return out
+    return normalization_plan(df_schedule, "schedule").apply(df_schedule)
 
 
 def normalize_all(df_events: pd.DataFrame, df_schedule: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
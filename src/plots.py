@@ -1,6 +1,8 @@
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 from typing import Optional
+from src.qualifiers import QualifierTags
 
 def create_pitch(
     pitch_length: float = 105.0,
@@ -82,6 +84,75 @@ def create_pitch(
     )
     return fig
 
+# Above this many events the map switches to WebGL (Scattergl) traces
+WEBGL_MIN_POINTS = 5000
+
+
+def get_event_symbol(event_type, draw_arrows: bool = False) -> str:
+    """Maps an event type to a marker shape."""
+    etype = str(event_type).lower()
+    if "pass" in etype: return "circle" if draw_arrows else "triangle-up"
+    if "shot" in etype or "goal" in etype: return "circle"
+    if "duel" in etype or "tackle" in etype or "interception" in etype or "foul" in etype: return "square"
+    if "save" in etype: return "diamond-tall"
+    return "hexagon" # specific generic
+
+
+def _event_symbols(types: pd.Series, draw_arrows: bool) -> np.ndarray:
+    """Per-row symbols, resolving each distinct type only once."""
+    codes, uniques = pd.factorize(types)
+    lookup = np.array([get_event_symbol(t, draw_arrows) for t in uniques] + [get_event_symbol(None, draw_arrows)], dtype=object)
+    return lookup[codes]  # code -1 (missing) -> last entry
+
+
+def _text_column(df: pd.DataFrame, col: str, default: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=object)
+    return df[col].astype(object).where(df[col].notna(), "<NA>").astype(str).to_numpy(dtype=object)
+
+
+def _hover_text(df: pd.DataFrame, qualifier_tags: Optional[QualifierTags]) -> np.ndarray:
+    """
+    Hover HTML per row, built with whole-column string ops.
+    A single string per point keeps the customdata Plotly copies (and serializes) small.
+    """
+    text = (
+        "<b>" + _text_column(df, "type", "Event") + "</b><br>"
+        + _text_column(df, "player", "Unknown") + "<br>Min: "
+        + _text_column(df, "expanded_minute", "") + "'<br>"
+    )
+    if "outcome_type" in df.columns:
+        text = text + "Outcome: " + _text_column(df, "outcome_type", "") + "<br>"
+    if qualifier_tags is not None and len(df):
+        labels = qualifier_tags.labels(df.index)
+        text = text + np.where(labels != "", "Tags: " + labels, "")
+    return text
+
+
+def _arrow_arrays(df: pd.DataFrame):
+    """
+    Arrow geometry for events with an end point:
+    line x/y as (start, end, NaN) triples (one trace, NaN breaks the line),
+    head x/y and head angles.
+    """
+    sx = df["x_plot"].to_numpy(dtype=float, na_value=np.nan)
+    sy = df["y_plot"].to_numpy(dtype=float, na_value=np.nan)
+    ex = df["end_x_plot"].to_numpy(dtype=float, na_value=np.nan)
+    ey = df["end_y_plot"].to_numpy(dtype=float, na_value=np.nan)
+    ok = ~(np.isnan(ex) | np.isnan(ey))
+    sx, sy, ex, ey = sx[ok], sy[ok], ex[ok], ey[ok]
+
+    gap = np.full(len(ex), np.nan)
+    line_x = np.column_stack([sx, ex, gap]).ravel()
+    line_y = np.column_stack([sy, ey, gap]).ravel()
+
+    # Plotly Marker Angle: 0 = Up (12 o'clock), increases CLOCKWISE
+    # arctan2: 0 = Right (3 o'clock), increases COUNTER-CLOCKWISE
+    # Formula: 90 - MathAngle
+    angles = 90 - np.degrees(np.arctan2(ey - sy, ex - sx))
+    return line_x, line_y, ex, ey, angles
+
+
 def plot_events_plotly(
     df: pd.DataFrame,
     pitch_length: float = 105.0,
@@ -89,12 +160,17 @@ def plot_events_plotly(
     color_outcome: bool = False,
     draw_arrows: bool = False,
     highlight_qualifier: Optional[str] = None,
+    qualifier_tags: Optional[QualifierTags] = None,
     theme_colors: Optional[dict] = None,
     color_strategy: str = "Resultado (Sucesso/Falha)",
-    layer_colors: Optional[dict] = None
+    layer_colors: Optional[dict] = None,
+    webgl: Optional[bool] = None,
 ) -> go.Figure:
     """
     Plots events on top of the Plotly pitch.
+    qualifier_tags: parsed qualifiers of the source frame (rows = df index),
+    used for hover tags and the highlight layer.
+    webgl: draw with Scattergl (None = automatically above WEBGL_MIN_POINTS events).
     """
     if theme_colors is None:
         theme_colors = {}
@@ -113,131 +189,87 @@ def plot_events_plotly(
     # Split Data Logic
     traces = []
     
-    # Helper to map event types to shapes
-    def get_event_symbol(event_type):
-        etype = str(event_type).lower()
-        if "pass" in etype: return "circle" if draw_arrows else "triangle-up"
-        if "shot" in etype or "goal" in etype: return "circle"
-        if "duel" in etype or "tackle" in etype or "interception" in etype or "foul" in etype: return "square"
-        if "save" in etype: return "diamond-tall"
-        return "hexagon" # specific generic
-
-    # Helper to create trace
+    use_gl = len(df) > WEBGL_MIN_POINTS if webgl is None else bool(webgl)
+    trace_type = "scattergl" if use_gl else "scatter"
+
+    # Hover: per-row HTML in customdata, one template for every trace
+    hover_template = "%{customdata}<extra></extra>"
+
+    # Helper to create trace (vectorized: no per-row Python work)
     def add_trace(sub_df, name, color, symbol=None, opacity=0.8, size=8):
-        # Build Hover Text
-        hover_texts = []
-        
-        # Lists for Arrow Lines (Pattern: x1, x2, None, x3, x4, None...)
-        arr_x = []
-        arr_y = []
-        
-        # Lists for Arrow Heads
-        head_x = []
-        head_y = []
-        head_angles = []
-        
-        # Determine Symbols: If fixed symbol is None, calculate from Type
+        # Determine Symbols: If fixed symbol is None, map each distinct Type once
         if symbol is None:
-            symbols = [get_event_symbol(getattr(r, "type", "")) for r in sub_df.itertuples()]
+            symbols = _event_symbols(sub_df["type"], draw_arrows) if "type" in sub_df.columns else "hexagon"
         else:
             symbols = symbol
 
+        x = sub_df["x_plot"].to_numpy(dtype=float, na_value=np.nan)
+        y = sub_df["y_plot"].to_numpy(dtype=float, na_value=np.nan)
+        customdata = _hover_text(sub_df, qualifier_tags)
+
+        # 1. Main Scatter Traces (Markers - Start Point)
+        # One trace per symbol under a single legend entry: Plotly validates
+        # per-row symbol arrays element by element, a scalar symbol is checked once.
+        if isinstance(symbols, str):
+            groups = [(symbols, slice(None))]
+        else:
+            codes, uniques = pd.factorize(symbols)
+            groups = [(sym, codes == i) for i, sym in enumerate(uniques)]
+        for i, (sym, rows) in enumerate(groups):
+            traces.append(dict(
+                type=trace_type,
+                x=x[rows],
+                y=y[rows],
+                mode="markers",
+                name=name,
+                legendgroup=name,
+                showlegend=i == 0,
+                marker=dict(size=size, color=color, symbol=sym, opacity=opacity, line=dict(width=1, color="black")),
+                customdata=customdata[rows],
+                hovertemplate=hover_template,
+            ))
+
         # Check if we have end coordinates for arrows
-        has_end = ("end_x_plot" in sub_df.columns and "end_y_plot" in sub_df.columns)
+        if not (draw_arrows and "end_x_plot" in sub_df.columns and "end_y_plot" in sub_df.columns):
+            return
+        line_x, line_y, head_x, head_y, head_angles = _arrow_arrays(sub_df)
+        if not len(head_x):
+            return
 
-        for r in sub_df.itertuples():
-            min_str = f"{r.expanded_minute}'"
-            p_name = getattr(r, "player", "Unknown")
-            type_str = getattr(r, "type", "Event")
-            
-            txt = f"<b>{type_str}</b><br>{p_name}<br>Min: {min_str}<br>"
-            if "outcome_type" in sub_df.columns:
-                txt += f"Outcome: {r.outcome_type}<br>"
-            if "kv_qualifiers" in sub_df.columns:
-                q_list = getattr(r, "kv_qualifiers", [])
-                if q_list:
-                    txt += f"Tags: {', '.join(q_list)}"
-            hover_texts.append(txt)
-
-            # Collect Arrow Lines (efficient method)
-            if draw_arrows and has_end:
-                ex, ey = getattr(r, "end_x_plot", None), getattr(r, "end_y_plot", None)
-                sx, sy = r.x_plot, r.y_plot
-                
-                if pd.notna(ex) and pd.notna(ey):
-                    arr_x.extend([sx, ex, None])
-                    arr_y.extend([sy, ey, None])
-                    
-                    # Calculate angle for arrowhead
-                    dy = ey - sy
-                    dx = ex - sx
-                    import math
-                    angle_math = math.degrees(math.atan2(dy, dx))
-                    head_x.append(ex)
-                    head_y.append(ey)
-                    
-                    # Plotly Marker Angle:
-                    # 0 = Up (12 o'clock)
-                    # Increases CLOCKWISE
-                    # math.atan2:
-                    # 0 = Right (3 o'clock)
-                    # Increases COUNTER-CLOCKWISE
-                    #
-                    # Mapping:
-                    # Math 0 (Right)   -> Plotly 90
-                    # Math 90 (Up)     -> Plotly 0
-                    # Math 180 (Left)  -> Plotly 270 (-90)
-                    # Math -90 (Down)  -> Plotly 180
-                    #
-                    # Formula: 90 - MathAngle
-                    head_angles.append(90 - angle_math)
+        # 2. Arrow Trace (Lines): one trace, segments separated by NaN
+        traces.append(dict(
+            type=trace_type,
+            x=line_x,
+            y=line_y,
+            mode="lines",
+            name=f"{name} (Trajetória)",
+            line=dict(color=color, width=1.5),
+            opacity=opacity, # Use function arg
+            showlegend=False,
+            hoverinfo="skip"
+        ))
 
-        # 1. Main Scatter Traces (Markers - Start Point)
-        traces.append(go.Scatter(
-            x=sub_df["x_plot"],
-            y=sub_df["y_plot"],
+        # 3. Arrow Heads (Markers)
+        traces.append(dict(
+            type=trace_type,
+            x=head_x,
+            y=head_y,
             mode="markers",
-            name=name,
-            marker=dict(size=size, color=color, symbol=symbols, opacity=opacity, line=dict(width=1, color="black")),
-            text=hover_texts,
-            hoverinfo="text"
+            name=f"{name} (Pontas)",
+            marker=dict(
+                symbol="triangle-up", # Using standard triangle
+                size=10,
+                color=color,
+                angle=head_angles,
+            ),
+            opacity=opacity, # Use function arg
+            showlegend=False,
+            hoverinfo="skip"
         ))
-        
-        # 2. Optimized Arrow Trace (Lines)
-        if arr_x:
-            traces.append(go.Scatter(
-                x=arr_x,
-                y=arr_y,
-                mode="lines",
-                name=f"{name} (Trajetória)",
-                line=dict(color=color, width=1.5),
-                opacity=opacity, # Use function arg
-                showlegend=False,
-                hoverinfo="skip"
-            ))
-            
-        # 3. Optimized Arrow Heads (Markers)
-        if head_x:
-             traces.append(go.Scatter(
-                x=head_x,
-                y=head_y,
-                mode="markers",
-                name=f"{name} (Pontas)",
-                marker=dict(
-                    symbol="triangle-up", # Using standard triangle
-                    size=10,
-                    color=color,
-                    angle=head_angles,
-                    standoff=0
-                ),
-                opacity=opacity, # Use function arg
-                showlegend=False,
-                hoverinfo="skip"
-            ))
 
     # Logic tree for subsets
-    if highlight_qualifier and "kv_qualifiers" in df.columns:
-        mask = df["kv_qualifiers"].apply(lambda x: highlight_qualifier in x)
+    if highlight_qualifier and qualifier_tags is not None:
+        mask = qualifier_tags.has(highlight_qualifier, rows=df.index)
         df_h = df[mask]
         df_o = df[~mask]
         
@@ -333,8 +365,7 @@ def plot_events_plotly(
     else:
         add_trace(df, "Eventos", def_color)
 
-    for t in traces:
-        fig.add_trace(t)
+    fig.add_traces(traces)
         
     return fig
 
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# -----------------------------
+# Parser em lote
+# -----------------------------
+# Cada evento traz `qualifiers` como texto no formato de literal Python/JSON:
+#   [{'type': {'value': 56, 'displayName': 'Zone'}, 'value': 'Back'}, ...]
+# Só interessa o displayName de cada `type`. Em vez de `ast.literal_eval` por
+# linha, todas as strings são concatenadas (separadas por \x00) e varridas por
+# UMA regex; a linha de cada tag sai da posição do match.
+
+_SEP = "\x00"
+_TAG = re.compile(
+    r"""['"]type['"]\s*:\s*\{[^{}\x00]*?['"]displayName['"]\s*:\s*(?:'([^'\x00]*)'|"([^"\x00]*)")"""
+)
+
+
+class QualifierTags:
+    """
+    Tags (displayName) dos qualifiers de um DataFrame de eventos, em formato plano:
+    as tags da linha i são `vocab[codes[offsets[i]:offsets[i + 1]]]`.
+    Linhas são posições no DataFrame original (o índice do resultado da query).
+    """
+
+    def __init__(self, codes: np.ndarray, offsets: np.ndarray, vocab: Sequence[str]):
+        self.codes = codes
+        self.offsets = offsets
+        self.vocab = list(vocab)  # ordenado
+        self._code = {tag: i for i, tag in enumerate(self.vocab)}
+        # linha de cada código (mesmo tamanho de `codes`)
+        self.rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    # ---- máscaras ----
+    def has(self, tag: str, rows: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Máscara booleana: linha contém a tag (opcionalmente só para `rows`)."""
+        mask = np.zeros(len(self), dtype=bool)
+        code = self._code.get(tag)
+        if code is not None:
+            mask[self.rows[self.codes == code]] = True
+        return mask if rows is None else mask[np.asarray(rows)]
+
+    def has_all(self, tags: Iterable[str], rows: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Máscara booleana: linha contém TODAS as tags."""
+        mask = np.ones(len(self), dtype=bool)
+        for tag in tags:
+            mask &= self.has(tag)
+        return mask if rows is None else mask[np.asarray(rows)]
+
+    # ---- consulta ----
+    def tags_of(self, row: int) -> List[str]:
+        """Tags de uma linha (para textos de hover)."""
+        return [self.vocab[c] for c in self.codes[self.offsets[row]:self.offsets[row + 1]]]
+
+    def labels(self, rows: Optional[Iterable[int]] = None, sep: str = ", ") -> np.ndarray:
+        """Tags de cada linha unidas num texto ("" sem tags), numa passada só (hover de muitos pontos)."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        out = np.full(len(self), "", dtype=object)
+        keep = np.zeros(len(self), dtype=bool)
+        keep[rows] = True
+        sel = keep[self.rows]
+        if sel.any():
+            names = pd.Series(np.asarray(self.vocab, dtype=object)[self.codes[sel]])
+            joined = names.groupby(self.rows[sel], sort=False).agg(sep.join)
+            out[joined.index.to_numpy()] = joined.to_numpy()
+        return out[rows]
+
+    def present(self, rows: Optional[Iterable[int]] = None) -> List[str]:
+        """Tags que aparecem em pelo menos uma linha (ordem alfabética)."""
+        codes = self.codes
+        if rows is not None:
+            keep = np.zeros(len(self), dtype=bool)
+            keep[np.asarray(rows, dtype=np.int64)] = True
+            codes = codes[keep[self.rows]]
+        return [self.vocab[c] for c in np.unique(codes)]
+
+
+def parse_qualifier_tags(values: pd.Series) -> QualifierTags:
+    """Extrai os displayNames de todas as linhas numa única passada."""
+    strs = values.astype("string").fillna("").str.replace(_SEP, " ", regex=False)
+    lengths = strs.str.len().to_numpy(dtype=np.int64) + 1
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    text = _SEP.join(strs.tolist())
+    positions, names = [], []
+    for m in _TAG.finditer(text):
+        positions.append(m.start())
+        names.append(m.group(1) if m.group(1) is not None else m.group(2))
+
+    if not names:
+        return QualifierTags(np.zeros(0, dtype=np.int32), np.zeros(len(strs) + 1, dtype=np.int64), [])
+
+    vocab, codes = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+    rows = np.searchsorted(starts, np.asarray(positions, dtype=np.int64), side="right") - 1
+    counts = np.bincount(rows, minlength=len(strs))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return QualifierTags(codes.astype(np.int32), offsets, vocab.tolist())
@@ -1,99 +1,380 @@
-from typing import Optional, Tuple, Union, List
+from datetime import date
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple, Union, List
 import re
 
+from google.cloud import bigquery
+
+from src.settings import get_bool_setting
+from src.expr import EffectiveTeam, Outcome, Player, QualMask, Qualifiers, Type, all_of
+from src.schema_registry import SchemaRegistry, get_registry
+
+# Fallback only: seasons are discovered from the dataset by the schema registry.
 # YEARS_TO_QUERY = range(2015, 2026)
 YEARS_TO_QUERY = [2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025]
 
-def _build_schedule_union(project_id: str, dataset_id: str) -> str:
+EVENTS_TABLE_PREFIX = "eventos_brasileirao_serie_a"
+SCHEDULE_TABLE_PREFIX = "schedule_brasileirao_serie_a"
+
+# Single events table built by src/materialize.py from all season tables:
+# partitioned by season, clustered by game_id/team/player/type.
+# Enable with the `consolidated_events` setting once the job has run.
+CONSOLIDATED_EVENTS_TABLE = EVENTS_TABLE_PREFIX
+CONSOLIDATED_EVENTS_CLUSTER = ["game_id", "team", "player", "type"]
+
+
+def _use_consolidated_events() -> bool:
+    return get_bool_setting("consolidated_events", False)
+
+
+# Pre-aggregated event counts built by src/materialize.py:
+# (game, perspective, effective team, team, player, type, outcome, qualifier mask) -> count.
+# Enable with the `event_cube` setting; rankings then sum cube cells instead of raw events.
+EVENT_CUBE_TABLE = "cubo_eventos_brasileirao_serie_a"
+EVENT_CUBE_CLUSTER = ["perspective", "type", "effective_team", "player"]
+
+# Qualifier vocabulary for bitmasks: bit i <=> QUALIFIER_TAGS[i].
+# Append only: bit positions are persisted in the cube and in the consolidated
+# events table (QUALIFIER_MASK_COLUMN, computed once when it is materialized).
+QUALIFIER_TAGS = [
+    "KeyPass", "Assisted", "BigChanceCreated", "LeadingToGoal", "LeadingToAttempt",
+    "Head", "Cross", "Corner", "FreeKick", "Penalty", "Throughball", "Longball",
+    "Chipped", "LayOff", "Volley", "OwnGoal", "Red", "Yellow",
+]
+QUALIFIER_MASK_COLUMN = "qual_mask"
+
+
+# -----------------------------
+# Query parameters
+# -----------------------------
+class CompiledQuery(NamedTuple):
+    """SQL template + its bindings; run with run_query(query.sql, query.params)."""
+    sql: str
+    params: list
+
+
+class QueryParams:
+    """
+    Collects ArrayQueryParameter/ScalarQueryParameter bindings while a query is
+    built. User values never reach the SQL text, only @names, so every filter
+    combination of a builder shares one template and cache keys stay stable.
+    Array values are deduplicated and sorted (selection order is irrelevant for IN).
+    """
+
+    def __init__(self):
+        self.bindings: list = []
+
+    def _bind(self, param) -> str:
+        if any(b.name == param.name for b in self.bindings):
+            raise ValueError(f"Duplicate query parameter @{param.name}")
+        self.bindings.append(param)
+        return f"@{param.name}"
+
+    def array(self, name: str, type_: str, values: Iterable) -> str:
+        return self._bind(bigquery.ArrayQueryParameter(name, type_, sorted(set(values))))
+
+    def scalar(self, name: str, type_: str, value: object) -> str:
+        return self._bind(bigquery.ScalarQueryParameter(name, type_, value))
+
+    def compile(self, sql: str) -> CompiledQuery:
+        return CompiledQuery(sql, list(self.bindings))
+
+
+def _as_list(value: object) -> List:
+    """Filter value (str or list) as a list of non-empty items."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    return [v for v in value if v]
+
+
+# -----------------------------
+# Schema mapping
+# -----------------------------
+# Source names accepted for columns that drift across seasons
+MATCH_ID_CANDIDATES = ["game_id", "gameId", "match_id", "matchId", "matchID", "fixture_id", "fixtureId"]
+SCHEDULE_DATE_CANDIDATES = ["start_time", "date", "match_date", "start_date", "kickoff_time"]
+
+SCHEDULE_COLUMN_TYPES = {
+    "game_id": "INT64",
+    "match_date": "TIMESTAMP",
+    "home_team": "STRING",
+    "away_team": "STRING",
+    "home_score": "INT64",
+    "away_score": "INT64",
+    "status": "STRING",
+}
+SCHEDULE_COLUMN_ALIASES = {
+    "game_id": MATCH_ID_CANDIDATES,
+    "match_date": SCHEDULE_DATE_CANDIDATES,
+}
+
+# Canonical types for the event columns read by the query builders.
+# Per-season tables drift (ids as FLOAT64 in some years, STRING in others),
+# so every projection casts to these types to keep the UNION ALL aligned.
+EVENT_COLUMN_TYPES = {
+    "game_id": "INT64",
+    "team": "STRING",
+    "player": "STRING",
+    "player_id": "INT64",
+    "related_player_id": "INT64",
+    "type": "STRING",
+    "outcome_type": "STRING",
+    "qualifiers": "STRING",
+    "is_shot": "BOOL",
+    "x": "FLOAT64",
+    "y": "FLOAT64",
+    "end_x": "FLOAT64",
+    "end_y": "FLOAT64",
+    "period": "STRING",
+    "minute": "INT64",
+    "second": "INT64",
+    "expanded_minute": "INT64",
+    "qual_mask": "INT64",
+}
+EVENT_COLUMN_ALIASES = {
+    "game_id": MATCH_ID_CANDIDATES,
+}
+
+
+def _registry(project_id: str, dataset_id: str) -> Optional[SchemaRegistry]:
+    """Schema registry for the dataset, or None if metadata is unavailable (offline)."""
+    try:
+        return get_registry(project_id, dataset_id)
+    except Exception:
+        return None
+
+
+def _seasons(
+    registry: Optional[SchemaRegistry],
+    prefix: str,
+    only: Optional[Iterable[int]] = None,
+) -> List[int]:
+    """
+    Seasons with a `<prefix>_<year>` table; falls back to YEARS_TO_QUERY.
+    `only` restricts the result (season pushdown: unselected tables are never scanned).
+    """
+    seasons = list(YEARS_TO_QUERY)
+    if registry is not None and registry.seasons(prefix):
+        seasons = registry.seasons(prefix)
+    if only is not None:
+        wanted = {int(y) for y in only}
+        seasons = [y for y in seasons if y in wanted]
+    return seasons
+
+
+DateRange = Tuple[Optional[Union[date, str]], Optional[Union[date, str]]]
+
+
+def _split_date_range(date_range: Optional[DateRange]) -> Tuple[Optional[str], Optional[str]]:
+    """(start, end) as ISO strings; accepts partial tuples as returned by st.date_input."""
+    if not date_range:
+        return None, None
+    bounds = list(date_range) + [None, None]
+    start, end = bounds[0], bounds[1]
+    iso = lambda d: d.isoformat() if hasattr(d, "isoformat") else (str(d) if d else None)
+    return iso(start), iso(end)
+
+
+def _date_range_predicate(date_range: Optional[DateRange], params: QueryParams, col: str = "match_date") -> str:
+    """SQL predicate on the match date (inclusive bounds, bound as DATE parameters); '1=1' when unbounded."""
+    start, end = _split_date_range(date_range)
+    clauses = []
+    if start:
+        clauses.append(f"CAST({col} AS DATE) >= {params.scalar('date_from', 'DATE', date.fromisoformat(start[:10]))}")
+    if end:
+        clauses.append(f"CAST({col} AS DATE) <= {params.scalar('date_to', 'DATE', date.fromisoformat(end[:10]))}")
+    return " AND ".join(clauses) or "1=1"
+
+
+def _seasons_for_query(
+    project_id: str,
+    dataset_id: str,
+    seasons: Optional[Iterable[int]],
+    date_range: Optional[DateRange],
+) -> Optional[List[int]]:
+    """
+    Seasons to scan. Explicit seasons win; otherwise the available seasons
+    (schema registry) that overlap the date range.
+    A season may end in the following calendar year (2020 ended in Feb/2021),
+    so the year before the start date is kept.
+    """
+    if seasons:
+        return [int(y) for y in seasons]
+    start, end = _split_date_range(date_range)
+    if not start and not end:
+        return None
+    lo = int(start[:4]) - 1 if start else None
+    hi = int(end[:4]) if end else None
+    return [
+        y for y in _seasons(_registry(project_id, dataset_id), EVENTS_TABLE_PREFIX)
+        if (lo is None or y >= lo) and (hi is None or y <= hi)
+    ]
+
+
+def get_available_seasons(project_id: str, dataset_id: str) -> List[int]:
+    """Seasons available for events (auto-discovered)."""
+    return _seasons(_registry(project_id, dataset_id), EVENTS_TABLE_PREFIX)
+
+
+def _column_expr(
+    col: str,
+    target_type: Optional[str],
+    table: str,
+    registry: Optional[SchemaRegistry],
+    candidates: Optional[List[str]] = None,
+) -> str:
+    """
+    Projection of one canonical column from `table`.
+    With the registry: resolves the real source name, fills missing columns
+    with typed NULLs and only casts when the source type differs.
+    """
+    if registry is None or not registry.has_table(table):
+        return f"CAST({col} AS {target_type}) AS {col}" if target_type else col
+
+    source = registry.resolve(table, candidates or [col])
+    if source is None:
+        return f"CAST(NULL AS {target_type}) AS {col}" if target_type else f"NULL AS {col}"
+    if target_type is None or registry.column_type(table, source) == target_type:
+        return source if source == col else f"{source} AS {col}"
+    return f"SAFE_CAST({source} AS {target_type}) AS {col}"
+
+
+def _build_schedule_union(project_id: str, dataset_id: str, seasons: Optional[Iterable[int]] = None) -> str:
     """
     Builds UNION ALL for Schedule tables, normalizing columns.
-    Old tables might use 'date', new ones 'start_time'.
+    The kickoff column drifts ('date' in old seasons, 'start_time' in new ones);
+    the schema registry resolves the real name per table and it is exposed as match_date.
+    `seasons` limits the union to those tables.
     """
-    subqueries = []
-    for year in YEARS_TO_QUERY:
-        # Check column availability logic is tricky in pure SQL string generation without checking schema first.
-        # But we saw from debug that 2017 has 'date' (TIMESTAMP) and 2025 has 'start_time' (TIMESTAMP).
-        # We need to normalize to 'start_time'.
-        # 2017: date, game_id, home_team, away_team, home_score, away_score, status
-        # 2025: start_time, game_id, ...
-        
-        # Heuristic based on year:
-        # Years < 2020 might use 'date'. Let's assume standard names.
-        # Actually safer way: select both, alias correctly. BQ will error if column doesn't exist.
-        # Wait, if I select 'date' from 2025 table it errors if it doesn't exist.
-        
-        # Hack solution: Since we know the drift, we can use exception or just listing.
-        # Better: use `SELECT * EXCEPT(...)` or just SELECT common ones?
-        # NO, 'date' is missing in 2025. 'start_time' is missing in 2017.
-        
-        # We need per-year logic.
-        if year <= 2023: # Assumption based on usually these datasets change recently. Or just 2025 changed.
-            # Let's try to be generic. 
-            # If we really want to be robust we would check schema.
-            # But let's assume 'date' is used in older, 'start_time' in newer.
-            # Let's try to use 'date' if available, else 'start_time' logic? No SQL doesn't work that way.
-            pass
-        
-    # Since I cannot check schema at runtime efficiently here without slowing down, 
-    # I will rely on the pattern.
-    # Pattern seen: 2017 has 'date', 2025 has 'start_time'.
-    # Let's split 2025 from others?
-    # Or checking the debug output closer (which I can't fully see, but it showed mismatches).
-    
-    # Let's try to query metadata? No.
-    # Let's just output the explicit columns for 2025 and explicit for others.
-    # But I don't know the exact year cut-off.
-    
-    # Safe fallback: Use `SAFE_CAST(NULL as TIMESTAMP)`? No the column selection fails.
-    
-    # Actually, the user report says: "Column 41...". 
-    # The problem of SELECT * is exactly this.
-    # If I explicitly select, I must know the column name.
-    
-    # Let's use the simplest valid subsets.
-    # Required: game_id, home_team, away_team, home_score, away_score, TIMESTAMP (date/start_time), status.
-    
-    # I will generate a query that tries to be smart. 
-    # Or I can just inspect schemas right now for all of them? No too fast.
-    
-    # Let's assume:
-    # 2015-2023: Use 'date'
-    # 2024-2025: Use 'start_time' (Common in Opta/Better data updates).
-    
-    # Correction: The previous debug showed 2017 had 'date' (TIMESTAMP). 2025 had 'start_time' (TIMESTAMP).
-    # I will iterate and define columns based on year.
-    pass
+    registry = _registry(project_id, dataset_id)
+
+    years = _seasons(registry, SCHEDULE_TABLE_PREFIX, only=seasons)
+    empty = not years
+    if empty:
+        # No selected season exists: keep a valid (empty) relation
+        years = _seasons(registry, SCHEDULE_TABLE_PREFIX)[:1]
 
     subqueries = []
-    for year in YEARS_TO_QUERY:
-        # Based on typical Opta/DataProvider schemas:
-        if year >= 2024:
-            ts_col = "start_time"
+    for year in years:
+        table = f"{SCHEDULE_TABLE_PREFIX}_{year}"
+        if registry is None or not registry.has_table(table):
+            # Offline fallback: legacy naming by year
+            ts_col = "start_time" if year >= 2024 else "date"
+            cols = [
+                "game_id",
+                f"{ts_col} as match_date",
+                "home_team",
+                "away_team",
+                "home_score",
+                "away_score",
+                "CAST(status as STRING) as status",
+            ]
         else:
-            ts_col = "date"
-            
+            cols = [
+                _column_expr(col, col_type, table, registry, SCHEDULE_COLUMN_ALIASES.get(col))
+                for col, col_type in SCHEDULE_COLUMN_TYPES.items()
+            ]
+        cols.insert(1, f"{year} as season")  # Hardcoded from table suffix
+
         subqueries.append(f"""
             SELECT 
-                game_id, 
-                {year} as season, -- Hardcoded from table suffix
-                {ts_col} as match_date, 
-                home_team, 
-                away_team, 
-                home_score, 
-                away_score, 
-                CAST(status as STRING) as status 
-            FROM `{project_id}.{dataset_id}.schedule_brasileirao_serie_a_{year}`
+                {", ".join(cols)}
+            FROM `{project_id}.{dataset_id}.{table}`{" WHERE FALSE" if empty else ""}
         """)
     return " UNION ALL ".join(subqueries)
 
 
-def _build_events_union(project_id: str, dataset_id: str) -> str:
+def _event_projection(
+    columns: List[str],
+    season_expr: str,
+    table: str,
+    registry: Optional[SchemaRegistry],
+    types: Optional[Dict[str, str]] = None,
+) -> str:
+    """SELECT list with only the requested columns, cast to their canonical type."""
+    types = types or EVENT_COLUMN_TYPES
+    parts = [
+        _column_expr(col, types.get(col), table, registry, EVENT_COLUMN_ALIASES.get(col))
+        for col in dict.fromkeys(columns)  # dedupe, keep order
+    ]
+    parts.append(season_expr)
+    return ", ".join(parts)
+
+
+def _all_event_columns(registry: SchemaRegistry, tables: List[str]) -> Dict[str, str]:
+    """Union of the columns of all season tables; conflicting types become STRING."""
+    col_types: Dict[str, str] = {}
+    for table in tables:
+        for col, col_type in registry.columns(table).items():
+            if col == "season":
+                continue
+            if col not in col_types:
+                col_types[col] = col_type
+            elif col_types[col] != col_type:
+                col_types[col] = "STRING"
+    return {**col_types, **{c: t for c, t in EVENT_COLUMN_TYPES.items() if c in col_types}}
+
+
+def _build_events_tables_union(
+    project_id: str,
+    dataset_id: str,
+    columns: Optional[List[str]] = None,
+    seasons: Optional[Iterable[int]] = None,
+    types: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Builds UNION ALL over the per-season Events tables (source of the consolidated table).
+    columns=None selects every column found in any season (materialization job).
+    types: target type per column (default EVENT_COLUMN_TYPES), e.g. the schema
+    of the consolidated table when appending to it.
+    """
+    registry = _registry(project_id, dataset_id)
+    years = _seasons(registry, EVENTS_TABLE_PREFIX, only=seasons)
+    empty = ""
+    if not years:
+        # No selected season exists: keep a valid (empty) relation
+        years, empty = _seasons(registry, EVENTS_TABLE_PREFIX)[:1], " WHERE FALSE"
+    tables = {year: f"{EVENTS_TABLE_PREFIX}_{year}" for year in years}
+
+    types = types or EVENT_COLUMN_TYPES
+    if columns is None:
+        if registry is None:
+            # events also need season if we ever query them directly for season stats
+            return " UNION ALL ".join([f"SELECT *, {year} as season FROM `{project_id}.{dataset_id}.{table}`{empty}" for year, table in tables.items()])
+        types = _all_event_columns(registry, list(tables.values()))
+        columns = list(types)
+
+    return " UNION ALL ".join([
+        f"SELECT {_event_projection(columns, f'{year} as season', table, registry, types)} FROM `{project_id}.{dataset_id}.{table}`{empty}"
+        for year, table in tables.items()
+    ])
+
+
+def _build_events_union(
+    project_id: str,
+    dataset_id: str,
+    columns: Optional[List[str]] = None,
+    seasons: Optional[Iterable[int]] = None,
+) -> str:
     """
-    Builds UNION ALL for Events tables, properly Aliasing/Casting.
-    Required: game_id, team, player, type, outcome_type, is_shot, x, y, end_x, end_y
+    Builds the Events source for the query builders.
+    Uses the consolidated (season-partitioned, clustered) table when enabled,
+    otherwise the UNION ALL of the per-season tables.
+    `columns` lists what the query actually reads; only those are projected
+    (BigQuery bills per column read). `season` is always present.
+    `seasons` prunes season tables / partitions.
     """
-    # events also need season if we ever query them directly for season stats
-    return " UNION ALL ".join([f"SELECT *, {year} as season FROM `{project_id}.{dataset_id}.eventos_brasileirao_serie_a_{year}`" for year in YEARS_TO_QUERY])
+    if _use_consolidated_events():
+        table = f"`{project_id}.{dataset_id}.{CONSOLIDATED_EVENTS_TABLE}`"
+        where = ""
+        if seasons is not None:
+            where = f" WHERE season IN ({', '.join(str(int(y)) for y in seasons) or 'NULL'})"
+        if columns is None:
+            return f"SELECT * FROM {table}{where}"
+        registry = _registry(project_id, dataset_id)
+        return f"SELECT {_event_projection(columns, 'season', CONSOLIDATED_EVENTS_TABLE, registry)} FROM {table}{where}"
+    return _build_events_tables_union(project_id, dataset_id, columns, seasons)
 
 
 def get_total_matches_query(project_id: str, dataset_id: str) -> str:
@@ -112,7 +393,8 @@ def get_total_events_query(project_id: str, dataset_id: str) -> str:
     # Union * requires strict type/order match.
     # Risky.
     # Let's try to be specific.
-    events_union = _build_events_union(project_id, dataset_id)
+    # No event column is needed to count rows: only the season literal is projected.
+    events_union = _build_events_union(project_id, dataset_id, columns=[])
     return f"""
         WITH all_events AS (
             {events_union}
@@ -142,13 +424,17 @@ def get_recent_matches_query(project_id: str, dataset_id: str, limit: int = 5) -
     """
 
 def get_match_stats_query(project_id: str, dataset_id: str) -> str:
+    mask_col = _qualifier_mask_column(project_id, dataset_id)
     schedule_union = _build_schedule_union(project_id, dataset_id)
-    # Start with simple Event Union. If it breaks, I'll fix.
-    events_union = _build_events_union(project_id, dataset_id)
+    events_union = _build_events_union(
+        project_id, dataset_id,
+        columns=["game_id", "team", "type", "outcome_type", "is_shot", "related_player_id", mask_col or "qualifiers"],
+    )
     
     # Define Regex patterns outside f-string to avoid 'Invalid format specifier' errors
     # Note: re_assist is no longer used for counting, as we use related_player_id on Goals
     re_key = r"['\"]displayName['\"]\s*:\s*['\"]KeyPass['\"]"
+    key_pass = _has_qualifier("KeyPass", mask_col) if mask_col else f"REGEXP_CONTAINS(qualifiers, r'''{re_key}''')"
 
     return f"""
     WITH all_schedule AS (
@@ -228,7 +514,7 @@ def get_match_stats_query(project_id: str, dataset_id: str) -> str:
             -- Qualifiers (String Parsing)
             -- Assist: Count Goals where related_player_id is set (Implicit Team Assist)
             COUNTIF(type = 'Goal' AND related_player_id IS NOT NULL) as assists,
-            COUNTIF(REGEXP_CONTAINS(qualifiers, r'''{re_key}''')) as key_passes
+            COUNTIF({key_pass}) as key_passes
         FROM all_events
         GROUP BY 1, 2
     )
@@ -258,21 +544,26 @@ def get_match_stats_query(project_id: str, dataset_id: str) -> str:
     """
 
 
-def get_players_by_team_query(project_id: str, dataset_id: str, team: str) -> str:
-    events_union = _build_events_union(project_id, dataset_id)
-    return f"""
+def get_players_by_team_query(project_id: str, dataset_id: str, team: str) -> CompiledQuery:
+    params = QueryParams()
+    events_union = _build_events_union(project_id, dataset_id, columns=["team", "player"])
+    return params.compile(f"""
     WITH all_events AS (
         {events_union}
     )
     SELECT DISTINCT player
     FROM all_events
-    WHERE team = '{team}' AND player IS NOT NULL
+    WHERE team = {params.scalar('team', 'STRING', team)} AND player IS NOT NULL
     ORDER BY player
-    """
+    """)
 
 
 def get_player_stats_query(project_id: str, dataset_id: str, year: int = 2025) -> str:
     # Keep using specific year for radar chart for now
+    if _use_consolidated_events():
+        source = f"`{project_id}.{dataset_id}.{CONSOLIDATED_EVENTS_TABLE}` WHERE season = {int(year)} AND"
+    else:
+        source = f"`{project_id}.{dataset_id}.{EVENTS_TABLE_PREFIX}_{year}` WHERE"
     return f"""
     SELECT
         player,
@@ -289,16 +580,20 @@ def get_player_stats_query(project_id: str, dataset_id: str, year: int = 2025) -
         COUNTIF(type = 'Interception') as interceptions,
         COUNTIF(type = 'Tackle') as tackles
         
-    FROM `{project_id}.{dataset_id}.eventos_brasileirao_serie_a_{year}`
-    WHERE player IS NOT NULL
+    FROM {source} player IS NOT NULL
     GROUP BY 1, 2
     """
 
 
-def get_player_events_query(project_id: str, dataset_id: str, player: str) -> str:
+def get_player_events_query(project_id: str, dataset_id: str, player: str) -> CompiledQuery:
+    params = QueryParams()
     # Use union for map too
-    events_union = _build_events_union(project_id, dataset_id)
-    return f"""
+    events_union = _build_events_union(
+        project_id, dataset_id,
+        columns=["game_id", "team", "player", "type", "outcome_type",
+                 "x", "y", "end_x", "end_y", "period", "minute", "second"],
+    )
+    return params.compile(f"""
     WITH all_events AS (
         {events_union}
     )
@@ -316,19 +611,23 @@ def get_player_events_query(project_id: str, dataset_id: str, player: str) -> st
         minute,
         second
     FROM all_events
-    WHERE player = '{player}'
-    """
+    WHERE player = {params.scalar('player', 'STRING', player)}
+    """)
 
 
 def get_player_rankings_query(project_id: str, dataset_id: str) -> str:
+    mask_col = _qualifier_mask_column(project_id, dataset_id)
     schedule_union = _build_schedule_union(project_id, dataset_id)
-    events_union = _build_events_union(project_id, dataset_id)
+    events_union = _build_events_union(
+        project_id, dataset_id,
+        columns=["game_id", "team", "player", "player_id", "related_player_id",
+                 "type", "outcome_type", "is_shot", mask_col or "qualifiers"],
+    )
 
     # Regex safety
-    # Regex safety
-    # re_assist removed, using join logic
-    re_key = r"['\"]displayName['\"]\s*:\s*['\"]KeyPass['\"]"
+    # re_assist removed, using join logic (assist_stats)
     re_key = r"['\"]displayName['\"]\s*:\s*['\"]KeyPass['\"]"
+    key_pass = _has_qualifier("KeyPass", mask_col) if mask_col else f"REGEXP_CONTAINS(qualifiers, r'''{re_key}''')"
 
     return f"""
     WITH all_schedule AS (
@@ -359,8 +658,7 @@ def get_player_rankings_query(project_id: str, dataset_id: str) -> str:
             COUNTIF(type = 'Clearance') as clearances,
             COUNTIF(type = 'Foul') as fouls, -- Corrected column name if needed
             
-            COUNTIF(REGEXP_CONTAINS(qualifiers, r'''{re_assist}''')) as assists,
-            COUNTIF(REGEXP_CONTAINS(qualifiers, r'''{re_key}''')) as key_passes
+            COUNTIF({key_pass}) as key_passes
         FROM all_events
         WHERE player IS NOT NULL
         GROUP BY 1, 2, 3
@@ -399,8 +697,6 @@ def get_player_rankings_query(project_id: str, dataset_id: str) -> str:
         p.recoveries,
         p.clearances,
         p.fouls,
-        p.clearances,
-        p.fouls,
         COALESCE(a.assists, 0) as assists,
         p.key_passes
     FROM player_stats p
@@ -410,6 +706,268 @@ def get_player_rankings_query(project_id: str, dataset_id: str) -> str:
     """
 
 
+def _event_filter_where(
+    etypes: object,
+    outcomes: object,
+    quals: object,
+    teams: object,
+    players: object,
+    params: QueryParams,
+    qualifier_mask_col: Optional[str] = None,
+    prefix: str = "",
+) -> str:
+    """
+    WHERE clause for the ranking filters (type, outcome, qualifiers, team, player),
+    built from src.expr predicates. Values are bound as query parameters named
+    `{prefix}types`, `{prefix}teams`, ...
+    Teams are matched on effective_team (own goals count for the beneficiary).
+    With `qualifier_mask_col` the qualifier filter is a bitmask test instead of a regex.
+    """
+    conditions = []
+    # 1. Event Type
+    etypes = _as_list(etypes)
+    if etypes and "Todos" not in etypes:
+        conditions.append(Type.isin(etypes))
+
+    # 2. Outcome
+    outcomes = _as_list(outcomes)
+    if outcomes and "Todos" not in outcomes:
+        labels = {"Sucesso": "Successful", "Falha": "Unsuccessful"}
+        conditions.append(Outcome.isin([labels.get(out, out) for out in outcomes]))
+
+    # 3. Qualifiers (Regex OR / any bit of the mask)
+    quals = _as_list(quals)
+    if quals and "Todos (Qualquer)" not in quals:
+        if qualifier_mask_col:
+            conditions.append(QualMask.renamed(qualifier_mask_col).any_bit(_qualifier_mask(quals)))
+        else:
+            conditions.append(Qualifiers.contains_any(quals))
+
+    # 4. Players
+    players = _as_list(players)
+    if players and "Todos" not in players:
+        conditions.append(Player.isin(players))
+
+    # 5. Teams (Applied on effective_team, not on the raw team column)
+    teams = _as_list(teams)
+    if teams and "Todos" not in teams:
+        conditions.append(EffectiveTeam.isin(teams))
+
+    return all_of(*conditions).to_sql(params, prefix=prefix)
+
+
+# -----------------------------
+# Qualifier bitmask
+# -----------------------------
+def _qualifier_mask(quals: object) -> Optional[int]:
+    """Bitmask for a qualifier selection; None if a tag is outside QUALIFIER_TAGS."""
+    if isinstance(quals, str): quals = [quals]
+    mask = 0
+    for q in quals or []:
+        if not q:
+            continue
+        if q not in QUALIFIER_TAGS:
+            return None
+        mask |= 1 << QUALIFIER_TAGS.index(q)
+    return mask
+
+
+def _qualifier_mask_expr(col: str = "qualifiers") -> str:
+    """SQL computing the qualifier bitmask (same substring semantics as the regex filter)."""
+    terms = [
+        f"CASE WHEN REGEXP_CONTAINS({col}, r'{re.escape(tag)}') THEN {1 << i} ELSE 0 END"
+        for i, tag in enumerate(QUALIFIER_TAGS)
+    ]
+    return "(" + " + ".join(terms) + ")"
+
+
+def _masks_cover(*qualifier_filters: object) -> bool:
+    """True when every selected qualifier has a bit in QUALIFIER_TAGS."""
+    return all(
+        not quals or "Todos (Qualquer)" in quals or _qualifier_mask(quals) is not None
+        for quals in qualifier_filters
+    )
+
+
+def _qualifier_mask_column(project_id: str, dataset_id: str, *qualifier_filters: object) -> Optional[str]:
+    """
+    QUALIFIER_MASK_COLUMN when the events source carries the precomputed mask
+    (consolidated table) and it covers the selected qualifiers, else None
+    (callers then fall back to REGEXP_CONTAINS on the raw string).
+    """
+    if not _use_consolidated_events() or not _masks_cover(*qualifier_filters):
+        return None
+    registry = _registry(project_id, dataset_id)
+    if registry is None or registry.column_type(CONSOLIDATED_EVENTS_TABLE, QUALIFIER_MASK_COLUMN) is None:
+        return None
+    return QUALIFIER_MASK_COLUMN
+
+
+def _has_qualifier(tag: str, mask_col: Optional[str], alias: str = "") -> str:
+    """Predicate 'event has this qualifier': bit test on the mask or regex on the raw string."""
+    prefix = f"{alias}." if alias else ""
+    if mask_col:
+        return f"({prefix}{mask_col} & {_qualifier_mask(tag)}) != 0"
+    return f"REGEXP_CONTAINS({prefix}qualifiers, r'{re.escape(tag)}')"
+
+
+def _effective_team_calculation(perspective: str, mask_col: Optional[str]) -> str:
+    """
+    effective_team for events_enhanced: own goals count for the beneficiary.
+    perspective "both": events are crossed with the perspectives CTE (alias p)
+    and each copy gets the team of its own perspective.
+    """
+    own_goal = f"e.type = 'Goal' AND {_has_qualifier('OwnGoal', mask_col, 'e')}"
+    opponent = """
+                    CASE 
+                        WHEN e.team = m.home_team THEN m.away_team 
+                        WHEN e.team = m.away_team THEN m.home_team 
+                        ELSE e.team
+                    END"""
+    against = f"""
+            CASE
+               WHEN {own_goal} THEN e.team
+               ELSE{opponent}
+            END"""
+    pro = f"""
+            CASE 
+                WHEN {own_goal} THEN{opponent}
+                ELSE e.team
+            END"""
+    if perspective == "both":
+        return f"""
+            CASE WHEN p.perspective = 'against' THEN {against}
+            ELSE {pro}
+            END as effective_team
+        """
+    return f"{against if perspective == 'against' else pro} as effective_team\n        "
+
+
+def _perspectives_cte() -> str:
+    return """perspectives AS (
+        SELECT 'pro' as perspective UNION ALL SELECT 'against' as perspective
+    )"""
+
+
+# -----------------------------
+# Event cube
+# -----------------------------
+def _cube_serves(project_id: str, dataset_id: str, *qualifier_filters: object) -> bool:
+    """True when the cube is enabled, materialized and knows every selected qualifier."""
+    if not get_bool_setting("event_cube", False):
+        return False
+    registry = _registry(project_id, dataset_id)
+    if registry is None or not registry.has_table(EVENT_CUBE_TABLE):
+        return False
+    return _masks_cover(*qualifier_filters)
+
+
+def _cube_ctes(
+    project_id: str,
+    dataset_id: str,
+    perspective: str,
+    seasons: Optional[List[int]],
+    date_range: object,
+    params: QueryParams,
+) -> str:
+    """
+    event_cube + match_metadata CTEs read from the cube (perspective, seasons and period pruned).
+    perspective "both" keeps the cells of both perspectives (rows carry `perspective`).
+    """
+    where = [_date_range_predicate(date_range, params)]
+    if perspective != "both":
+        where.append(f"perspective = '{'against' if perspective == 'against' else 'pro'}'")
+    if seasons is not None:
+        where.append(f"season IN UNNEST({params.array('seasons', 'INT64', [int(y) for y in seasons])})")
+    return f"""
+    event_cube AS (
+        SELECT *
+        FROM `{project_id}.{dataset_id}.{EVENT_CUBE_TABLE}`
+        WHERE {" AND ".join(where)}
+    ),
+    match_metadata AS (
+        SELECT DISTINCT game_id, match_date as start_time, season
+        FROM event_cube
+    )"""
+
+
+def get_event_cube_sql(
+    project_id: str,
+    dataset_id: str,
+    seasons: Optional[Iterable[int]] = None,
+    only_new_games: bool = False,
+) -> str:
+    """
+    SELECT that builds the event cube: one row per game x perspective x
+    effective team x team x player x type x outcome x qualifier mask, with the
+    event count. Own goals are attributed exactly as in the ranking queries.
+    only_new_games: only games not yet in the cube (incremental refresh).
+    """
+    mask_col = _qualifier_mask_column(project_id, dataset_id)
+    schedule_union = _build_schedule_union(project_id, dataset_id, seasons=seasons)
+    events_union = _build_events_union(
+        project_id, dataset_id,
+        columns=["game_id", "team", "player", "player_id", "type", "outcome_type", mask_col or "qualifiers"],
+        seasons=seasons,
+    )
+    new_games = ""
+    if only_new_games:
+        # NOT EXISTS, not NOT IN: a single NULL game_id in the cube would make NOT IN reject every row
+        new_games = f"""WHERE NOT EXISTS (
+            SELECT 1 FROM `{project_id}.{dataset_id}.{EVENT_CUBE_TABLE}` c WHERE c.game_id = e.game_id
+        )"""
+
+    return f"""
+    WITH all_schedule AS (
+        {schedule_union}
+    ),
+    all_events AS (
+        {events_union}
+    ),
+    base AS (
+        SELECT
+            m.season,
+            e.game_id,
+            m.match_date,
+            e.team,
+            e.player,
+            e.player_id,
+            e.type,
+            e.outcome_type,
+            {f"e.{mask_col}" if mask_col else _qualifier_mask_expr("e.qualifiers")} as qual_mask,
+            COALESCE(e.type = 'Goal' AND {_has_qualifier('OwnGoal', mask_col, 'e')}, FALSE) as own_goal,
+            CASE
+                WHEN e.team = m.home_team THEN m.away_team
+                WHEN e.team = m.away_team THEN m.home_team
+                ELSE e.team
+            END as opponent
+        FROM all_events e
+        JOIN all_schedule m ON e.game_id = m.game_id
+        {new_games}
+    ),
+    {_perspectives_cte()}
+    SELECT
+        b.season,
+        b.game_id,
+        b.match_date,
+        p.perspective,
+        CASE
+            WHEN p.perspective = 'pro' THEN (CASE WHEN b.own_goal THEN b.opponent ELSE b.team END)
+            ELSE (CASE WHEN b.own_goal THEN b.team ELSE b.opponent END)
+        END as effective_team,
+        b.team,
+        b.player,
+        b.player_id,
+        b.type,
+        b.outcome_type,
+        b.qual_mask,
+        COUNT(*) as event_count
+    FROM base b
+    CROSS JOIN perspectives p
+    GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11
+    """
+
+
 def get_dynamic_ranking_query(
     project_id: str, 
     dataset_id: str, 
@@ -420,86 +978,58 @@ def get_dynamic_ranking_query(
     use_related_player: bool = False,
     teams: object = None, # str or list
     players: object = None, # str or list
-    perspective: str = "pro" # "pro" or "against"
-) -> str:
+    perspective: str = "pro", # "pro", "against" or "both"
+    seasons: object = None, # list of seasons (None = all)
+    date_range: object = None, # (start, end) dates, inclusive; either may be None
+) -> CompiledQuery:
     """
     Constructs a specific query based on dynamic user filters.
     Returns grouping by match_id + subject to allow same downstream processing.
+    Seasons and the date range are pushed down: only the matching season tables
+    are scanned and the period filter runs in SQL.
+    Filter values are query parameters (see QueryParams).
+    perspective="both" computes pro and against in the same scan: rows carry a
+    `perspective` column and the team filter applies per perspective.
     """
-    schedule_union = _build_schedule_union(project_id, dataset_id)
-    events_union = _build_events_union(project_id, dataset_id)
-    
-    # Build WHERE clauses
-    where_clauses = ["1=1"] # fallback
-    
-    # 1. Event Type
-    if event_types and "Todos" not in event_types:
-        if isinstance(event_types, list):
-             types_str = "', '".join(event_types)
-             where_clauses.append(f"type IN ('{types_str}')")
-        else:
-             where_clauses.append(f"type = '{event_types}'")
-    
-    # 2. Outcome
+    params = QueryParams()
+    both = perspective == "both"
+    by_perspective = "perspective, " if both else ""
+    scan_seasons = _seasons_for_query(project_id, dataset_id, seasons, date_range)
+    schedule_union = _build_schedule_union(project_id, dataset_id, seasons=scan_seasons)
+
+    # Precomputed qualifier bitmask (consolidated table) replaces regex on the raw string
+    mask_col = _qualifier_mask_column(project_id, dataset_id, qualifiers)
+
+    # Columns this query reads (Own Goal attribution always needs team/type/qualifiers)
+    event_columns = ["game_id", "team", "type", mask_col or "qualifiers"]
     if outcomes and "Todos" not in outcomes:
-        target_outcomes = []
-        if isinstance(outcomes, str): outcomes = [outcomes]
-        for out in outcomes:
-            if out == "Sucesso": target_outcomes.append("Successful")
-            elif out == "Falha": target_outcomes.append("Unsuccessful")
-            else: target_outcomes.append(out)
-            
-        if target_outcomes:
-            out_str = "', '".join(target_outcomes)
-            where_clauses.append(f"outcome_type IN ('{out_str}')")
-
-    # 3. Qualifiers (Regex OR)
-    if qualifiers and "Todos (Qualquer)" not in qualifiers:
-        if isinstance(qualifiers, str): qualifiers = [qualifiers]
-        safe_quals = [re.escape(q) for q in qualifiers if q]
-        if safe_quals:
-            pattern = "|".join(safe_quals)
-            where_clauses.append(f"REGEXP_CONTAINS(qualifiers, r'{pattern}')")
-
-    # 4. Teams - Will be handled later via effective_team if needed
-    # But checking input here for variables
-    # If user filters by team, we want to filter on effective_team later.
-    team_in_clause = None
-    if teams and "Todos" not in teams:
-        if isinstance(teams, list):
-             teams_str = "', '".join(teams)
-             team_in_clause = f"effective_team IN ('{teams_str}')"
-        else:
-             team_in_clause = f"effective_team = '{teams}'"
-        
-        # We DO NOT add to where_clauses yet because 'team' column checks would be wrong for OGs
-        # where_clauses.append(team_in_clause) <--- We add this to the FINAL Where using effective_team
+        event_columns.append("outcome_type")
+    if subject == "Jogadores" or (players and "Todos" not in players):
+        event_columns.append("player")
+    if use_related_player and subject == "Jogadores":
+        event_columns += ["player", "player_id", "related_player_id"]
+    events_union = _build_events_union(project_id, dataset_id, columns=event_columns, seasons=scan_seasons)
 
-    # 5. Players
-    if players and "Todos" not in players:
-        if isinstance(players, list):
-             players_str = "', '".join(players)
-             where_clauses.append(f"player IN ('{players_str}')")
-        else:
-             where_clauses.append(f"player = '{players}'")
+    # Assists need the raw related_player_id; everything else can be served by the cube
+    use_cube = not (use_related_player and subject == "Jogadores") and _cube_serves(project_id, dataset_id, qualifiers)
 
-    where_str = " AND ".join(where_clauses)
-    
-    # Add effective_team filter if it exists
-    if team_in_clause:
-        where_str += f" AND {team_in_clause}"
+    # Build WHERE clauses (teams are filtered on effective_team, see _event_filter_where)
+    where_str = _event_filter_where(
+        event_types, outcomes, qualifiers, teams, players, params,
+        qualifier_mask_col=QUALIFIER_MASK_COLUMN if use_cube else mask_col,
+    )
 
     
     # Select columns based on subject
     if subject == "Jogadores":
-        group_cols = "game_id, player, team"
-        select_cols = "game_id, player, team"
+        group_cols = f"{by_perspective}game_id, player, team"
+        select_cols = f"{by_perspective}game_id, player, team"
         join_on = "p.game_id = m.game_id"
         base_where = "player IS NOT NULL"
     else:
         # Equipes
-        group_cols = "game_id, team"
-        select_cols = "game_id, team"
+        group_cols = f"{by_perspective}game_id, team"
+        select_cols = f"{by_perspective}game_id, team"
         join_on = "p.game_id = m.game_id" # Match dates join is same
         base_where = "team IS NOT NULL" # We will replace 'team' with 'effective_team'
 
@@ -514,19 +1044,22 @@ def get_dynamic_ranking_query(
         # Override for Assist Logic (Calculated on RAW events usually, but we should use events_enhanced?)
         # If we use events_enhanced, we get effective_team.
         # Ideally yes.
+        # Raw team for assists: both perspectives get the same rows
         filtered_events_block = f"""
         filtered_events AS (
             SELECT
+                {"p.perspective," if both else ""}
                 e.game_id,
                 n.player,
                 e.team, -- Keep original team for player? Or effective? Usually original.
                 COUNT(*) as metric_count
             FROM all_events e -- Use raw events for assists as it's specific logic
             JOIN player_names n ON e.related_player_id = n.player_id
+            {"CROSS JOIN perspectives p" if both else ""}
             WHERE 1=1
             AND e.related_player_id IS NOT NULL
             AND {where_str.replace('effective_team', 'team')} -- Provide fallback if we use raw events
-            GROUP BY 1, 2, 3
+            GROUP BY {"1, 2, 3, 4" if both else "1, 2, 3"}
         )
         """
     else:
@@ -541,19 +1074,23 @@ def get_dynamic_ranking_query(
         # Note: events_enhanced has 'team' (original) and 'effective_team' (beneficiary).
         
         target_table = "events_enhanced"
+        count_expr = "COUNT(*)"
+        if use_cube:
+            target_table = "event_cube"
+            count_expr = "CAST(SUM(event_count) AS INT64)"
         
         # If Subject Equipes, we group by effective_team aliased as team
         if subject == "Equipes":
             filtered_events_block = f"""
             filtered_events AS (
                 SELECT
-                    game_id,
+                    {by_perspective}game_id,
                     effective_team as team,
-                    COUNT(*) as metric_count
+                    {count_expr} as metric_count
                 FROM {target_table}
                 WHERE {final_base_where}
                 AND {final_where}
-                GROUP BY game_id, effective_team
+                GROUP BY {by_perspective}game_id, effective_team
             )
             """
         else:
@@ -562,7 +1099,7 @@ def get_dynamic_ranking_query(
             filtered_events AS (
                 SELECT
                     {select_cols},
-                    COUNT(*) as metric_count
+                    {count_expr} as metric_count
                 FROM {target_table}
                 WHERE {base_where}
                 AND {final_where}
@@ -570,33 +1107,26 @@ def get_dynamic_ranking_query(
             )
             """
 
+    if use_cube:
+        return params.compile(f"""
+    WITH {_cube_ctes(project_id, dataset_id, perspective, scan_seasons, date_range, params)},
+
+    {filtered_events_block}
+
+    SELECT
+        p.*,
+        m.start_time as match_date,
+        m.season
+    FROM filtered_events p
+    JOIN match_metadata m ON {join_on}
+    """)
+
+    date_predicate = _date_range_predicate(date_range, params)
+
     # Logic for Effective Team
-    if perspective == "against":
-         effective_team_calculation = """
-            CASE
-               WHEN e.type = 'Goal' AND REGEXP_CONTAINS(e.qualifiers, r'OwnGoal') THEN e.team
-               ELSE
-                    CASE 
-                        WHEN e.team = m.home_team THEN m.away_team 
-                        WHEN e.team = m.away_team THEN m.home_team 
-                        ELSE e.team
-                    END
-            END as effective_team
-        """
-    else:
-        effective_team_calculation = """
-            CASE 
-                WHEN e.type = 'Goal' AND REGEXP_CONTAINS(e.qualifiers, r'OwnGoal') THEN
-                    CASE 
-                        WHEN e.team = m.home_team THEN m.away_team 
-                        WHEN e.team = m.away_team THEN m.home_team 
-                        ELSE e.team
-                    END
-                ELSE e.team
-            END as effective_team
-        """
+    effective_team_calculation = _effective_team_calculation(perspective, mask_col)
 
-    return f"""
+    return params.compile(f"""
     WITH all_schedule AS (
         {schedule_union}
     ),
@@ -607,15 +1137,18 @@ def get_dynamic_ranking_query(
     match_metadata AS (
         SELECT game_id, match_date as start_time, season, home_team, away_team
         FROM all_schedule
+        WHERE {date_predicate}
     ),
+    {_perspectives_cte() + "," if both else ""}
     
     events_enhanced AS (
         SELECT 
             e.*,
+            {"p.perspective," if both else ""}
             {effective_team_calculation}
         FROM all_events e
         JOIN match_metadata m ON e.game_id = m.game_id
-
+        {"CROSS JOIN perspectives p" if both else ""}
     )
     {extra_cte},
     
@@ -628,7 +1161,7 @@ def get_dynamic_ranking_query(
         m.season
     FROM filtered_events p
     JOIN match_metadata m ON {join_on}
-    """
+    """)
 
 
 def get_conversion_ranking_query(
@@ -648,13 +1181,21 @@ def get_conversion_ranking_query(
     
     teams: object = None,
     players: object = None,
-    perspective: str = "pro"
-) -> str:
+    perspective: str = "pro",
+    seasons: object = None,
+    date_range: object = None,
+) -> CompiledQuery:
 
     """
     Constructs a ranking query for Efficiency/Conversion.
     Returns: game_id, team/player, numerator_count, denominator_count, ratio
+    Seasons and date range are pushed down as in get_dynamic_ranking_query.
+    Filter values are query parameters, prefixed num_/den_ per side.
+    perspective="both": one scan for pro and against, as in get_dynamic_ranking_query.
     """
+    params = QueryParams()
+    both = perspective == "both"
+    by_perspective = "perspective, " if both else ""
     # Reuse the logic builders from get_dynamic_ranking_query but applied twice
     # We essentially need to generate the CTEs for both, then join.
     
@@ -666,109 +1207,50 @@ def get_conversion_ranking_query(
     # checking file structure... _build_enhanced_events is not a separate function yet.
     # I will inline it for now to ensure correctness, as extracting might be risky without tests.
     
-    schedule_union = _build_schedule_union(project_id, dataset_id)
-    events_union = _build_events_union(project_id, dataset_id)
+    scan_seasons = _seasons_for_query(project_id, dataset_id, seasons, date_range)
+    schedule_union = _build_schedule_union(project_id, dataset_id, seasons=scan_seasons)
+
+    mask_col = _qualifier_mask_column(project_id, dataset_id, num_qualifiers, den_qualifiers)
+    event_columns = ["game_id", "team", "type", mask_col or "qualifiers"]
+    if any(o and "Todos" not in o for o in (num_outcomes, den_outcomes)):
+        event_columns.append("outcome_type")
+    if subject == "Jogadores" or (players and "Todos" not in players):
+        event_columns.append("player")
+    events_union = _build_events_union(project_id, dataset_id, columns=event_columns, seasons=scan_seasons)
     
-    def _build_filter_where(etypes, outcomes, quals, teams, players):
-        where_clauses = ["1=1"]
-        # 1. Event Type
-        if etypes and "Todos" not in etypes:
-            if isinstance(etypes, list):
-                 types_str = "', '".join(etypes)
-                 where_clauses.append(f"type IN ('{types_str}')")
-            else:
-                 where_clauses.append(f"type = '{etypes}'")
-        
-        # 2. Outcome
-        if outcomes and "Todos" not in outcomes:
-            target_outcomes = []
-            if isinstance(outcomes, str): outcomes = [outcomes]
-            for out in outcomes:
-                if out == "Sucesso": target_outcomes.append("Successful")
-                elif out == "Falha": target_outcomes.append("Unsuccessful")
-                else: target_outcomes.append(out)
-            if target_outcomes:
-                out_str = "', '".join(target_outcomes)
-                where_clauses.append(f"outcome_type IN ('{out_str}')")
-
-        # 3. Qualifiers
-        if quals and "Todos (Qualquer)" not in quals:
-            if isinstance(quals, str): quals = [quals]
-            safe_quals = [re.escape(q) for q in quals if q]
-            if safe_quals:
-                pattern = "|".join(safe_quals)
-                where_clauses.append(f"REGEXP_CONTAINS(qualifiers, r'{pattern}')")
-        
-        # 4. Teams (Applied on effective_team later)
-        team_clause = None
-        if teams and "Todos" not in teams:
-            if isinstance(teams, list):
-                 teams_str = "', '".join(teams)
-                 team_clause = f"effective_team IN ('{teams_str}')"
-            else:
-                 team_clause = f"effective_team = '{teams}'"
-
-        # 5. Players
-        if players and "Todos" not in players:
-            if isinstance(players, list):
-                 players_str = "', '".join(players)
-                 where_clauses.append(f"player IN ('{players_str}')")
-            else:
-                 where_clauses.append(f"player = '{players}'")
-
-        base_where = " AND ".join(where_clauses)
-        if team_clause:
-            base_where += f" AND {team_clause}"
-            
-        return base_where
+    use_cube = _cube_serves(project_id, dataset_id, num_qualifiers, den_qualifiers)
+    if use_cube:
+        mask_col = QUALIFIER_MASK_COLUMN
 
     # Build Where clauses
-    where_num = _build_filter_where(num_event_types, num_outcomes, num_qualifiers, teams, players)
-    where_den = _build_filter_where(den_event_types, den_outcomes, den_qualifiers, teams, players)
+    where_num = _event_filter_where(num_event_types, num_outcomes, num_qualifiers, teams, players, params, mask_col, prefix="num_")
+    where_den = _event_filter_where(den_event_types, den_outcomes, den_qualifiers, teams, players, params, mask_col, prefix="den_")
     
     # Grouping Config
     if subject == "Jogadores":
-        group_cols = "game_id, player, team"
-        select_cols = "game_id, player, team"
+        # Players keep their own team (same as get_dynamic_ranking_query)
+        group_cols = f"{by_perspective}game_id, player, team"
+        select_cols = f"{by_perspective}game_id, player, team"
         join_on = "p.game_id = m.game_id"
         base_where_sql = "player IS NOT NULL"
     else:
         # Equipes
-        group_cols = "game_id, team" # effectively effective_team aliased
-        select_cols = "game_id, effective_team as team"
+        group_cols = f"{by_perspective}game_id, effective_team"
+        select_cols = f"{by_perspective}game_id, effective_team as team"
         join_on = "p.game_id = m.game_id"
         base_where_sql = "team IS NOT NULL" # targets effective_team
 
     # Logic for Effective Team (Same as dynamic ranking)
-    if perspective == "against":
-         effective_team_calculation = """
-            CASE
-               WHEN e.type = 'Goal' AND REGEXP_CONTAINS(e.qualifiers, r'OwnGoal') THEN e.team
-               ELSE
-                    CASE 
-                        WHEN e.team = m.home_team THEN m.away_team 
-                        WHEN e.team = m.away_team THEN m.home_team 
-                        ELSE e.team
-                    END
-            END as effective_team
-        """
-    else:
-        effective_team_calculation = """
-            CASE 
-                WHEN e.type = 'Goal' AND REGEXP_CONTAINS(e.qualifiers, r'OwnGoal') THEN
-                    CASE 
-                        WHEN e.team = m.home_team THEN m.away_team 
-                        WHEN e.team = m.away_team THEN m.home_team 
-                        ELSE e.team
-                    END
-                ELSE e.team
-            END as effective_team
-        """
-
+    effective_team_calculation = _effective_team_calculation(perspective, mask_col)
 
-    
-    return f"""
-    WITH all_schedule AS (
+    source, count_expr = "events_enhanced", "COUNT(*)"
+    if use_cube:
+        source_ctes = _cube_ctes(project_id, dataset_id, perspective, scan_seasons, date_range, params)
+        source, count_expr = "event_cube", "CAST(SUM(event_count) AS INT64)"
+    else:
+        date_predicate = _date_range_predicate(date_range, params)
+        source_ctes = f"""
+    all_schedule AS (
         {schedule_union}
     ),
     all_events AS (
@@ -777,39 +1259,46 @@ def get_conversion_ranking_query(
     match_metadata AS (
         SELECT game_id, match_date as start_time, season, home_team, away_team
         FROM all_schedule
+        WHERE {date_predicate}
     ),
+    {_perspectives_cte() + "," if both else ""}
     events_enhanced AS (
         SELECT 
             e.*,
+            {"p.perspective," if both else ""}
             -- Calculate Effective Team (Fix for Own Goals)
-            e.*,
             {effective_team_calculation}
 
         FROM all_events e
         JOIN match_metadata m ON e.game_id = m.game_id
-    ),
+        {"CROSS JOIN perspectives p" if both else ""}
+    )"""
+
+    return params.compile(f"""
+    WITH {source_ctes},
     
     cte_numerator AS (
         SELECT
             {select_cols},
-            COUNT(*) as num_count
-        FROM events_enhanced
+            {count_expr} as num_count
+        FROM {source}
         WHERE {base_where_sql.replace('team', 'effective_team')} 
         AND {where_num}
-        GROUP BY {group_cols.replace('team', 'effective_team')}
+        GROUP BY {group_cols}
     ),
     
     cte_denominator AS (
         SELECT
              {select_cols},
-            COUNT(*) as den_count
-        FROM events_enhanced
+            {count_expr} as den_count
+        FROM {source}
         WHERE {base_where_sql.replace('team', 'effective_team')} 
         AND {where_den}
-        GROUP BY {group_cols.replace('team', 'effective_team')}
+        GROUP BY {group_cols}
     )
     
     SELECT
+        {"COALESCE(n.perspective, d.perspective) as perspective," if both else ""}
         COALESCE(n.game_id, d.game_id) as game_id,
         COALESCE(n.team, d.team) as team,
         { "COALESCE(n.player, d.player) as player," if subject == "Jogadores" else "" }
@@ -826,10 +1315,87 @@ def get_conversion_ranking_query(
     FULL OUTER JOIN cte_denominator d 
         ON n.game_id = d.game_id 
         AND n.team = d.team
+        { "AND n.perspective = d.perspective" if both else "" }
         { "AND n.player = d.player" if subject == "Jogadores" else "" }
         
     JOIN match_metadata m ON COALESCE(n.game_id, d.game_id) = m.game_id
+    """)
+
+
+def get_ranking_top_query(
+    query: CompiledQuery,
+    subject: str, # 'Equipes' or 'Jogadores'
+    by_season: bool = True,
+    per_match: bool = False,
+    top_n: Optional[int] = None,
+    conversion: bool = False,
+    by_perspective: bool = False,
+) -> CompiledQuery:
+    """
+    Aggregates a per-match ranking query (get_dynamic_ranking_query or
+    get_conversion_ranking_query) in the database instead of pandas:
+    one row per team / player (per season or historical) with `matches`
+    (distinct games), the summed counts, `display_metric` (total, per match
+    or conversion %) and `rank`, limited to the top N.
+    by_perspective: the query was built with perspective="both"; ranking
+    and top N are then computed per perspective.
     """
+    params = QueryParams()
+    params.bindings = list(query.params)
+
+    if subject == "Jogadores":
+        keys = ["player", "team", "season"] if by_season else ["player"]
+    else:
+        keys = ["team", "season"] if by_season else ["team"]
+    partition = ""
+    if by_perspective:
+        keys = ["perspective"] + keys
+        partition = "PARTITION BY perspective"
+    key_cols = ", ".join(keys)
+
+    if conversion:
+        sums = "SUM(numerator) as numerator, SUM(denominator) as denominator"
+        metric = """
+            COALESCE(SAFE_DIVIDE(numerator, denominator), 0) as ratio_val,
+            COALESCE(SAFE_DIVIDE(numerator, denominator), 0) * 100 as ratio_pct,
+            COALESCE(SAFE_DIVIDE(numerator, denominator), 0) * 100 as display_metric"""
+    else:
+        sums = "SUM(metric_count) as metric_count"
+        metric = "SAFE_DIVIDE(metric_count, matches) as display_metric" if per_match else "metric_count as display_metric"
+
+    top_filter = "1=1"
+    if top_n:
+        top_filter = f"rank <= {params.scalar('top_n', 'INT64', int(top_n))}"
+
+    return params.compile(f"""
+    WITH per_match AS (
+        {query.sql}
+    ),
+    aggregated AS (
+        SELECT
+            {key_cols},
+            COUNT(DISTINCT game_id) as matches,
+            {sums}
+        FROM per_match
+        GROUP BY {key_cols}
+    ),
+    scored AS (
+        SELECT
+            *,
+            {metric}
+        FROM aggregated
+    ),
+    ranked AS (
+        SELECT
+            *,
+            ROW_NUMBER() OVER ({partition} ORDER BY display_metric DESC, {", ".join(k for k in keys if k != "perspective")}) as rank
+        FROM scored
+    )
+    SELECT *
+    FROM ranked
+    WHERE {top_filter}
+    ORDER BY {"perspective, " if by_perspective else ""}rank
+    """)
 
 
 def get_teams_match_count_query(project_id: str, dataset_id: str) -> str:
@@ -862,6 +1428,23 @@ def get_teams_match_count_query(project_id: str, dataset_id: str) -> str:
     """
 
 
+def get_season_date_bounds_query(project_id: str, dataset_id: str, seasons: object = None) -> str:
+    """
+    First and last match date of the selected seasons (all when empty).
+    Used as bounds/defaults for the period filter before loading rankings.
+    """
+    schedule_union = _build_schedule_union(project_id, dataset_id, seasons=_seasons_for_query(project_id, dataset_id, seasons, None))
+    return f"""
+    WITH all_schedule AS (
+        {schedule_union}
+    )
+    SELECT
+        MIN(CAST(match_date AS DATE)) as min_date,
+        MAX(CAST(match_date AS DATE)) as max_date
+    FROM all_schedule
+    """
+
+
 def get_all_teams_query(project_id: str, dataset_id: str) -> str:
     """
     Get unique list of teams for dropdowns.
@@ -880,18 +1463,18 @@ def get_all_teams_query(project_id: str, dataset_id: str) -> str:
     ORDER BY team
     """
 
-def get_all_players_query(project_id: str, dataset_id: str, teams: list = None) -> str:
+def get_all_players_query(project_id: str, dataset_id: str, teams: list = None) -> CompiledQuery:
     """
     Get unique list of players, optionally filtered by teams.
     """
-    events_union = _build_events_union(project_id, dataset_id)
+    params = QueryParams()
+    events_union = _build_events_union(project_id, dataset_id, columns=["player", "team"])
     
     where_clause = "player IS NOT NULL"
     if teams:
-        teams_str = "', '".join(teams)
-        where_clause += f" AND team IN ('{teams_str}')"
+        where_clause += f" AND team IN UNNEST({params.array('teams', 'STRING', teams)})"
         
-    return f"""
+    return params.compile(f"""
     WITH all_events AS (
         {events_union}
     )
@@ -899,5 +1482,4 @@ def get_all_players_query(project_id: str, dataset_id: str, teams: list = None)
     FROM all_events
     WHERE {where_clause}
     ORDER BY player
-    """
-
+    """)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import Optional
+import pandas as pd
+import streamlit as st
+
+from src.bq_io import run_query
+from src.queries import get_conversion_ranking_query, get_dynamic_ranking_query, get_ranking_top_query
+
+
+PERSPECTIVES = ("pro", "against")
+
+
+# -----------------------------
+# Carga compartilhada (Pró / Contra)
+# -----------------------------
+@st.cache_data(ttl=300)
+def load_ranking_data(
+    project_id: str,
+    dataset_id: str,
+    subject: str,
+    etypes: object,
+    outs: object,
+    quals: object,
+    use_rel: bool,
+    teams: object,
+    players: object,
+    analysis_type: str,
+    d_types: object = None,
+    d_outs: object = None,
+    d_quals: object = None,
+    seasons: Optional[tuple] = None,
+    date_range: Optional[tuple] = None,
+    by_season: bool = True,
+    per_match: bool = False,
+    top_n: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Ranking já agregado e ordenado no banco para as DUAS perspectivas (coluna
+    `perspective`) numa única query: uma linha por equipe/jogador (por
+    temporada ou histórico), com `matches`, contagens, `display_metric` e
+    `rank`, limitado ao top N de cada perspectiva. As páginas Pró e Contra
+    chamam esta função com os mesmos filtros, então alternar entre elas
+    reaproveita o mesmo resultado em cache.
+    """
+    if analysis_type == "Volume Total":
+        query = get_dynamic_ranking_query(
+            project_id, dataset_id, subject, etypes, outs, quals, use_rel, teams, players,
+            perspective="both", seasons=seasons, date_range=date_range,
+        )
+    else:
+        # Conversão
+        query = get_conversion_ranking_query(
+            project_id, dataset_id, subject,
+            etypes, outs, quals,
+            d_types, d_outs, d_quals,
+            teams, players, perspective="both",
+            seasons=seasons, date_range=date_range,
+        )
+
+    query = get_ranking_top_query(
+        query, subject, by_season=by_season, per_match=per_match, top_n=top_n,
+        conversion=analysis_type != "Volume Total", by_perspective=True,
+    )
+    return run_query(query.sql, query.params, project=project_id)
+
+
+def ranking_perspective(df: pd.DataFrame, perspective: str) -> pd.DataFrame:
+    """Linhas de uma perspectiva, sem a coluna `perspective` (mesmo formato da query de uma perspectiva só)."""
+    if "perspective" not in df.columns:
+        return df
+    rows = df[df["perspective"].astype(str) == perspective]
+    return rows.drop(columns="perspective").reset_index(drop=True)
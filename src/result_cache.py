@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import uuid
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+from src.settings import get_bool_setting, get_setting
+
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "results")
+DEFAULT_MAX_MB = 512
+DEFAULT_TTL_HOURS = 1
+
+
+# -----------------------------
+# Chave
+# -----------------------------
+# Espaços fora de literais não mudam a query; dentro de '...' / "..." mudam.
+_WS_OR_LITERAL = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Colapsa espaços/quebras de linha fora de literais de texto."""
+    return _WS_OR_LITERAL.sub(lambda m: m.group(1) or " ", sql).strip()
+
+
+def _params_repr(params: Optional[Sequence]) -> list:
+    out = []
+    for p in params or []:
+        if hasattr(p, "values"):      # ArrayQueryParameter
+            out.append([p.name, getattr(p, "array_type", None), list(p.values)])
+        else:                         # ScalarQueryParameter
+            out.append([p.name, getattr(p, "type_", None), p.value])
+    return sorted(out, key=lambda x: str(x[0]))
+
+
+def make_key(scope: str, sql: str, params: Optional[Sequence] = None) -> str:
+    """Hash de (backend/dados, SQL normalizado, parâmetros)."""
+    payload = json.dumps([scope, normalize_sql(sql), _params_repr(params)], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Cache em disco
+# -----------------------------
+class ResultCache:
+    """
+    Resultados de queries em Parquet, indexados por um SQLite no mesmo diretório.
+    Sobrevive a restarts e é compartilhado entre processos do mesmo host
+    (SQLite em modo WAL + arquivos gravados de forma atômica).
+    Limite de tamanho com despejo LRU (último acesso) e expiração por idade.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._index = os.path.join(directory, "index.sqlite")
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, size INTEGER, created_at REAL, last_access REAL)"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._index, timeout=30)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _bump(self, con: sqlite3.Connection, name: str) -> None:
+        con.execute(
+            "INSERT INTO stats(name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _remove(self, con: sqlite3.Connection, key: str) -> None:
+        con.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    # ---- leitura / escrita ----
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute("SELECT created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[0] > self.ttl_seconds:
+                self._remove(con, key)
+                row = None
+            if row is not None:
+                try:
+                    df = pd.read_parquet(self._path(key))
+                except Exception:
+                    # Arquivo sumiu ou corrompeu: trata como miss
+                    self._remove(con, key)
+                else:
+                    con.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                    self._bump(con, "hits")
+                    return df
+            self._bump(con, "misses")
+        return None
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        if not df.columns.is_unique:
+            return  # Parquet não aceita nomes de coluna repetidos
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception:
+            # Tipos que o Parquet não representa: apenas não cacheia
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+        now = time.time()
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO entries(key, size, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, os.path.getsize(path), now, now),
+            )
+            self._evict(con)
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in con.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            self._remove(con, key)
+            self._bump(con, "evictions")
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # ---- manutenção ----
+    def stats(self) -> Dict[str, float]:
+        with self._connect() as con:
+            entries, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(con.execute("SELECT name, value FROM stats").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "size_mb": round(size / 1e6, 2),
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._connect() as con:
+            for (key,) in con.execute("SELECT key FROM entries").fetchall():
+                self._remove(con, key)
+            con.execute("DELETE FROM stats")
+
+
+def result_cache_from_settings() -> Optional[ResultCache]:
+    """ResultCache configurado (result_cache*), ou None se desativado."""
+    if not get_bool_setting("result_cache", True):
+        return None
+    return ResultCache(
+        directory=get_setting("result_cache_dir", DEFAULT_CACHE_DIR),
+        max_bytes=int(float(get_setting("result_cache_max_mb", DEFAULT_MAX_MB)) * 1e6),
+        ttl_seconds=float(get_setting("result_cache_ttl_hours", DEFAULT_TTL_HOURS)) * 3600,
+    )
+
+
+def clear_result_cache() -> None:
+    """
+    Esvazia o cache configurado. Chamado pelos jobs que mudam os dados
+    (src.sync, src.materialize): resultados antigos não sobrevivem à carga.
+    """
+    cache = result_cache_from_settings()
+    if cache is not None:
+        cache.clear()
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main() -> None:
+    import sys
+
+    cache = result_cache_from_settings()
+    if cache is None:
+        print("result_cache desativado")
+        return
+    if sys.argv[1:] == ["clear"]:
+        cache.clear()
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.settings import get_setting
+
+
+DEFAULT_CACHE_DIR = ".cache"
+DEFAULT_TTL_HOURS = 24
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+class SchemaRegistry:
+    """
+    Colunas e tipos de todas as tabelas de um dataset, lidos de uma vez só
+    (INFORMATION_SCHEMA.COLUMNS no BigQuery). Substitui heurísticas por ano
+    e chamadas `client.get_table` espalhadas pelas páginas.
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, str]], fetched_at: Optional[float] = None):
+        # {tabela: {coluna: tipo}} (ordem das colunas preservada)
+        self.tables = tables
+        self.fetched_at = fetched_at or time.time()
+
+    # ---- consulta ----
+    def has_table(self, table: str) -> bool:
+        return table in self.tables
+
+    def columns(self, table: str) -> Dict[str, str]:
+        return self.tables.get(table, {})
+
+    def column_type(self, table: str, column: str) -> Optional[str]:
+        return self.columns(table).get(column)
+
+    def seasons(self, prefix: str) -> List[int]:
+        """Temporadas disponíveis para `<prefix>_<ano>` (ordem crescente)."""
+        pattern = re.compile(rf"^{re.escape(prefix)}_(\d{{4}})$")
+        years = []
+        for table in self.tables:
+            m = pattern.match(table)
+            if m:
+                years.append(int(m.group(1)))
+        return sorted(years)
+
+    def resolve(self, table: str, candidates: Iterable[str]) -> Optional[str]:
+        """Primeiro candidato existente na tabela (case-insensitive)."""
+        existing = {c.lower(): c for c in self.columns(table)}
+        for cand in candidates:
+            real = existing.get(cand.lower())
+            if real:
+                return real
+        return None
+
+    # ---- persistência ----
+    def to_dict(self) -> dict:
+        return {"fetched_at": self.fetched_at, "tables": self.tables}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SchemaRegistry":
+        return cls(data["tables"], data.get("fetched_at"))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SchemaRegistry":
+        """Constrói a partir de linhas (table_name, column_name, data_type)."""
+        tables: Dict[str, Dict[str, str]] = {}
+        for table, column, dtype in df[["table_name", "column_name", "data_type"]].itertuples(index=False):
+            tables.setdefault(str(table), {})[str(column)] = str(dtype).upper()
+        return cls(tables)
+
+
+# -----------------------------
+# Carga (disco + metadado)
+# -----------------------------
+def _cache_path(project_id: str, dataset_id: str, backend_name: str) -> str:
+    cache_dir = get_setting("schema_cache_dir", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, f"schema_{backend_name}_{project_id}_{dataset_id}.json")
+
+
+def _read_cache(path: str) -> Optional[SchemaRegistry]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return SchemaRegistry.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_cache(path: str, registry: SchemaRegistry) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry.to_dict(), f)
+    os.replace(tmp, path)
+
+
+def load_registry(backend, project_id: str, dataset_id: str, refresh: bool = False) -> SchemaRegistry:
+    """
+    Retorna o registry do dataset: do disco se ainda válido (schema_cache_ttl_hours),
+    senão com UMA query de metadado. Se o metadado falhar, usa o cache vencido.
+    """
+    path = _cache_path(project_id, dataset_id, backend.name)
+    cached = _read_cache(path)
+    ttl = float(get_setting("schema_cache_ttl_hours", DEFAULT_TTL_HOURS)) * 3600
+
+    if cached is not None and not refresh and time.time() - cached.fetched_at < ttl:
+        return cached
+
+    try:
+        registry = SchemaRegistry.from_frame(backend.dataset_columns(project_id, dataset_id))
+    except Exception:
+        if cached is not None:
+            return cached
+        raise
+
+    _write_cache(path, registry)
+    return registry
+
+
+_REGISTRIES: Dict[tuple, SchemaRegistry] = {}
+_LOCK = threading.Lock()
+
+
+def get_registry(project_id: str, dataset_id: str, refresh: bool = False) -> SchemaRegistry:
+    """Registry em memória do processo (uma carga por dataset/backend)."""
+    from src.bq_io import get_backend
+
+    backend = get_backend(project=project_id)
+    key = (backend.name, project_id, dataset_id)
+    with _LOCK:
+        if refresh or key not in _REGISTRIES:
+            _REGISTRIES[key] = load_registry(backend, project_id, dataset_id, refresh=refresh)
+        return _REGISTRIES[key]
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main() -> None:
+    from src.bq_io import DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID
+    from src.queries import EVENTS_TABLE_PREFIX, SCHEDULE_TABLE_PREFIX
+
+    registry = get_registry(DEFAULT_PROJECT_ID, DEFAULT_DATASET_ID, refresh=True)
+    for prefix in (EVENTS_TABLE_PREFIX, SCHEDULE_TABLE_PREFIX):
+        seasons = registry.seasons(prefix)
+        print(f"{prefix}: {seasons}")
+        # Drift: colunas que não existem em todas as temporadas
+        all_cols: Dict[str, List[int]] = {}
+        for year in seasons:
+            for col in registry.columns(f"{prefix}_{year}"):
+                all_cols.setdefault(col, []).append(year)
+        for col, years in all_cols.items():
+            if len(years) != len(seasons):
+                print(f"  {col}: só em {years}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Optional
+
+
+# -----------------------------
+# Configuração da aplicação
+# -----------------------------
+# Ordem de precedência:
+#   1. variável de ambiente PRODIGY_<NOME> (ex: PRODIGY_BACKEND=local)
+#   2. seção [app] do .streamlit/secrets.toml (ex: backend = "local")
+#   3. default informado pelo chamador
+
+ENV_PREFIX = "PRODIGY_"
+SECRETS_SECTION = "app"
+
+
+def _from_secrets(name: str) -> Optional[Any]:
+    try:
+        import streamlit as st
+
+        section = st.secrets.get(SECRETS_SECTION)
+        if section is not None and name in section:
+            return section[name]
+    except Exception:
+        # Sem secrets.toml (scripts, notebooks, CI): segue para o default
+        pass
+    return None
+
+
+def get_setting(name: str, default: Optional[Any] = None) -> Optional[Any]:
+    """Lê uma configuração (env > secrets > default)."""
+    env = os.environ.get(f"{ENV_PREFIX}{name.upper()}")
+    if env is not None:
+        return env
+
+    value = _from_secrets(name)
+    if value is not None:
+        return value
+
+    return default
+
+
+def get_bool_setting(name: str, default: bool = False) -> bool:
+    """Como `get_setting`, mas interpreta "1/true/yes/on" como True."""
+    value = get_setting(name, None)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in {"1", "true", "yes", "on", "sim"}
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from google.cloud import bigquery
+
+from src.backends import DuckDBBackend, QueryBackend
+from src.queries import (
+    CONSOLIDATED_EVENTS_TABLE,
+    EVENTS_TABLE_PREFIX,
+    MATCH_ID_CANDIDATES,
+    QUALIFIER_MASK_COLUMN,
+    SCHEDULE_TABLE_PREFIX,
+    _qualifier_mask_expr,
+)
+from src.result_cache import clear_result_cache
+from src.schema_registry import SchemaRegistry, load_registry
+
+
+STATE_FILE = "_sync_state.json"
+FINISHED_STATUS = ("2", "Finished")
+EVENT_ID_CANDIDATES = ["id", "event_id"]
+
+# Arquivos gravados pelo sync: sync-<lote>.parquet
+_SYNC_FILE = re.compile(r"^sync-([0-9a-f]+)\.parquet$")
+
+
+# -----------------------------
+# Estado (marcas d'água)
+# -----------------------------
+# <local_dir>/_sync_state.json guarda, por temporada:
+#   games         jogos encerrados já copiados
+#   max_event_id  maior id de evento copiado
+#   batches       lotes gravados (arquivos sync-<lote>.parquet)
+#   schedule_batch lote com o schedule vigente da temporada
+# Um lote só passa a valer quando entra no estado; arquivos de lotes que não
+# chegaram ao estado (sync interrompido) são apagados na execução seguinte.
+
+def _state_path(data_dir: str) -> str:
+    return os.path.join(data_dir, STATE_FILE)
+
+
+def load_state(data_dir: str) -> Dict[str, dict]:
+    try:
+        with open(_state_path(data_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(data_dir: str, state: Dict[str, dict]) -> None:
+    path = _state_path(data_dir)
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _sync_folders(data_dir: str) -> List[str]:
+    folders = []
+    for root, _, names in os.walk(data_dir):
+        if any(_SYNC_FILE.match(n) for n in names):
+            folders.append(root)
+    return folders
+
+
+def _drop_orphans(data_dir: str, state: Dict[str, dict]) -> None:
+    """Remove arquivos de lotes que não chegaram a ser registrados no estado."""
+    known = {b for season in state.values() for b in season.get("batches", [])}
+    for folder in _sync_folders(data_dir):
+        for name in os.listdir(folder):
+            m = _SYNC_FILE.match(name)
+            if m and m.group(1) not in known:
+                os.remove(os.path.join(folder, name))
+
+
+def _drop_superseded(data_dir: str, state: Dict[str, dict]) -> None:
+    """
+    Cada lote traz o schedule inteiro da temporada (status atualizados), então
+    só o arquivo de `schedule_batch` vale; os anteriores (e o export original)
+    são apagados depois que o estado registra o lote novo.
+    """
+    for season, mark in state.items():
+        batch = mark.get("schedule_batch")
+        folder = os.path.join(data_dir, f"{SCHEDULE_TABLE_PREFIX}_{season}")
+        if not batch or not os.path.isdir(folder):
+            continue
+        keep = f"sync-{batch}.parquet"
+        for root, _, names in os.walk(folder):
+            for name in names:
+                if name.endswith(".parquet") and name != keep:
+                    os.remove(os.path.join(root, name))
+
+
+# -----------------------------
+# Layout local
+# -----------------------------
+def _table_dir(data_dir: str, table: str) -> str:
+    """
+    Diretório `<tabela>/` que recebe os lotes. Um `<tabela>.parquet` já existente
+    é movido para dentro dele (o backend local lê o diretório inteiro).
+    Apps em execução precisam de refresh/restart depois dessa primeira troca.
+    """
+    folder = os.path.join(data_dir, table)
+    single = f"{folder}.parquet"
+    os.makedirs(folder, exist_ok=True)
+    if os.path.isfile(single):
+        os.replace(single, os.path.join(folder, "base.parquet"))
+    return folder
+
+
+def _stage(df: pd.DataFrame, folder: str, batch: str) -> tuple:
+    """Grava o lote num temporário ao lado do destino; retorna (tmp, destino)."""
+    final = os.path.join(folder, f"sync-{batch}.parquet")
+    tmp = f"{final}.tmp"
+    df.to_parquet(tmp, index=False)
+    return tmp, final
+
+
+# -----------------------------
+# Sync
+# -----------------------------
+def _local_watermark(local: DuckDBBackend, project_id: str, dataset_id: str, table: str) -> dict:
+    """Marca d'água inicial a partir de dados locais já existentes (export manual)."""
+    if table not in local.local_tables():
+        return {"games": [], "max_event_id": None, "batches": []}
+    columns = local.table_columns(table)
+    match_col = next((c for c in MATCH_ID_CANDIDATES if c in columns), None)
+    id_col = next((c for c in EVENT_ID_CANDIDATES if c in columns), None)
+    games: List[int] = []
+    max_id = None
+    if match_col:
+        games = local.query(f"SELECT DISTINCT {match_col} AS g FROM `{project_id}.{dataset_id}.{table}`")["g"].dropna()
+        games = sorted(int(g) for g in games)
+    if id_col:
+        value = local.query(f"SELECT MAX({id_col}) AS m FROM `{project_id}.{dataset_id}.{table}`")["m"].iloc[0]
+        max_id = None if pd.isna(value) else int(value)
+    return {"games": games, "max_event_id": max_id, "batches": []}
+
+
+def sync_season(
+    remote: QueryBackend,
+    local: DuckDBBackend,
+    registry: SchemaRegistry,
+    project_id: str,
+    dataset_id: str,
+    season: int,
+    state: Dict[str, dict],
+) -> Dict[str, int]:
+    """
+    Copia de `remote` só o que falta de uma temporada: eventos dos jogos
+    encerrados ainda não copiados, mais eventos com id acima da marca d'água em
+    jogos já copiados. Quando há jogos novos, o schedule da temporada é relido
+    inteiro e substitui o local (o export já traz os jogos ainda agendados; só
+    acrescentar as linhas duplicaria esses jogos). Retorna contagens do lote.
+    """
+    events_table = f"{EVENTS_TABLE_PREFIX}_{season}"
+    schedule_table = f"{SCHEDULE_TABLE_PREFIX}_{season}"
+    mark = state.get(str(season)) or _local_watermark(local, project_id, dataset_id, events_table)
+    summary = {"season": season, "new_games": 0, "events": 0, "schedule_rows": 0}
+
+    # Jogos encerrados no schedule remoto (tabela pequena)
+    sched_match = registry.resolve(schedule_table, MATCH_ID_CANDIDATES) or "game_id"
+    finished = remote.query(
+        f"SELECT DISTINCT {sched_match} AS game_id FROM `{project_id}.{dataset_id}.{schedule_table}` "
+        "WHERE CAST(status AS STRING) IN UNNEST(@finished)",
+        [bigquery.ArrayQueryParameter("finished", "STRING", list(FINISHED_STATUS))],
+    )["game_id"]
+    known = set(mark["games"])
+    new_games = sorted(int(g) for g in finished.dropna() if int(g) not in known)
+
+    ev_match = registry.resolve(events_table, MATCH_ID_CANDIDATES) or "game_id"
+    id_col = registry.resolve(events_table, EVENT_ID_CANDIDATES)
+    params = [bigquery.ArrayQueryParameter("new_games", "INT64", new_games)]
+    where = f"{ev_match} IN UNNEST(@new_games)"
+    if id_col and mark["max_event_id"] is not None and known and str(season) in state:
+        # Eventos que chegaram depois para jogos já copiados
+        where += f" OR ({ev_match} IN UNNEST(@known_games) AND {id_col} > @max_event_id)"
+        params += [
+            bigquery.ArrayQueryParameter("known_games", "INT64", sorted(known)),
+            bigquery.ScalarQueryParameter("max_event_id", "INT64", mark["max_event_id"]),
+        ]
+    if not new_games and len(params) == 1:
+        state[str(season)] = mark
+        return summary
+
+    events = remote.query(f"SELECT * FROM `{project_id}.{dataset_id}.{events_table}` WHERE {where}", params)
+    schedule = pd.DataFrame()
+    if new_games:
+        schedule = remote.query(f"SELECT * FROM `{project_id}.{dataset_id}.{schedule_table}`")
+    if events.empty and schedule.empty:
+        state[str(season)] = mark
+        return summary
+
+    batch = uuid.uuid4().hex[:12]
+    staged = []
+    data_dir = local.data_dir
+    if not events.empty:
+        staged.append(_stage(events, _table_dir(data_dir, events_table), batch))
+        consolidated = os.path.join(data_dir, CONSOLIDATED_EVENTS_TABLE)
+        if os.path.isdir(consolidated):
+            # Mesmo lote na tabela consolidada (partição season=AAAA, com qual_mask)
+            tmp_events = staged[-1][0]
+            with_mask = local.query(
+                f"SELECT *, {_qualifier_mask_expr()} AS {QUALIFIER_MASK_COLUMN} FROM read_parquet('{tmp_events}')"
+            )
+            partition = os.path.join(consolidated, f"season={season}")
+            os.makedirs(partition, exist_ok=True)
+            staged.append(_stage(with_mask, partition, batch))
+    if not schedule.empty:
+        staged.append(_stage(schedule, _table_dir(data_dir, schedule_table), batch))
+
+    for tmp, final in staged:
+        os.replace(tmp, final)
+
+    ids = events[id_col] if id_col and id_col in events.columns else pd.Series(dtype="float64")
+    max_ids = [v for v in (mark["max_event_id"], ids.max() if len(ids) else None) if v is not None and not pd.isna(v)]
+    state[str(season)] = {
+        "games": sorted(known | set(new_games)),
+        "max_event_id": int(max(max_ids)) if max_ids else None,
+        "batches": mark.get("batches", []) + [batch],
+        "schedule_batch": batch if not schedule.empty else mark.get("schedule_batch"),
+        "synced_at": time.time(),
+    }
+    summary.update(new_games=len(new_games), events=len(events), schedule_rows=len(schedule))
+    return summary
+
+
+def sync(
+    remote: QueryBackend,
+    data_dir: str,
+    project_id: str,
+    dataset_id: str,
+    seasons: Optional[Sequence[int]] = None,
+) -> List[Dict[str, int]]:
+    """
+    Atualiza `data_dir` a partir de `remote` (BigQuery). Sem `seasons`, verifica
+    as temporadas nunca sincronizadas e as a partir da última já sincronizada.
+    O estado é gravado depois de cada temporada, então uma interrupção perde
+    no máximo o lote em andamento (descartado na próxima execução).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    local = DuckDBBackend(data_dir)
+    registry = load_registry(remote, project_id, dataset_id, refresh=True)
+    state = load_state(data_dir)
+    _drop_orphans(data_dir, state)
+    _drop_superseded(data_dir, state)
+
+    available = [y for y in registry.seasons(EVENTS_TABLE_PREFIX) if y in registry.seasons(SCHEDULE_TABLE_PREFIX)]
+    if seasons is None:
+        synced = [int(y) for y in state]
+        seasons = [y for y in available if not synced or y >= max(synced) or str(y) not in state]
+    else:
+        seasons = [int(y) for y in seasons if int(y) in available]
+
+    summaries = []
+    for season in seasons:
+        summaries.append(sync_season(remote, local, registry, project_id, dataset_id, season, state))
+        _save_state(data_dir, state)
+        _drop_superseded(data_dir, state)
+
+    # Tabelas novas (temporada nova) aparecem no registry local
+    load_registry(local, project_id, dataset_id, refresh=True)
+    if any(s["events"] or s["schedule_rows"] for s in summaries):
+        clear_result_cache()  # resultados em cache são anteriores aos jogos novos
+    return summaries
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv: Optional[list] = None) -> None:
+    from src.backends import BigQueryBackend
+    from src.bq_io import DEFAULT_DATASET_ID, DEFAULT_LOCAL_DIR, DEFAULT_PROJECT_ID, get_bq_client
+    from src.settings import get_setting
+
+    parser = argparse.ArgumentParser(description="Sincroniza jogos novos do BigQuery para o Parquet local.")
+    parser.add_argument("--project", default=DEFAULT_PROJECT_ID)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_ID)
+    parser.add_argument("--local-dir", default=get_setting("local_dir", DEFAULT_LOCAL_DIR))
+    parser.add_argument("--seasons", type=int, nargs="*", help="temporadas a verificar (default: a partir da última sincronizada)")
+    args = parser.parse_args(argv)
+
+    remote = BigQueryBackend(get_bq_client(project=args.project))
+    for s in sync(remote, args.local_dir, args.project, args.dataset, seasons=args.seasons):
+        print(f"{s['season']}: {s['new_games']} jogos novos, {s['events']} eventos, {s['schedule_rows']} linhas de schedule")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_settings(tmp_path, monkeypatch):
+    """Caches (schema registry, resultados) num diretório temporário por teste."""
+    monkeypatch.setenv("PRODIGY_SCHEMA_CACHE_DIR", str(tmp_path / ".cache"))
+    monkeypatch.setenv("PRODIGY_RESULT_CACHE_DIR", str(tmp_path / ".cache"))
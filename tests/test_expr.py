@@ -0,0 +1,58 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backends import _DUCKDB_MACROS, _param_values, translate_sql
+from src.expr import Minute, Outcome, QualMask, Qualifiers, Team, Type
+from src.queries import QueryParams
+
+
+@pytest.fixture(scope="module")
+def events():
+    return pd.DataFrame({
+        "rid": range(8),
+        "team": ["A", "B", None, "A", "C", None, "B", "A"],
+        "type": ["Pass", "Shot", "Pass", None, "Goal", "Shot", "Pass", "Goal"],
+        "outcome_type": ["Successful", None, "Unsuccessful", "Successful", None, "Successful", None, "Unsuccessful"],
+        "expanded_minute": pd.array([5, 50, None, 90, 46, 10, None, 45], dtype="Int64"),
+        "qual_mask": pd.array([1, 2, None, 3, 0, None, 5, 4], dtype="Int64"),
+        "qualifiers": ["Head,Cross", None, "Cross", "KeyPass", None, "Head", "Corner", "Penalty"],
+    })
+
+
+def _sql_mask(df, expr):
+    """Linhas em que o predicado SQL (traduzido para DuckDB) é TRUE."""
+    params = QueryParams()
+    where = translate_sql(expr.to_sql(params))
+    con = duckdb.connect()
+    for stmt in _DUCKDB_MACROS:
+        con.execute(stmt)
+    con.register("events", df)
+    sql = f"SELECT COALESCE({where}, FALSE) AS m FROM events ORDER BY rid"
+    return con.execute(sql, _param_values(params.bindings) or None).fetchnumpy()["m"].astype(bool)
+
+
+TEAM_A = Team.isin(["A"])
+EARLY = Minute.between(0, 45)
+PASS = Type.eq("Pass")
+FAILED = Outcome.eq("Unsuccessful")
+
+
+@pytest.mark.parametrize("expr", [
+    TEAM_A,
+    ~TEAM_A,
+    EARLY,
+    ~EARLY,
+    TEAM_A & EARLY,
+    ~(TEAM_A & EARLY),
+    TEAM_A | EARLY,
+    ~(TEAM_A | EARLY),
+    ~TEAM_A | ~EARLY,
+    (PASS | FAILED) & ~EARLY,
+    ~((PASS & ~FAILED) | (TEAM_A & ~EARLY)),
+    QualMask.any_bit(4) | ~Qualifiers.contains_any(["Head"]),
+    ~(QualMask.any_bit(1) & Qualifiers.contains_any(["Cross", "Corner"])),
+])
+def test_mask_matches_sql_with_nulls(events, expr):
+    np.testing.assert_array_equal(expr.mask(events), _sql_mask(events, expr))
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.filters import IndexedEvents, LocalEvents, filter_events
+
+
+@pytest.fixture(scope="module")
+def events():
+    rng = np.random.default_rng(7)
+    n = 2000
+    minutes = rng.integers(0, 96, n).astype("float64")
+    minutes[rng.random(n) < 0.02] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(n),
+        "match_id": rng.integers(1, 30, n),
+        "team": rng.choice(["A", "B", "C", None], n),
+        "type": rng.choice(["Pass", "Shot", "Tackle", "Goal"], n),
+        "outcome_type": rng.choice(["Successful", "Unsuccessful"], n),
+        "player_id": rng.integers(1, 40, n),
+        "player": "x",
+        "expanded_minute": minutes,
+    })
+
+
+def _ids(df):
+    return sorted(df["id"].tolist())
+
+
+@pytest.mark.parametrize("teams, event_types, minutes", [
+    (None, None, None),
+    (["A"], None, None),
+    (["A", "C"], ["Pass", "Goal"], None),
+    (None, ["Shot"], (10, 45)),
+    (["B"], ["Pass"], (0, 90)),
+    (["Z"], None, (10, 20)),
+    (None, ["Nope"], None),
+])
+def test_indexed_filter_matches_filter_events(events, teams, event_types, minutes):
+    indexed = IndexedEvents(events)
+    expected = filter_events(events, teams=teams, event_types=event_types, minutes=minutes)
+    assert _ids(indexed.filter(teams=teams, event_types=event_types, minutes=minutes)) == _ids(expected)
+    # filter_events também aceita o IndexedEvents direto
+    assert _ids(filter_events(indexed, teams=teams, event_types=event_types, minutes=minutes)) == _ids(expected)
+
+
+def test_indexed_filter_by_matches(events):
+    indexed = IndexedEvents(events)
+    got = indexed.filter(match_ids=[3, 5], event_types=["Pass"])
+    expected = events[events["match_id"].isin([3, 5]) & (events["type"] == "Pass")]
+    assert _ids(got) == _ids(expected)
+
+
+def test_local_events_limit_samples_every_match(events):
+    local = LocalEvents(events)
+    out, total = local.filter((0, 120), ("Pass",), (), (), limit_rows=50)
+    passes = events[(events["type"] == "Pass") & events["expanded_minute"].between(0, 120)]
+    assert total == len(passes)
+    assert len(out) == 50
+    assert out["match_id"].nunique() > 20  # não só as primeiras partidas/minutos
+    assert out["expanded_minute"].max() > 80
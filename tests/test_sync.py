@@ -0,0 +1,57 @@
+import pandas as pd
+
+from src.backends import DuckDBBackend
+from src.sync import sync
+
+P, D = "p", "d"
+EVENTS = "eventos_brasileirao_serie_a_2025"
+SCHEDULE = "schedule_brasileirao_serie_a_2025"
+
+
+def _schedule(status):
+    return pd.DataFrame({
+        "game_id": [1, 2, 3],
+        "start_time": pd.to_datetime(["2025-04-01", "2025-04-08", "2025-04-15"]),
+        "home_team": ["A", "B", "C"],
+        "away_team": ["B", "C", "A"],
+        "status": status,
+    })
+
+
+def _events(games):
+    rows = [(g * 100 + i, g, "Pass") for g in games for i in range(3)]
+    return pd.DataFrame(rows, columns=["id", "game_id", "type"])
+
+
+def _local_schedule(local_dir):
+    return DuckDBBackend(str(local_dir)).query(f"SELECT game_id, status FROM `{P}.{D}.{SCHEDULE}`")
+
+
+def test_sync_replaces_schedule_rows(tmp_path):
+    remote_dir, local_dir = tmp_path / "remote", tmp_path / "local"
+    remote_dir.mkdir()
+    local_dir.mkdir()
+    _schedule(["Finished", "Finished", "Scheduled"]).to_parquet(remote_dir / f"{SCHEDULE}.parquet", index=False)
+    _events([1, 2]).to_parquet(remote_dir / f"{EVENTS}.parquet", index=False)
+    # Export local anterior: o jogo 2 ainda estava agendado
+    _schedule(["Finished", "Scheduled", "Scheduled"]).to_parquet(local_dir / f"{SCHEDULE}.parquet", index=False)
+    _events([1]).to_parquet(local_dir / f"{EVENTS}.parquet", index=False)
+
+    remote = DuckDBBackend(str(remote_dir))
+    (summary,) = sync(remote, str(local_dir), P, D)
+    assert summary["new_games"] == 1
+
+    schedule = _local_schedule(local_dir)
+    assert sorted(schedule["game_id"]) == [1, 2, 3]
+    assert schedule.set_index("game_id").loc[2, "status"] == "Finished"
+
+    # O jogo 3 termina: nova rodada do sync, ainda uma linha por jogo
+    _schedule(["Finished", "Finished", "Finished"]).to_parquet(remote_dir / f"{SCHEDULE}.parquet", index=False)
+    _events([1, 2, 3]).to_parquet(remote_dir / f"{EVENTS}.parquet", index=False)
+    sync(remote, str(local_dir), P, D)
+
+    schedule = _local_schedule(local_dir)
+    assert schedule["game_id"].is_unique
+    assert set(schedule["status"]) == {"Finished"}
+    events = DuckDBBackend(str(local_dir)).query(f"SELECT COUNT(*) AS n FROM `{P}.{D}.{EVENTS}`")
+    assert events["n"].iloc[0] == 9
@@ -43,7 +43,9 @@ def verify_conversion():
     )
     
     client = get_bq_client(project=PROJECT_ID)
-    df = client.query(query).to_dataframe()
+    df = client.query(
+        query.sql, job_config=bigquery.QueryJobConfig(query_parameters=query.params)
+    ).to_dataframe()
     
     # Filter for 2025
     df = df[df['season'] == YEAR]